@@ -1,5 +1,8 @@
 import numpy as np
 import soundfile as sf
+from numpy.lib.stride_tricks import sliding_window_view
+
+from analysis.frames import frame_features, stream_frame_energy, STREAM_BLOCK_SECONDS
 
 # =========================
 # Configurações centrais
@@ -9,24 +12,39 @@ MIN_AUDIO_SECONDS = 5
 MAX_AUDIO_SECONDS = 420  # 7 minutos
 MIN_BPM = 40
 MAX_BPM = 220
+FRAME_SECONDS = 0.02  # 20ms
+ROLLING_WINDOW = 4  # intervalos por janela do BPM de performance
 
 
 # =========================
 # Utilidades
 # =========================
 
-def _frame_energy(signal, frame_size):
-    energy = []
-    for i in range(0, len(signal) - frame_size, frame_size):
-        frame = signal[i:i + frame_size]
-        energy.append(np.sum(frame ** 2))
-    return np.array(energy)
+def _legacy_frame_count(n_samples, frame_size):
+    # mesmo nº de frames do loop antigo (range(0, len - frame_size, frame_size))
+    return max(0, -(-(n_samples - frame_size) // frame_size))
+
+
+def _frame_energy(signal, sr, frame_size):
+    n = _legacy_frame_count(len(signal), frame_size)
+    return frame_features(signal, sr, frame_size, with_flux=False).energy[:n]
 
 
 def _estimate_onsets(signal, sr):
-    frame_size = int(0.02 * sr)  # 20ms
-    energy = _frame_energy(signal, frame_size)
+    frame_size = int(FRAME_SECONDS * sr)
+    energy = _frame_energy(signal, sr, frame_size)
+    return _onsets_from_energy(energy, frame_size, sr)
+
 
+def _estimate_onsets_stream(audio_path, block_seconds=STREAM_BLOCK_SECONDS):
+    sr = int(sf.info(audio_path).samplerate)
+    frame_size = int(FRAME_SECONDS * sr)
+    energy, total, sr = stream_frame_energy(audio_path, frame_size, block_seconds)
+    energy = energy[:_legacy_frame_count(total, frame_size)]
+    return _onsets_from_energy(energy, frame_size, sr)
+
+
+def _onsets_from_energy(energy, frame_size, sr):
     if len(energy) < 10:
         return []
 
@@ -40,6 +58,24 @@ def _estimate_onsets(signal, sr):
     return times
 
 
+def _fold_octaves(bpm):
+    """
+    Dobra / divide por 2 até cair em [MIN_BPM, MAX_BPM].
+    Vetorizado: o nº de oitavas sai de log2 em vez de while.
+    """
+    bpm = np.asarray(bpm, dtype=np.float64)
+    up = np.maximum(np.ceil(np.log2(MIN_BPM / bpm)), 0)
+    down = np.maximum(np.ceil(np.log2(bpm / MAX_BPM)), 0)
+    out = bpm * np.exp2(up - down)
+
+    # arredondamento do log2 na fronteira: corrige em no máximo 1 oitava
+    out = np.where(out < MIN_BPM, out * 2, out)
+    out = np.where((up > 0) & (out / 2 >= MIN_BPM), out / 2, out)
+    out = np.where(out > MAX_BPM, out / 2, out)
+    out = np.where((down > 0) & (out * 2 <= MAX_BPM), out * 2, out)
+    return out
+
+
 def _intervals_to_bpm(intervals):
     if len(intervals) == 0:
         return None
@@ -48,53 +84,71 @@ def _intervals_to_bpm(intervals):
     if median_interval <= 0:
         return None
 
-    bpm = 60.0 / median_interval
+    return float(_fold_octaves(60.0 / median_interval))
 
-    while bpm < MIN_BPM:
-        bpm *= 2
-    while bpm > MAX_BPM:
-        bpm /= 2
 
-    return bpm
+def _rolling_bpm(intervals, window=ROLLING_WINDOW):
+    """
+    Curva de tempo por onset: mediana móvel dos últimos `window` intervalos
+    (janelas menores no começo), convertida em BPM. NaN onde não há BPM.
+    """
+    n = len(intervals)
+    head = [np.median(intervals[:i + 1]) for i in range(min(window - 1, n))]
+    if n >= window:
+        full = np.median(sliding_window_view(intervals, window), axis=1)
+        medians = np.concatenate([np.asarray(head, dtype=np.float64), full])
+    else:
+        medians = np.asarray(head, dtype=np.float64)
+
+    curve = np.full(n, np.nan)
+    valid = medians > 0
+    curve[valid] = _fold_octaves(60.0 / medians[valid])
+    return curve
 
 
 # =========================
 # Análise principal
 # =========================
 
-def analyze_bpm(audio_path: str):
-    signal, sr = sf.read(audio_path)
-
-    if signal.ndim > 1:
-        signal = np.mean(signal, axis=1)
-
-    duration = len(signal) / sr
+def analyze_bpm(audio_path: str, streaming: bool = True):
+    """
+    streaming=True: lê em blocos (sf.blocks), mono float32; memória de pico
+    limitada ao bloco. streaming=False: carrega o arquivo inteiro (referência).
+    """
+    info = sf.info(audio_path)
+    duration = info.frames / info.samplerate
 
+    # limites checados pelo header, antes de decodificar qualquer coisa
     if duration < MIN_AUDIO_SECONDS:
         raise ValueError("Áudio curto demais para análise confiável")
 
     if duration > MAX_AUDIO_SECONDS:
         raise ValueError("Áudio excede o limite máximo de 7 minutos")
 
-    onsets = _estimate_onsets(signal, sr)
+    if streaming:
+        onsets = _estimate_onsets_stream(audio_path)
+    else:
+        signal, sr = sf.read(audio_path)
+        if signal.ndim > 1:
+            signal = np.mean(signal, axis=1)
+        onsets = _estimate_onsets(signal, sr)
 
     if len(onsets) < 4:
         return {
             "bpm_reference": None,
             "bpm_performance": None,
             "bpm_stability": 0.0,
-            "confidence": "low"
+            "confidence": "low",
+            "bpm_curve": [],
+            "bpm_curve_times": []
         }
 
     intervals = np.diff(onsets)
     bpm_reference = _intervals_to_bpm(intervals)
 
-    # BPM de performance: média móvel
-    bpm_series = []
-    for i in range(len(intervals)):
-        bpm = _intervals_to_bpm(intervals[max(0, i - 3):i + 1])
-        if bpm:
-            bpm_series.append(bpm)
+    # BPM de performance: mediana móvel (curva por onset)
+    bpm_curve = _rolling_bpm(intervals)
+    bpm_series = bpm_curve[~np.isnan(bpm_curve)]
 
     if len(bpm_series) == 0:
         bpm_performance = None
@@ -111,5 +165,7 @@ def analyze_bpm(audio_path: str):
         "bpm_reference": round(bpm_reference, 2) if bpm_reference else None,
         "bpm_performance": round(bpm_performance, 2) if bpm_performance else None,
         "bpm_stability": round(stability, 3),
-        "confidence": confidence
+        "confidence": confidence,
+        "bpm_curve": [None if np.isnan(b) else round(float(b), 2) for b in bpm_curve],
+        "bpm_curve_times": [round(float(t), 3) for t in onsets[1:]]
   }
@@ -0,0 +1,246 @@
+from typing import Dict, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from analysis.frames import frame_view
+
+# =========================
+# Configurações
+# =========================
+
+MIN_BPM = 40
+MAX_BPM = 240
+ENVELOPE_RATE_HZ = 200  # taxa do envelope de onset (hop ~5ms)
+LOG_COMPRESSION = 1000.0
+PRIOR_CENTER_BPM = 130.0  # phonk/funk vivem entre ~120 e ~160
+PRIOR_SIGMA_OCTAVES = 0.7
+MIN_CONFIDENCE = 0.1
+HALF_LAG_RATIO = 0.95  # pico em lag/2 praticamente igual -> tempo é o dobro
+EQUALIZE_SECONDS = 0.3  # meia janela do máximo local que normaliza os onsets
+ENERGY_WINDOW_HOPS = 8  # energia somada em 8 hops (~40ms): cobre o período de um 808
+SMOOTHING_FRAMES = 5  # janela Hann sobre o envelope (~25ms)
+
+
+# =========================
+# Envelope de onset
+# =========================
+
+def _band_onsets(energy: np.ndarray) -> np.ndarray:
+    peak = float(np.max(energy)) if len(energy) else 0.0
+    if peak <= 0:
+        return np.zeros(max(len(energy) - 1, 0))
+    loud = np.log1p(LOG_COMPRESSION * energy / peak)
+    return np.maximum(np.diff(loud), 0.0)
+
+
+def onset_envelope(signal: np.ndarray, sr: int):
+    """
+    Envelope de onset reduzido (~200 Hz) em duas bandas: energia do sinal
+    (dominada por kick/808) e energia da 1ª diferença x[n] - x[n-1]
+    (pré-ênfase: snare, hat, cowbell). Cada banda: compressão log e
+    diferença retificada; as duas são somadas. Retorna (envelope, frame_rate).
+    """
+    hop = max(1, int(round(sr / ENVELOPE_RATE_HZ)))
+    frame_rate = sr / hop
+    if len(signal) < hop + 1:
+        return np.zeros(0), frame_rate
+
+    # views deslocadas de 1 amostra: sum((a-b)^2) = a.a + b.b - 2a.b,
+    # sem materializar o sinal diferenciado
+    a = frame_view(signal[1:], hop)
+    b = frame_view(signal[:-1], hop)
+    aa = np.einsum("ij,ij->i", a, a).astype(np.float64)
+    bb = np.einsum("ij,ij->i", b, b).astype(np.float64)
+    ab = np.einsum("ij,ij->i", a, b).astype(np.float64)
+    low = bb
+    high = np.maximum(aa + bb - 2.0 * ab, 0.0)
+
+    # janela de energia maior que o hop: com 5ms, a energia de um grave de
+    # 50Hz oscila com a fase e o diff vira ripple em vez de um onset
+    box = np.ones(ENERGY_WINDOW_HOPS)
+    low = np.convolve(low, box)[:len(low)]
+    high = np.convolve(high, box)[:len(high)]
+
+    env = _band_onsets(low) + _band_onsets(high)
+    if not np.any(env):
+        return np.zeros(0), frame_rate
+
+    # equaliza: cada onset vira ~1 em relação ao máximo da vizinhança.
+    # Kick e snare passam a pesar igual (senão o pico forte fica em 2x o
+    # período: kick -> kick), e ghost notes continuam relativas.
+    half = max(1, int(EQUALIZE_SECONDS * frame_rate))
+    padded = np.pad(env, half, mode="constant")
+    local_max = sliding_window_view(padded, 2 * half + 1).max(axis=1)
+    env = env / np.maximum(local_max, 1e-3 * float(env.max()))
+
+    # suaviza: sem isso a quantização do hop deixa o pico da autocorrelação
+    # mais alto em 2x o período do que no período (erro de oitava)
+    win = np.hanning(SMOOTHING_FRAMES + 2)[1:-1]
+    env = np.convolve(env, win / win.sum(), mode="same")
+    return env, frame_rate
+
+
+# =========================
+# Autocorrelação (FFT)
+# =========================
+
+def _autocorrelation(env: np.ndarray) -> np.ndarray:
+    n = len(env)
+    x = env - env.mean()
+    n_fft = 1 << (2 * n - 1).bit_length()  # >= 2n (sem wrap) e potência de 2
+    spec = np.fft.rfft(x, n=n_fft)
+    ac = np.fft.irfft(spec.real ** 2 + spec.imag ** 2, n=n_fft)[:n]
+    if ac[0] <= 0:
+        return np.zeros(n)
+    # normaliza pelo nº de termos (lags longos em trechos curtos)
+    ac = ac / (n - np.arange(n))
+    return ac / ac[0]
+
+
+def _parabolic_peak(y: np.ndarray, i: int) -> float:
+    if i <= 0 or i >= len(y) - 1:
+        return float(i)
+    a, b, c = y[i - 1], y[i], y[i + 1]
+    den = a - 2 * b + c
+    if den == 0:
+        return float(i)
+    return i + 0.5 * (a - c) / den
+
+
+def _prefer_faster(ac: np.ndarray, best: int, lag_min: int) -> int:
+    """
+    Pulso periódico puro tem ac(L) ~ ac(2L): o prior sozinho pode escolher
+    metade do tempo. Se existe pico em L/2 com força comparável, é ele.
+    """
+    while True:
+        center = int(round(best / 2))
+        lo, hi = max(lag_min, center - 1), center + 2
+        if hi - lo < 1 or center <= lag_min:
+            return best
+        i = lo + int(np.argmax(ac[lo:hi]))
+        if ac[i] < HALF_LAG_RATIO * ac[best]:
+            return best
+        best = i
+
+
+def _refine_lag(ac: np.ndarray, lag: float) -> float:
+    """
+    O pico em k*lag tem o mesmo erro absoluto de quantização que o pico em
+    lag; dividir por k melhora a precisão em k vezes.
+    """
+    best = lag
+    for k in (2, 4, 8):
+        center = int(round(lag * k))
+        lo, hi = center - k, center + k + 1
+        if lo < 1 or hi >= len(ac):
+            break
+        i = lo + int(np.argmax(ac[lo:hi]))
+        if ac[i] < 0.5 * ac[int(round(lag))]:
+            break
+        best = _parabolic_peak(ac, i) / k
+    return best
+
+
+def estimate_tempo(signal: np.ndarray, sr: int) -> Dict[str, Optional[float]]:
+    """
+    Tempo global: envelope de onset -> autocorrelação via FFT -> pico em
+    [MIN_BPM, MAX_BPM]; a oitava sai de um prior log-normal em torno de 130.
+    confidence = autocorrelação normalizada no pico (0..1).
+    """
+    if signal.ndim > 1:
+        signal = signal.mean(axis=1)
+
+    env, frame_rate = onset_envelope(signal, sr)
+    if len(env) < 4:
+        return {"bpm": None, "confidence": 0.0}
+
+    ac = _autocorrelation(env)
+
+    lag_min = max(1, int(np.floor(frame_rate * 60.0 / MAX_BPM)))
+    lag_max = min(len(ac) - 2, int(np.ceil(frame_rate * 60.0 / MIN_BPM)))
+    if lag_max <= lag_min:
+        return {"bpm": None, "confidence": 0.0}
+
+    lags = np.arange(lag_min, lag_max + 1)
+    seg = ac[lag_min - 1:lag_max + 2]
+    is_peak = (seg[1:-1] >= seg[:-2]) & (seg[1:-1] > seg[2:]) & (seg[1:-1] > 0)
+    if not np.any(is_peak):
+        return {"bpm": None, "confidence": 0.0}
+
+    # candidatos = família de oitavas do pico mais forte (lag x1/8 ... x2).
+    # Sem isso, com hats em colcheia, lags de 1.5x o período (3/2 do tempo)
+    # ganham só por estarem mais perto do centro do prior.
+    strongest = int(lags[np.argmax(np.where(is_peak, ac[lags], -np.inf))])
+    candidates = []
+    for factor in (0.125, 0.25, 0.5, 1.0, 2.0):
+        center = int(round(strongest * factor))
+        lo, hi = max(lag_min, center - 1), min(lag_max, center + 1) + 1
+        if hi <= lo:
+            continue
+        candidates.append(lo + int(np.argmax(ac[lo:hi])))
+
+    cand = np.array(sorted(set(candidates)))
+    bpms = 60.0 * frame_rate / cand
+    prior = np.exp(-0.5 * (np.log2(bpms / PRIOR_CENTER_BPM) / PRIOR_SIGMA_OCTAVES) ** 2)
+    best = int(cand[np.argmax(ac[cand] * prior)])
+    best = _prefer_faster(ac, best, lag_min)
+    lag = _refine_lag(ac, _parabolic_peak(ac, best))
+
+    bpm = 60.0 * frame_rate / lag
+    confidence = float(np.clip(ac[best], 0.0, 1.0))
+    if not (MIN_BPM <= bpm <= MAX_BPM):
+        return {"bpm": None, "confidence": confidence}
+
+    return {"bpm": float(bpm), "confidence": confidence}
+
+
+# =========================
+# Harness: click track sintético
+# =========================
+
+def click_track(bpm: float, seconds: float, sr: int = 44100, noise: float = 0.0, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    sig = np.zeros(int(seconds * sr), dtype=np.float32)
+    click = (np.exp(-np.arange(400) / 60.0) * np.sin(2 * np.pi * 1000 * np.arange(400) / sr)).astype(np.float32)
+    period = 60.0 / bpm
+    t = 0.0
+    while True:
+        i = int(round(t * sr))
+        if i + len(click) > len(sig):
+            break
+        sig[i:i + len(click)] += click
+        t += period
+    if noise:
+        sig += (noise * rng.standard_normal(len(sig))).astype(np.float32)
+    return sig
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description="Click tracks sintéticos: precisão e tempo do estimate_tempo")
+    ap.add_argument("--seconds", type=float, default=420.0)
+    ap.add_argument("--sr", type=int, default=44100)
+    ap.add_argument("--tolerance", type=float, default=0.5, help="erro máximo em BPM")
+    args = ap.parse_args()
+
+    failures = 0
+    for bpm in (60, 70, 85, 100, 120, 128, 130, 140, 150, 160, 174, 200):
+        for noise in (0.0, 0.05):
+            sig = click_track(bpm, args.seconds, args.sr, noise=noise)
+            t = time.perf_counter()
+            out = estimate_tempo(sig, args.sr)
+            ms = (time.perf_counter() - t) * 1000
+            err = abs(out["bpm"] - bpm) if out["bpm"] else float("inf")
+            ok = err <= args.tolerance
+            failures += not ok
+            print(f"{'OK  ' if ok else 'FAIL'} bpm={bpm:6.1f} noise={noise:.2f} -> "
+                  f"{out['bpm'] or 0:8.3f} conf={out['confidence']:.2f} {ms:6.1f} ms")
+
+    rng = np.random.default_rng(1)
+    noise_only = estimate_tempo(rng.standard_normal(int(30 * args.sr)).astype(np.float32), args.sr)
+    print(f"ruído branco -> {noise_only}")
+
+    raise SystemExit(1 if failures else 0)
@@ -1,6 +1,105 @@
+import os
+from typing import Dict
+
+import numpy as np
+
+from analysis.tempo import estimate_tempo, MIN_CONFIDENCE
+from engine.audio_cache import DecodedAudioCache
+from engine.results_store import AnalysisResultsStore
+
+ANALYZER_VERSION = "2"  # subir quando estimate_bpm/classify_audio mudarem
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# sinal decodificado, um cache por processo (principal ou worker do pool)
+audio_cache = DecodedAudioCache(max_bytes=AUDIO_CACHE_MAX_BYTES)
+
+
+def audio_cache_stats() -> Dict:
+    # chamado dentro de cada worker (AnalysisPool.worker_stats)
+    return audio_cache.stats()
+
+
 def analyze_audio(file_path: str):
     return {
         "status": "ok",
         "message": "audio received",
         "analysis_stage": "stub"
-    }
\ No newline at end of file
+    }
+
+
+# =========================
+# Análise (pura, roda no pool)
+# =========================
+
+def _bpm_from_tempo(tempo: dict):
+    if tempo["bpm"] is None or tempo["confidence"] < MIN_CONFIDENCE:
+        return None
+    return round(tempo["bpm"], 2)
+
+
+def estimate_bpm(signal: np.ndarray, sr: int):
+    """
+    BPM global via envelope de onset + autocorrelação (analysis.tempo).
+    None quando não há pulso confiável (confiança < MIN_CONFIDENCE).
+    """
+    return _bpm_from_tempo(estimate_tempo(signal, sr))
+
+
+def classify_audio(signal: np.ndarray) -> str:
+    if signal.ndim > 1:
+        signal = signal.mean(axis=1)
+
+    rms = np.sqrt(np.mean(signal ** 2))
+
+    if rms < 0.02:
+        return "vocal"
+    elif rms < 0.06:
+        return "melody"
+    else:
+        return "beat"
+
+
+def fl_time_base_sync(duration_sec: float, bpm: float):
+    if not bpm:
+        return None
+
+    seconds_per_beat = 60.0 / bpm
+    beats_total = duration_sec / seconds_per_beat
+    bars_4_4 = beats_total / 4
+
+    return {
+        "bpm": bpm,
+        "seconds_per_beat": round(seconds_per_beat, 4),
+        "total_beats": round(beats_total, 2),
+        "bars_4_4": round(bars_4_4, 2),
+        "time_signature": "4/4",
+        "ppq_reference": 96
+    }
+
+
+def analyze_file(file_id: str, file_path: str, upload_dir: str) -> dict:
+    """
+    bpm / audio_type / duração / sample rate / timebase do arquivo.
+    Lê do results store; só recalcula se o arquivo ou o analisador mudou.
+    Roda dentro do pool de análise: nada aqui depende do app FastAPI.
+    """
+    store = AnalysisResultsStore(upload_dir, ANALYZER_VERSION)
+
+    result = store.load(file_id, file_path)
+    if result is not None:
+        return result
+
+    audio = audio_cache.get_or_load(file_id, file_path)
+    tempo = estimate_tempo(audio.signal, audio.sample_rate)
+    bpm = _bpm_from_tempo(tempo)
+
+    result = {
+        "duration_seconds": audio.duration,
+        "sample_rate": audio.sample_rate,
+        "bpm_real": bpm,
+        "bpm_confidence": round(tempo["confidence"], 3),
+        "audio_type": classify_audio(audio.signal),
+        "fl_time_base": fl_time_base_sync(audio.duration, bpm),
+    }
+    store.save(file_id, file_path, result)
+    return result
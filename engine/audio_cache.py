@@ -0,0 +1,124 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import soundfile as sf
+
+from analysis.frames import stream_mono_blocks
+
+DECODE_BLOCK_FRAMES = 256 * 1024
+
+
+# =========================
+# Sinal decodificado
+# =========================
+
+@dataclass
+class DecodedAudio:
+    signal: np.ndarray  # mono, float32
+    sample_rate: int
+    duration: float
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.signal.nbytes)
+
+
+def decode_mono(file_path: str) -> DecodedAudio:
+    """
+    Decodifica o arquivo inteiro uma vez, já em mono float32.
+    Downmix bloco a bloco: o pico de memória é o sinal mono + 1 bloco,
+    sem a cópia estéreo do arquivo inteiro.
+    """
+    info = sf.info(file_path)
+    sr = int(info.samplerate)
+
+    signal = np.empty(max(int(info.frames), 0), dtype=np.float32)
+    pos = 0
+    for mono in stream_mono_blocks(file_path, DECODE_BLOCK_FRAMES):
+        if pos + len(mono) > len(signal):
+            # header subestimou (ex.: mp3): cresce o buffer
+            grown = np.empty(pos + len(mono) + len(signal) // 4, dtype=np.float32)
+            grown[:pos] = signal[:pos]
+            signal = grown
+        signal[pos:pos + len(mono)] = mono
+        pos += len(mono)
+    if pos < len(signal):
+        signal = signal[:pos].copy()  # não segura o buffer superdimensionado
+
+    duration = pos / sr if sr > 0 else 0.0
+    return DecodedAudio(signal=signal, sample_rate=int(sr), duration=float(duration))
+
+
+# =========================
+# Cache LRU por file_id
+# =========================
+
+class DecodedAudioCache:
+    """
+    Cache de processo para sinais decodificados, indexado por file_id.
+    Orçamento em bytes; quando estoura, remove o menos usado recentemente.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self._items: "OrderedDict[str, DecodedAudio]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, file_id: str) -> Optional[DecodedAudio]:
+        with self._lock:
+            item = self._items.get(file_id)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(file_id)
+            self.hits += 1
+            return item
+
+    def put(self, file_id: str, audio: DecodedAudio):
+        # sinal maior que o orçamento inteiro não entra (senão esvaziaria o cache)
+        if audio.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._items.pop(file_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+
+            self._items[file_id] = audio
+            self._bytes += audio.nbytes
+
+            while self._bytes > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def discard(self, file_id: str):
+        with self._lock:
+            old = self._items.pop(file_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+
+    def get_or_load(self, file_id: str, file_path: str) -> DecodedAudio:
+        audio = self.get(file_id)
+        if audio is None:
+            audio = decode_mono(file_path)
+            self.put(file_id, audio)
+        return audio
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes_used": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
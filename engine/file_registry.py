@@ -0,0 +1,145 @@
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+import soundfile as sf
+
+from engine.results_store import ANALYSIS_SUFFIX
+
+REGISTRY_FILENAME = "registry.sqlite3"
+
+
+@dataclass
+class FileEntry:
+    file_id: str
+    path: str
+    ext: str
+    size_bytes: int
+    duration_seconds: float
+    sample_rate: int
+
+
+def probe_entry(file_id: str, file_path: str) -> FileEntry:
+    info = sf.info(file_path)
+    sr = int(info.samplerate)
+    return FileEntry(
+        file_id=file_id,
+        path=file_path,
+        ext=os.path.splitext(file_path)[1].lower(),
+        size_bytes=os.path.getsize(file_path),
+        duration_seconds=info.frames / sr if sr > 0 else 0.0,
+        sample_rate=sr,
+    )
+
+
+class FileRegistry:
+    """
+    file_id -> caminho + metadados do upload.
+    Dict em memória com espelho em SQLite dentro do próprio UPLOAD_DIR,
+    então outros workers (e um restart) enxergam o mesmo índice.
+    """
+
+    def __init__(self, upload_dir: str):
+        self.upload_dir = upload_dir
+        self._entries: Dict[str, FileEntry] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(upload_dir, REGISTRY_FILENAME),
+            check_same_thread=False,
+            isolation_level=None,  # autocommit
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " file_id TEXT PRIMARY KEY,"
+            " path TEXT NOT NULL,"
+            " ext TEXT NOT NULL,"
+            " size_bytes INTEGER NOT NULL,"
+            " duration_seconds REAL NOT NULL,"
+            " sample_rate INTEGER NOT NULL)"
+        )
+
+    def _row_to_entry(self, row) -> FileEntry:
+        return FileEntry(*row)
+
+    def add(self, entry: FileEntry):
+        d = asdict(entry)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES "
+                "(:file_id, :path, :ext, :size_bytes, :duration_seconds, :sample_rate)",
+                d,
+            )
+            self._entries[entry.file_id] = entry
+
+    def register(self, file_id: str, file_path: str) -> FileEntry:
+        entry = probe_entry(file_id, file_path)
+        self.add(entry)
+        return entry
+
+    def get(self, file_id: str) -> Optional[FileEntry]:
+        entry = self._entries.get(file_id)
+        if entry is not None:
+            return entry
+
+        # upload feito por outro worker: cai no índice em disco (PK lookup)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT file_id, path, ext, size_bytes, duration_seconds, sample_rate"
+                " FROM files WHERE file_id = ?",
+                (file_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            entry = self._row_to_entry(row)
+            self._entries[file_id] = entry
+            return entry
+
+    def remove(self, file_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+            self._entries.pop(file_id, None)
+
+    def rebuild(self) -> Dict:
+        """
+        Reconcilia índice e diretório: carrega o que já está no SQLite,
+        descarta entradas cujo arquivo sumiu e registra arquivos órfãos
+        (uploads anteriores ao registry).
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT file_id, path, ext, size_bytes, duration_seconds, sample_rate FROM files"
+            ).fetchall()
+
+        entries = {}
+        stale = []
+        for row in rows:
+            e = self._row_to_entry(row)
+            if os.path.isfile(e.path):
+                entries[e.file_id] = e
+            else:
+                stale.append(e.file_id)
+
+        with self._lock:
+            self._entries = entries
+            for fid in stale:
+                self._db.execute("DELETE FROM files WHERE file_id = ?", (fid,))
+
+        known_paths = {e.path for e in entries.values()}
+        added = 0
+        for fn in os.listdir(self.upload_dir):
+            if fn.startswith(REGISTRY_FILENAME) or ANALYSIS_SUFFIX in fn:
+                continue
+            full = os.path.join(self.upload_dir, fn)
+            if full in known_paths or not os.path.isfile(full):
+                continue
+            file_id = os.path.splitext(fn)[0]
+            try:
+                self.register(file_id, full)
+                added += 1
+            except Exception:
+                continue
+
+        return {"entries": len(self._entries), "added": added, "removed": len(stale)}
@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+from typing import Dict, Optional
+
+ANALYSIS_SUFFIX = ".analysis.json"
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk_size)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+def _fingerprint(path: str) -> Dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class AnalysisResultsStore:
+    """
+    Resultado da análise persistido em disco, ao lado do upload:
+      <base_dir>/<file_id>.analysis.json
+
+    Válido enquanto o conteúdo do arquivo (sha256) e a versão do analisador
+    forem os mesmos. O stat (size + mtime) evita re-hash a cada leitura;
+    só quando ele muda o sha256 é recalculado para confirmar.
+    """
+
+    def __init__(self, base_dir: str, analyzer_version: str):
+        self.base_dir = base_dir
+        self.analyzer_version = analyzer_version
+
+    def _path(self, file_id: str) -> str:
+        return os.path.join(self.base_dir, f"{file_id}{ANALYSIS_SUFFIX}")
+
+    def load(self, file_id: str, file_path: str) -> Optional[Dict]:
+        path = self._path(file_id)
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rec = json.load(f)
+        except Exception:
+            return None
+
+        if rec.get("analyzer_version") != self.analyzer_version:
+            return None
+
+        fp = _fingerprint(file_path)
+        if rec.get("fingerprint") != fp:
+            # arquivo tocado: só vale se o conteúdo for o mesmo
+            if rec.get("content_hash") != sha256_file(file_path):
+                return None
+            rec["fingerprint"] = fp
+            self._write(path, rec)
+
+        return rec.get("result")
+
+    def save(self, file_id: str, file_path: str, result: Dict, content_hash: Optional[str] = None):
+        rec = {
+            "file_id": file_id,
+            "analyzer_version": self.analyzer_version,
+            "content_hash": content_hash or sha256_file(file_path),
+            "fingerprint": _fingerprint(file_path),
+            "result": result,
+        }
+        self._write(self._path(file_id), rec)
+
+    def discard(self, file_id: str):
+        try:
+            os.remove(self._path(file_id))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _write(path: str, rec: Dict):
+        # escrita atômica: um worker reciclado no meio não deixa JSON quebrado
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(rec, f, ensure_ascii=False)
+        os.replace(tmp, path)
@@ -0,0 +1,315 @@
+import os
+import struct
+from typing import Optional
+
+try:
+    from python_multipart import MultipartParser
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+HEADER_PROBE_LIMIT = 1024 * 1024  # até 1MB de cabeçalho antes de desistir
+
+
+class UploadRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# =========================
+# Cabeçalhos de container
+# =========================
+
+def _wav_duration(head: bytes) -> Optional[float]:
+    """
+    RIFF/WAVE: fmt (byte_rate) + tamanho do chunk data.
+    Retorna None se ainda faltam bytes; -1.0 se não dá pra saber pelo header.
+    """
+    if len(head) < 12:
+        return None
+    if head[0:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return -1.0  # RF64 e afins: fica pro sf.info no final
+
+    pos = 12
+    byte_rate = None
+    while pos + 8 <= len(head):
+        cid = head[pos:pos + 4]
+        size = struct.unpack_from("<I", head, pos + 4)[0]
+
+        if cid == b"fmt ":
+            if pos + 8 + 12 > len(head):
+                return None
+            byte_rate = struct.unpack_from("<I", head, pos + 8 + 8)[0]
+        elif cid == b"data":
+            if not byte_rate or size == 0xFFFFFFFF:
+                return -1.0
+            return size / byte_rate
+
+        pos += 8 + size + (size & 1)
+
+    return None
+
+
+def _flac_duration(head: bytes) -> Optional[float]:
+    """
+    fLaC + STREAMINFO (sempre o primeiro bloco de metadata).
+    """
+    if len(head) < 4:
+        return None
+    if head[0:4] != b"fLaC":
+        return -1.0
+    if len(head) < 26:
+        return None
+
+    x = struct.unpack_from(">Q", head, 18)[0]
+    sr = x >> 44
+    total_samples = x & ((1 << 36) - 1)
+    if sr <= 0 or total_samples == 0:
+        return -1.0
+    return total_samples / sr
+
+
+class _OggGranuleTracker:
+    """
+    Segue as páginas Ogg conforme os bytes chegam e converte o granule
+    position da última página em segundos. OGG não traz duração no header,
+    mas o granule cresce página a página: dá pra abortar assim que o áudio
+    recebido passa do limite.
+    """
+
+    def __init__(self):
+        self.sample_rate = None
+        self.duration = 0.0
+        self._buf = bytearray()
+        self._need = 27
+        self._stage = "header"  # header -> segments -> body
+        self._body_left = 0
+        self._first_body = None
+        self.invalid = False
+
+    def feed(self, chunk: bytes):
+        i = 0
+        n = len(chunk)
+        while i < n and not self.invalid:
+            if self._stage == "body":
+                take = min(self._body_left, n - i)
+                if self._first_body is not None:
+                    self._first_body += chunk[i:i + take]
+                i += take
+                self._body_left -= take
+                if self._body_left == 0:
+                    if self._first_body is not None:
+                        self._read_id_header(bytes(self._first_body))
+                        self._first_body = None
+                    self._stage = "header"
+                    self._need = 27
+                continue
+
+            take = min(self._need - len(self._buf), n - i)
+            self._buf += chunk[i:i + take]
+            i += take
+            if len(self._buf) < self._need:
+                continue
+
+            if self._stage == "header":
+                if self._buf[0:4] != b"OggS":
+                    self.invalid = True
+                    return
+                self._need = 27 + self._buf[26]
+                self._stage = "segments"
+                if self._need > 27:
+                    continue
+
+            # cabeçalho completo (27 + tabela de segmentos)
+            granule = struct.unpack_from("<q", self._buf, 6)[0]
+            if granule > 0 and self.sample_rate:
+                self.duration = granule / self.sample_rate
+            self._body_left = sum(self._buf[27:])
+            if self.sample_rate is None and self._first_body is None:
+                self._first_body = bytearray()
+            self._buf = bytearray()
+            self._stage = "body"
+            if self._body_left == 0:
+                self._stage = "header"
+                self._need = 27
+
+    def _read_id_header(self, body: bytes):
+        if body.startswith(b"\x01vorbis") and len(body) >= 16:
+            self.sample_rate = struct.unpack_from("<I", body, 12)[0] or None
+        elif body.startswith(b"OpusHead"):
+            self.sample_rate = 48000  # granule do Opus é sempre 48k
+        else:
+            self.invalid = True
+
+
+class AudioHeaderProbe:
+    """
+    Estima a duração a partir dos primeiros bytes do upload (WAV/FLAC)
+    ou dos granules das páginas (OGG). Formatos sem probe ficam com
+    duration None e são validados pelo sf.info depois.
+    """
+
+    def __init__(self, ext: str):
+        self.ext = ext
+        self.duration: Optional[float] = None
+        self._head = bytearray()
+        self._done = ext not in (".wav", ".wave", ".flac", ".ogg", ".oga", ".opus")
+        self._ogg = _OggGranuleTracker() if ext in (".ogg", ".oga", ".opus") else None
+
+    def feed(self, chunk: bytes) -> Optional[float]:
+        if self._done:
+            return self.duration
+
+        if self._ogg is not None:
+            self._ogg.feed(chunk)
+            if self._ogg.invalid:
+                self._done = True
+            elif self._ogg.sample_rate:
+                self.duration = self._ogg.duration
+            return self.duration
+
+        self._head += chunk[:HEADER_PROBE_LIMIT - len(self._head)]
+        parse = _wav_duration if self.ext in (".wav", ".wave") else _flac_duration
+        dur = parse(bytes(self._head))
+        if dur is not None:
+            self._done = True
+            self.duration = dur if dur >= 0 else None
+        elif len(self._head) >= HEADER_PROBE_LIMIT:
+            self._done = True
+        return self.duration
+
+
+# =========================
+# Multipart em streaming
+# =========================
+
+class StreamingAudioUpload:
+    """
+    Recebe o corpo multipart em pedaços (request.stream()), grava o campo
+    "file" direto no disco e aplica os limites de bytes e de duração
+    durante a recepção. Memória por upload = 1 chunk, independente do
+    tamanho do arquivo.
+    """
+
+    def __init__(
+        self,
+        content_type: str,
+        upload_dir: str,
+        file_id: str,
+        max_bytes: int,
+        max_duration_seconds: float,
+        field_name: str = "file",
+    ):
+        ctype, params = parse_options_header(content_type or "")
+        boundary = params.get(b"boundary")
+        if ctype != b"multipart/form-data" or not boundary:
+            raise UploadRejected(400, "Envie o áudio como multipart/form-data (campo 'file')")
+
+        self.upload_dir = upload_dir
+        self.file_id = file_id
+        self.max_bytes = max_bytes
+        self.max_duration_seconds = max_duration_seconds
+        self.field_name = field_name
+
+        self.file_path: Optional[str] = None
+        self.filename: Optional[str] = None
+        self.bytes_written = 0
+        self.probe: Optional[AudioHeaderProbe] = None
+
+        self._fh = None
+        self._headers = {}
+        self._hfield = b""
+        self._hvalue = b""
+        self._in_target = False
+        self._done_target = False
+        self._error: Optional[UploadRejected] = None
+
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    # ---- callbacks do parser ----
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._hfield = b""
+        self._hvalue = b""
+
+    def _on_header_field(self, data, start, end):
+        self._hfield += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._hvalue += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._hfield.lower()] = self._hvalue
+        self._hfield = b""
+        self._hvalue = b""
+
+    def _on_headers_finished(self):
+        disp, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = params.get(b"name", b"").decode("utf-8", "replace")
+        filename = params.get(b"filename")
+        if name != self.field_name or filename is None or self._done_target:
+            return
+
+        self.filename = filename.decode("utf-8", "replace")
+        ext = os.path.splitext(self.filename)[1].lower()
+        self.file_path = os.path.join(self.upload_dir, f"{self.file_id}{ext}")
+        self.probe = AudioHeaderProbe(ext)
+        self._fh = open(self.file_path, "wb")
+        self._in_target = True
+
+    def _on_part_data(self, data, start, end):
+        if not self._in_target or self._error:
+            return
+
+        chunk = data[start:end]
+        self.bytes_written += len(chunk)
+        if self.bytes_written > self.max_bytes:
+            self._error = UploadRejected(413, "Arquivo muito grande")
+            return
+
+        self._fh.write(chunk)
+
+        dur = self.probe.feed(chunk)
+        if dur is not None and dur > self.max_duration_seconds:
+            self._error = UploadRejected(400, "Áudio excede 7 minutos")
+
+    def _on_part_end(self):
+        if self._in_target:
+            self._fh.close()
+            self._fh = None
+            self._in_target = False
+            self._done_target = True
+
+    # ---- API ----
+
+    def write(self, chunk: bytes):
+        self._parser.write(chunk)
+        if self._error:
+            raise self._error
+
+    def finish(self) -> str:
+        self._parser.finalize()
+        if self._error:
+            raise self._error
+        if not self._done_target or not self.file_path:
+            raise UploadRejected(400, "Campo 'file' ausente no upload")
+        return self.file_path
+
+    def abort(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if self.file_path and os.path.isfile(self.file_path):
+            os.remove(self.file_path)
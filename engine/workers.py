@@ -0,0 +1,112 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+def _run_reporting(fn: Callable, stats_fn: Callable[[], Dict], args: tuple):
+    # roda no worker: devolve junto o estado do processo (ex.: cache de sinal)
+    return fn(*args), os.getpid(), stats_fn()
+
+
+class AnalysisPool:
+    """
+    Executor para trabalho CPU-bound (decode + NumPy) fora do event loop.
+
+    max_workers > 0: ProcessPoolExecutor (spawn, sem herdar o estado do app)
+    max_workers = 0: threads no próprio processo (compartilha o cache de sinal)
+
+    max_pending limita tarefas na fila + em execução; acima disso run()
+    levanta PoolSaturated na hora, sem enfileirar (backpressure).
+
+    worker_stats: função (picklável) com o estado de um processo; em modo
+    processo cada worker devolve o seu junto com o resultado de cada tarefa
+    e worker_stats() mostra a soma.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, worker_stats: Optional[Callable[[], Dict]] = None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._stats_fn = worker_stats
+        self._worker_stats: Dict[int, Dict] = {}  # pid -> último estado recebido
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.max_workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(thread_name_prefix="analysis")
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolSaturated()
+
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            if self.max_workers > 0 and self._stats_fn is not None:
+                result, pid, stats = await loop.run_in_executor(
+                    self._get_executor(), _run_reporting, fn, self._stats_fn, args
+                )
+                self._worker_stats[pid] = stats
+            else:
+                result = await loop.run_in_executor(self._get_executor(), fn, *args)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self._pending -= 1
+
+        self.completed += 1
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "mode": "process" if self.max_workers > 0 else "thread",
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    def worker_stats(self) -> Optional[Dict]:
+        """
+        Modo thread: o estado do próprio processo. Modo processo: soma dos
+        campos numéricos do último estado de cada worker (worker que ainda
+        não rodou nenhuma tarefa não aparece).
+        """
+        if self._stats_fn is None:
+            return None
+        if self.max_workers <= 0:
+            return dict(self._stats_fn(), processes=1)
+
+        total: Dict = {}
+        for stats in self._worker_stats.values():
+            for k, v in stats.items():
+                if isinstance(v, (int, float)):
+                    total[k] = total.get(k, 0) + v
+        total["processes"] = len(self._worker_stats)
+        return total
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._worker_stats.clear()
@@ -0,0 +1,418 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CORPUS_DB_FILENAME = "corpus_index.sqlite3"
+
+SORT_COLUMNS = {
+    "created_at": "p.created_at",
+    "title": "p.title_norm",
+    "tempo": "p.tempo",
+    "audio_count": "p.audio_count",
+    "audio_seconds": "p.total_audio_seconds",
+}
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS corpora ("
+    " corpus_id TEXT PRIMARY KEY,"
+    " kind TEXT NOT NULL,"  # corpus | master
+    " path TEXT NOT NULL,"
+    " created_at INTEGER NOT NULL,"
+    " project_count INTEGER NOT NULL)",
+
+    "CREATE TABLE IF NOT EXISTS projects ("
+    " corpus_id TEXT NOT NULL,"
+    " project_id TEXT NOT NULL,"
+    " kind TEXT NOT NULL,"
+    " latest INTEGER NOT NULL DEFAULT 0,"  # 1 = versão mais nova do projeto entre os corpus
+    " title TEXT,"
+    " title_norm TEXT,"
+    " flp_sha TEXT,"
+    " has_flp INTEGER,"
+    " flp_count INTEGER,"
+    " audio_count INTEGER,"
+    " other_count INTEGER,"
+    " total_audio_seconds REAL,"
+    " archive_size_bytes INTEGER,"
+    " tempo REAL,"
+    " ppq INTEGER,"
+    " time_signature TEXT,"
+    " channel_count INTEGER,"
+    " pattern_count INTEGER,"
+    " note_count INTEGER,"
+    " probe_mode TEXT,"
+    " project_file TEXT,"
+    " created_at INTEGER,"
+    " PRIMARY KEY (corpus_id, project_id))",
+
+    "CREATE TABLE IF NOT EXISTS project_sample_rates ("
+    " corpus_id TEXT NOT NULL,"
+    " project_id TEXT NOT NULL,"
+    " sample_rate INTEGER NOT NULL,"
+    " file_count INTEGER NOT NULL,"
+    " PRIMARY KEY (corpus_id, project_id, sample_rate))",
+
+    "CREATE INDEX IF NOT EXISTS idx_projects_title ON projects (title_norm)",
+    "CREATE INDEX IF NOT EXISTS idx_projects_flp_sha ON projects (flp_sha)",
+    "CREATE INDEX IF NOT EXISTS idx_projects_tempo ON projects (tempo)",
+    "CREATE INDEX IF NOT EXISTS idx_projects_audio_count ON projects (audio_count)",
+    "CREATE INDEX IF NOT EXISTS idx_projects_latest ON projects (latest, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_projects_project_id ON projects (project_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sample_rates ON project_sample_rates (sample_rate, corpus_id, project_id)",
+]
+
+
+def _norm(s: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", (s or "").lower().strip())
+
+
+def _main_flp_sha(pj: Dict) -> Optional[str]:
+    flps = pj.get("flp_files") or []
+    if not flps:
+        return None
+    return max(flps, key=lambda x: x.get("size_bytes", 0)).get("sha256")
+
+
+def project_row(corpus_id: str, kind: str, pj: Dict, project_file: Optional[str]) -> Tuple[Dict, List[Tuple[int, int]]]:
+    """
+    JSON de projeto (ou entrada do índice com stats) -> linha da tabela
+    projects + [(sample_rate, nº de arquivos)].
+    """
+    st = pj.get("stats") or {}
+    row = {
+        "corpus_id": corpus_id,
+        "project_id": pj.get("project_id") or os.path.splitext(os.path.basename(project_file or ""))[0],
+        "kind": kind,
+        "title": pj.get("title"),
+        "title_norm": _norm(pj.get("title")),
+        "flp_sha": pj.get("flp_sha") or _main_flp_sha(pj),
+        "has_flp": int(bool(st.get("has_flp"))),
+        "flp_count": st.get("flp_count"),
+        "audio_count": st.get("audio_count"),
+        "other_count": st.get("other_count"),
+        "total_audio_seconds": st.get("total_audio_duration_seconds_est"),
+        "archive_size_bytes": st.get("archive_size_bytes"),
+        "tempo": st.get("flp_tempo"),
+        "ppq": st.get("flp_ppq"),
+        "time_signature": st.get("flp_time_signature"),
+        "channel_count": st.get("flp_channel_count"),
+        "pattern_count": st.get("flp_pattern_count"),
+        "note_count": st.get("flp_note_count"),
+        "probe_mode": st.get("audio_probe_mode"),
+        "project_file": project_file,
+        "created_at": pj.get("created_at"),
+    }
+    rates = []
+    for sr, n in (st.get("sample_rate_histogram") or {}).items():
+        try:
+            rates.append((int(sr), int(n)))
+        except (TypeError, ValueError):
+            continue
+    return row, rates
+
+
+class CorpusDB:
+    """
+    Índice consultável de todos os corpus/masters de um output_dir, em
+    <output_dir>/corpus_index.sqlite3. Os JSONs continuam sendo a fonte
+    da verdade; o SQLite é derivado (rebuild() refaz a partir do disco).
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        os.makedirs(base_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(base_dir, CORPUS_DB_FILENAME),
+            check_same_thread=False,
+            isolation_level=None,  # autocommit; escrita em lote usa BEGIN explícito
+            timeout=10,
+        )
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        for stmt in _SCHEMA:
+            self._db.execute(stmt)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ---------- escrita ----------
+
+    def add_corpus(
+        self,
+        corpus_id: str,
+        kind: str,
+        path: str,
+        created_at: int,
+        projects: Iterable[Tuple[Dict, Optional[str]]],
+    ) -> int:
+        """
+        projects: (json do projeto ou entrada do índice, caminho do JSON).
+        Substitui o que já existir desse corpus_id. Em kind="corpus", a
+        versão nova de cada project_id passa a ser a latest.
+        """
+        rows = [project_row(corpus_id, kind, pj, pf) for pj, pf in projects]
+        with self._lock:
+            cur = self._db.cursor()
+            cur.execute("BEGIN")
+            try:
+                cur.execute("DELETE FROM projects WHERE corpus_id = ?", (corpus_id,))
+                cur.execute("DELETE FROM project_sample_rates WHERE corpus_id = ?", (corpus_id,))
+                cur.execute(
+                    "INSERT OR REPLACE INTO corpora VALUES (?, ?, ?, ?, ?)",
+                    (corpus_id, kind, path, int(created_at), len(rows)),
+                )
+                for row, rates in rows:
+                    if kind == "corpus":
+                        # o mais novo ganha (rebuild vai em ordem de created_at)
+                        newer = cur.execute(
+                            "SELECT 1 FROM projects p JOIN corpora c ON c.corpus_id = p.corpus_id"
+                            " WHERE p.project_id = ? AND p.latest = 1 AND c.created_at > ?",
+                            (row["project_id"], int(created_at)),
+                        ).fetchone()
+                        if newer is None:
+                            cur.execute(
+                                "UPDATE projects SET latest = 0 WHERE project_id = ? AND kind = 'corpus'",
+                                (row["project_id"],),
+                            )
+                            row["latest"] = 1
+                    row.setdefault("latest", 0)
+                    cur.execute(
+                        "INSERT OR REPLACE INTO projects (" + ", ".join(row) + ") VALUES ("
+                        + ", ".join(f":{k}" for k in row) + ")",
+                        row,
+                    )
+                    cur.executemany(
+                        "INSERT OR REPLACE INTO project_sample_rates VALUES (?, ?, ?, ?)",
+                        [(corpus_id, row["project_id"], sr, n) for sr, n in rates],
+                    )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            # estatísticas pro planner: sem isso ele prefere idx_projects_latest
+            # a idx_projects_tempo e varre todos os projetos
+            cur.execute("ANALYZE")
+        return len(rows)
+
+    def index_corpus_dir(self, corpus_path: str) -> int:
+        """
+        Indexa um flp_corpus_*/ ou flp_master_*/ já escrito no disco.
+        """
+        name = os.path.basename(corpus_path.rstrip("/"))
+        kind = "master" if name.startswith("flp_master_") else "corpus"
+        index_file = os.path.join(corpus_path, "master_index.json" if kind == "master" else "corpus_index.json")
+        created_at = int(os.path.getmtime(corpus_path))
+        if os.path.isfile(index_file):
+            with open(index_file, "r", encoding="utf-8") as f:
+                created_at = int(json.load(f).get("created_at") or created_at)
+
+        pdir = os.path.join(corpus_path, "projects")
+        projects = []
+        if os.path.isdir(pdir):
+            for fn in sorted(os.listdir(pdir)):
+                if not fn.endswith(".json"):
+                    continue
+                fp = os.path.join(pdir, fn)
+                try:
+                    with open(fp, "r", encoding="utf-8") as f:
+                        projects.append((json.load(f), fp))
+                except Exception:
+                    continue
+        return self.add_corpus(name, kind, corpus_path, created_at, projects)
+
+    def rebuild(self) -> Dict:
+        """
+        Refaz o índice a partir dos flp_corpus_* / flp_master_* do base_dir.
+        """
+        found = []
+        for name in os.listdir(self.base_dir):
+            full = os.path.join(self.base_dir, name)
+            if os.path.isdir(full) and name.startswith(("flp_corpus_", "flp_master_")):
+                found.append(full)
+
+        with self._lock:
+            self._db.execute("DELETE FROM projects")
+            self._db.execute("DELETE FROM project_sample_rates")
+            self._db.execute("DELETE FROM corpora")
+
+        total = 0
+        for full in sorted(found, key=os.path.getmtime):
+            total += self.index_corpus_dir(full)
+        return {"corpora": len(found), "projects": total}
+
+    # ---------- leitura ----------
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM corpora LIMIT 1").fetchone() is None
+
+    def list_corpora(self) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM corpora ORDER BY created_at").fetchall()
+        return [dict(r) for r in rows]
+
+    def search(
+        self,
+        q: Optional[str] = None,
+        corpus_id: Optional[str] = None,
+        kind: str = "corpus",
+        latest_only: bool = True,
+        flp_sha: Optional[str] = None,
+        has_flp: Optional[bool] = None,
+        tempo_min: Optional[float] = None,
+        tempo_max: Optional[float] = None,
+        sample_rate: Optional[int] = None,
+        min_audio: Optional[int] = None,
+        max_audio: Optional[int] = None,
+        sort: str = "created_at",
+        desc: bool = True,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Dict:
+        """
+        Filtros combinados com AND; paginação por limit/offset. latest_only
+        (só faz sentido sem corpus_id) esconde versões antigas do mesmo
+        projeto que ficaram em corpus anteriores.
+        """
+        where = []
+        args: List = []
+
+        if corpus_id:
+            where.append("p.corpus_id = ?")
+            args.append(corpus_id)
+        else:
+            where.append("p.kind = ?")
+            args.append(kind)
+            if latest_only and kind == "corpus":
+                where.append("p.latest = 1")
+        if q:
+            where.append("p.title_norm LIKE ?")
+            args.append(f"%{_norm(q)}%")
+        if flp_sha:
+            where.append("p.flp_sha = ?")
+            args.append(flp_sha)
+        if has_flp is not None:
+            where.append("p.has_flp = ?")
+            args.append(int(has_flp))
+        if tempo_min is not None:
+            where.append("p.tempo >= ?")
+            args.append(tempo_min)
+        if tempo_max is not None:
+            where.append("p.tempo <= ?")
+            args.append(tempo_max)
+        if min_audio is not None:
+            where.append("p.audio_count >= ?")
+            args.append(min_audio)
+        if max_audio is not None:
+            where.append("p.audio_count <= ?")
+            args.append(max_audio)
+        if sample_rate is not None:
+            where.append(
+                "EXISTS (SELECT 1 FROM project_sample_rates s WHERE s.sample_rate = ?"
+                " AND s.corpus_id = p.corpus_id AND s.project_id = p.project_id)"
+            )
+            args.append(int(sample_rate))
+
+        clause = " WHERE " + " AND ".join(where) if where else ""
+        order = f" ORDER BY {SORT_COLUMNS.get(sort, 'p.created_at')} {'DESC' if desc else 'ASC'}, p.project_id"
+
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM projects p{clause}", args).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT p.* FROM projects p{clause}{order} LIMIT ? OFFSET ?",
+                args + [int(limit), int(offset)],
+            ).fetchall()
+            items = [dict(r) for r in rows]
+            for item in items:
+                item["sample_rates"] = {
+                    str(r["sample_rate"]): r["file_count"]
+                    for r in self._db.execute(
+                        "SELECT sample_rate, file_count FROM project_sample_rates"
+                        " WHERE corpus_id = ? AND project_id = ?",
+                        (item["corpus_id"], item["project_id"]),
+                    )
+                }
+
+        for item in items:
+            item.pop("title_norm", None)
+            item["has_flp"] = bool(item["has_flp"])
+            item["latest"] = bool(item["latest"])
+        return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+    def get_project(self, project_id: str, corpus_id: Optional[str] = None) -> Optional[Dict]:
+        with self._lock:
+            if corpus_id:
+                row = self._db.execute(
+                    "SELECT * FROM projects WHERE project_id = ? AND corpus_id = ?", (project_id, corpus_id)
+                ).fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT * FROM projects WHERE project_id = ? ORDER BY latest DESC, created_at DESC LIMIT 1",
+                    (project_id,),
+                ).fetchone()
+        return dict(row) if row else None
+
+
+# =========================
+# Benchmark
+# =========================
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+    import time
+
+    ap = argparse.ArgumentParser(description="Índice SQLite do corpus: rebuild e benchmark de consultas")
+    ap.add_argument("--base_dir", default=None, help="Pasta com flp_corpus_* (ex.: corpus_out) pra reindexar")
+    ap.add_argument("--bench", type=int, default=0, help="Nº de projetos sintéticos pro benchmark")
+    args = ap.parse_args()
+
+    if args.base_dir:
+        t0 = time.perf_counter()
+        print(CorpusDB(args.base_dir).rebuild(), f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    if args.bench:
+        rng = random.Random(0)
+        tmp = tempfile.mkdtemp(prefix="corpus_db_bench_")
+        db = CorpusDB(tmp)
+        per_corpus = 5000
+        t0 = time.perf_counter()
+        for c in range(0, args.bench, per_corpus):
+            projects = []
+            for i in range(c, min(c + per_corpus, args.bench)):
+                sr = rng.choice(["44100", "48000", "96000"])
+                projects.append(({
+                    "project_id": f"proj-{i % (args.bench * 3 // 4):08d}",  # ~25% reaparece em corpus novos
+                    "title": f"Phonk Kong - Montagem {i} {rng.choice(['Lunar', 'Acelerada', 'Direcao'])}",
+                    "created_at": 1700000000 + c,
+                    "flp_files": [{"sha256": f"{i:064x}", "size_bytes": 1000}],
+                    "stats": {
+                        "has_flp": True,
+                        "audio_count": rng.randrange(0, 300),
+                        "flp_tempo": float(rng.randrange(80, 180)),
+                        "sample_rate_histogram": {sr: rng.randrange(1, 30), "44100": 1},
+                    },
+                }, None))
+            db.add_corpus(f"flp_corpus_{1700000000 + c}", "corpus", tmp, 1700000000 + c, projects)
+        print(f"indexação: {args.bench} projetos em {(time.perf_counter() - t0):.2f}s")
+
+        queries = {
+            "130 BPM + 48k": dict(tempo_min=129.5, tempo_max=130.5, sample_rate=48000),
+            "título 'lunar'": dict(q="lunar"),
+            "audio >= 200, ordenado por tempo": dict(min_audio=200, sort="tempo"),
+            "página 50": dict(offset=50 * 50),
+            "flp_sha": dict(flp_sha=f"{123:064x}"),
+        }
+        for name, kw in queries.items():
+            best = float("inf")
+            for _ in range(5):
+                t = time.perf_counter()
+                out = db.search(**kw)
+                best = min(best, time.perf_counter() - t)
+            print(f"{best * 1000:7.2f} ms  total={out['total']:6d}  {name}")
@@ -0,0 +1,457 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# =========================
+# Configurações
+# =========================
+
+DOWNLOAD_SEGMENTS = int(os.getenv("FLP_DOWNLOAD_SEGMENTS", "4"))  # conexões em paralelo (servidor com Range)
+DOWNLOAD_MIN_SEGMENT_BYTES = 32 * 1024 * 1024  # arquivo menor que 2x isso: uma conexão só
+DOWNLOAD_RETRIES = 5  # por segmento; cada retry continua de onde parou
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+STATE_FLUSH_SECONDS = 2.0  # estado do .part vai pro disco no máximo a cada 2s
+HASH_POLL_SECONDS = 0.5
+
+ProgressFn = Optional[Callable[[int, Optional[int]], None]]
+
+_TRANSIENT = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(detail)
+
+
+class _Changed(Exception):
+    # arquivo mudou no servidor (If-Range falhou): o .part não serve mais
+    pass
+
+
+class _Stopped(Exception):
+    # outro segmento falhou: este para e deixa a posição salva
+    pass
+
+
+def pooled_session() -> requests.Session:
+    """
+    Session compartilhada entre downloads (keep-alive + pool por host).
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = new_session()
+        return _session
+
+
+def new_session() -> requests.Session:
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(8, DOWNLOAD_SEGMENTS * 2))
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def partial_path(partial_dir: str, key: str) -> str:
+    """
+    .part de um download, pela chave (URL de origem): outro job com o
+    mesmo link continua de onde o anterior parou.
+    """
+    return os.path.join(partial_dir, f"partial_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]}.part")
+
+
+def _content_range_total(r: requests.Response) -> Optional[int]:
+    m = re.match(r"bytes \d+-\d+/(\d+)", r.headers.get("content-range", ""))
+    return int(m.group(1)) if m else None
+
+
+class _Segment:
+    def __init__(self, start: int, end: Optional[int], pos: Optional[int] = None):
+        self.start = start
+        self.end = end  # exclusivo; None = até o fim (tamanho desconhecido)
+        self.pos = start if pos is None else pos
+        self.done = end is not None and self.pos >= end
+
+    def as_json(self) -> List:
+        return [self.start, self.end, self.pos]
+
+
+class _Download:
+    """
+    Um download: .part pré-alocado + <.part>.json com tamanho, validadores
+    (ETag/Last-Modified) e posição de cada segmento.
+    """
+
+    def __init__(self, session, url, params, headers, part, max_bytes, segments, progress):
+        self.session = session
+        self.url = url
+        self.params = params
+        self.headers = dict(headers or {})
+        self.part = part
+        self.state_path = f"{part}.json"
+        self.max_bytes = max_bytes
+        self.max_segments = max(1, segments)
+        self.progress = progress
+        self.total: Optional[int] = None
+        self.validator: Optional[str] = None
+        self.ranges = False
+        self.segments: List[_Segment] = []
+        self.resumed_from = 0
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._stop = threading.Event()
+
+    # ---------- estado ----------
+
+    def _load_state(self) -> bool:
+        if not (os.path.isfile(self.state_path) and os.path.isfile(self.part)):
+            return False
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                st = json.load(f)
+        except Exception:
+            return False
+        if not st.get("ranges") or not st.get("validator"):
+            return False  # sem Range/validador não dá pra continuar com segurança
+        self.total = st["total"]
+        self.validator = st["validator"]
+        self.ranges = True
+        self.segments = [_Segment(s, e, p) for s, e, p in st["segments"]]
+        self.resumed_from = self.downloaded()
+        return True
+
+    def _flush_state(self, force: bool = False):
+        with self._lock:
+            if not force and time.monotonic() - self._last_flush < STATE_FLUSH_SECONDS:
+                return
+            tmp = f"{self.state_path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "total": self.total,
+                    "validator": self.validator,
+                    "ranges": self.ranges,
+                    "segments": [s.as_json() for s in self.segments],
+                }, f)
+            os.replace(tmp, self.state_path)
+            self._last_flush = time.monotonic()
+
+    def _discard(self):
+        for p in (self.part, self.state_path):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+        self.segments = []
+        self.resumed_from = 0
+
+    def downloaded(self) -> int:
+        return sum(s.pos - s.start for s in self.segments)
+
+    def contiguous(self) -> int:
+        # bytes do início do arquivo que já estão no disco sem buraco
+        for s in self.segments:
+            if not s.done:
+                return s.pos
+        return self.segments[-1].pos if self.segments else 0
+
+    # ---------- HTTP ----------
+
+    def _get(self, start: int, end: Optional[int], if_range: bool) -> requests.Response:
+        h = dict(self.headers)
+        h["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        if if_range and self.validator:
+            h["If-Range"] = self.validator
+        r = self.session.get(self.url, params=self.params, headers=h, stream=True, timeout=(30, 300))
+        if r.status_code not in (200, 206):
+            r.close()
+            raise DownloadError(400, f"Falha ao baixar (status {r.status_code}).")
+        return r
+
+    def _probe(self) -> requests.Response:
+        """
+        Primeira requisição: Range 0- diz se o servidor aceita ranges e o
+        tamanho total. A resposta vira o primeiro segmento.
+        """
+        r = self._get(0, None, if_range=False)
+        self.validator = r.headers.get("etag") or r.headers.get("last-modified")
+        if r.status_code == 206:
+            self.ranges = True
+            self.total = _content_range_total(r)
+        else:
+            length = r.headers.get("content-length")
+            self.total = int(length) if length and length.isdigit() else None
+        if self.total is not None and self.total > self.max_bytes:
+            r.close()
+            raise DownloadError(413, "Arquivo muito grande (limite interno).")
+
+        n = 1
+        if self.ranges and self.total and self.validator:
+            n = max(1, min(self.max_segments, self.total // DOWNLOAD_MIN_SEGMENT_BYTES))
+        if self.total is None:
+            self.segments = [_Segment(0, None)]
+        else:
+            step = -(-self.total // n)
+            self.segments = [_Segment(i, min(i + step, self.total)) for i in range(0, self.total, step)] or [_Segment(0, 0)]
+
+        with open(self.part, "wb") as f:
+            if self.total:
+                f.truncate(self.total)
+        self._flush_state(force=True)
+        return r
+
+    def _write(self, seg: _Segment, r: requests.Response):
+        with open(self.part, "r+b") as f:
+            f.seek(seg.pos)
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                if self._stop.is_set():
+                    raise _Stopped()
+                if not chunk:
+                    continue
+                if seg.end is not None:
+                    chunk = chunk[:seg.end - seg.pos]
+                f.write(chunk)
+                # o hash lê até contiguous() por outro fd: o byte só conta depois de sair do buffer
+                f.flush()
+                seg.pos += len(chunk)
+                if seg.end is None and seg.pos > self.max_bytes:
+                    raise DownloadError(413, "Arquivo muito grande (limite interno).")
+                self._flush_state()
+                if seg.end is not None and seg.pos >= seg.end:
+                    break
+        if seg.end is not None and seg.pos < seg.end:
+            raise requests.exceptions.ChunkedEncodingError("conexão fechou antes do fim do segmento")
+        seg.done = True
+
+    def _run_segment(self, seg: _Segment, first: Optional[requests.Response]):
+        attempt = 0
+        r = first
+        while not seg.done and not self._stop.is_set():
+            try:
+                if r is None:
+                    r = self._get(seg.pos, seg.end, if_range=True)
+                    if r.status_code == 200:
+                        if seg.pos > 0 or seg.start > 0:
+                            # servidor ignorou o Range: arquivo mudou (If-Range) ou sem suporte
+                            r.close()
+                            raise _Changed()
+                with r:
+                    self._write(seg, r)
+            except _Stopped:
+                return
+            except _TRANSIENT:
+                attempt += 1
+                if attempt > DOWNLOAD_RETRIES or not self.ranges:
+                    raise
+                time.sleep(min(30.0, 0.5 * 2 ** attempt))
+            r = None
+
+    # ---------- principal ----------
+
+    def run(self) -> Dict:
+        first = None
+        if not self._load_state():
+            self._discard()
+            first = self._probe()
+
+        h = hashlib.sha256()
+        hashed = 0
+        todo = [s for s in self.segments if not s.done]
+        with ThreadPoolExecutor(max_workers=max(1, len(todo)), thread_name_prefix="flp_dl") as ex:
+            futures = [ex.submit(self._run_segment, s, first if s.start == 0 and first is not None else None) for s in todo]
+            if first is not None and not any(s.start == 0 for s in todo):
+                first.close()
+            with open(self.part, "rb") as f:
+                while True:
+                    finished, pending = wait(futures, timeout=HASH_POLL_SECONDS, return_when=FIRST_EXCEPTION)
+                    # sha256 acompanha o prefixo contínuo enquanto o resto baixa
+                    upto = self.contiguous()
+                    f.seek(hashed)
+                    while hashed < upto:
+                        b = f.read(min(DOWNLOAD_CHUNK_BYTES, upto - hashed))
+                        if not b:
+                            break
+                        h.update(b)
+                        hashed += len(b)
+                    if self.progress:
+                        self.progress(self.downloaded(), self.total)
+                    failed = [fut for fut in finished if fut.exception()]
+                    if failed:
+                        self._stop.set()
+                        wait(pending)
+                        self._flush_state(force=True)
+                        raise failed[0].exception()
+                    if not pending:
+                        break
+
+        size = self.downloaded()
+        if self.total is not None and size != self.total:
+            self._flush_state(force=True)
+            raise DownloadError(400, f"Download incompleto ({size} de {self.total} bytes).")
+        return {"bytes": size, "sha256": h.hexdigest(), "resumed_from": self.resumed_from,
+                "segments": len(self.segments), "ranges": self.ranges}
+
+
+def download(
+    url: str,
+    dst_path: str,
+    max_bytes: int = 2 * 1024**3,
+    progress: ProgressFn = None,
+    session: Optional[requests.Session] = None,
+    params: Optional[Dict] = None,
+    headers: Optional[Dict] = None,
+    partial_dir: Optional[str] = None,
+    key: Optional[str] = None,
+    segments: int = DOWNLOAD_SEGMENTS,
+) -> Dict:
+    """
+    Baixa url -> dst_path com retomada. Bytes parciais ficam em
+    <partial_dir>/partial_<hash da chave>.part (+ .json com o estado);
+    chamar de novo com a mesma chave (padrão: url) continua do ponto onde
+    parou, desde que o servidor aceite Range e o arquivo não tenha mudado
+    (ETag/Last-Modified via If-Range). Servidor com Range e arquivo grande:
+    `segments` conexões em paralelo. progress(bytes_baixados, total|None).
+    Retorna {bytes, sha256, resumed_from, segments, ranges}.
+    """
+    partial_dir = partial_dir or os.path.dirname(os.path.abspath(dst_path))
+    os.makedirs(partial_dir, exist_ok=True)
+    part = partial_path(partial_dir, key or url)
+    dl = _Download(session or pooled_session(), url, params, headers, part, max_bytes, segments, progress)
+    try:
+        info = dl.run()
+    except _Changed:
+        # mudou desde o .part: recomeça do zero uma vez
+        dl._discard()
+        dl = _Download(session or pooled_session(), url, params, headers, part, max_bytes, segments, progress)
+        info = dl.run()
+    except DownloadError as e:
+        if e.status_code == 413:
+            dl._discard()
+        raise
+    os.replace(part, dst_path)
+    try:
+        os.remove(f"{part}.json")
+    except FileNotFoundError:
+        pass
+    return info
+
+
+# =========================
+# Harness: servidor local com Range e queda de conexão
+# =========================
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    ap = argparse.ArgumentParser(description="Download com retomada contra um servidor local com Range")
+    ap.add_argument("--size_mb", type=int, default=96)
+    ap.add_argument("--segments", type=int, default=DOWNLOAD_SEGMENTS)
+    ap.add_argument("--latency_ms", type=float, default=2.0, help="atraso por chunk de 64KB (simula banda)")
+    args = ap.parse_args()
+
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    expected = hashlib.sha256(payload).hexdigest()
+    server_cfg = {"ranges": True, "drop_after": None, "etag": '"v1"'}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *a):
+            pass
+
+        def do_GET(self):
+            start, end = 0, len(payload) - 1
+            m = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+            if_range = self.headers.get("If-Range")
+            partial = bool(m) and server_cfg["ranges"] and (if_range is None or if_range == server_cfg["etag"])
+            if partial:
+                start = int(m.group(1))
+                end = int(m.group(2)) if m.group(2) else end
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+            else:
+                self.send_response(200)
+            if server_cfg["ranges"]:
+                self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", server_cfg["etag"])
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+            sent = 0
+            pos = start
+            try:
+                while pos <= end:
+                    if server_cfg["drop_after"] is not None and sent >= server_cfg["drop_after"]:
+                        self.close_connection = True
+                        return  # derruba no meio
+                    b = payload[pos:min(pos + 65536, end + 1)]
+                    self.wfile.write(b)
+                    pos += len(b)
+                    sent += len(b)
+                    time.sleep(args.latency_ms / 1000.0)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{srv.server_port}/pack.zip"
+    tmp = tempfile.mkdtemp(prefix="flp_dl_")
+
+    def run(label, **kw):
+        dst = os.path.join(tmp, "pack.zip")
+        t = time.perf_counter()
+        try:
+            info = download(url, dst, partial_dir=tmp, **kw)
+        except Exception as e:
+            print(f"{label:38s} falhou: {type(e).__name__}: {e}")
+            return None
+        ok = info["sha256"] == expected and os.path.getsize(dst) == len(payload)
+        print(f"{label:38s} {'OK  ' if ok else 'FAIL'} {time.perf_counter() - t:6.2f}s "
+              f"segments={info['segments']} resumed_from={info['resumed_from']}")
+        os.remove(dst)
+        return info
+
+    run("1 conexão", segments=1)
+    run(f"{args.segments} segmentos", segments=args.segments)
+
+    # queda no meio: o job falha, o .part fica; a próxima chamada continua
+    server_cfg["drop_after"] = len(payload) // 3
+    DOWNLOAD_RETRIES = 0  # sem retry: simula o job morrendo
+    run("queda aos 1/3 (sem retry)", segments=1)
+    server_cfg["drop_after"] = None
+    run("retoma do .part", segments=1)
+
+    # queda com retry: continua sozinho via Range
+    DOWNLOAD_RETRIES = 5
+    server_cfg["drop_after"] = len(payload) // 5
+    run("quedas a cada 1/5 (com retry)", segments=args.segments)
+    server_cfg["drop_after"] = None
+
+    # arquivo trocado no servidor entre a queda e a retomada
+    server_cfg["drop_after"] = len(payload) // 2
+    DOWNLOAD_RETRIES = 0
+    run("queda antes da troca", segments=1)
+    server_cfg["drop_after"] = None
+    server_cfg["etag"] = '"v2"'
+    run("ETag mudou: recomeça", segments=1)
+    DOWNLOAD_RETRIES = 5
+
+    server_cfg["ranges"] = False
+    run("servidor sem Range", segments=args.segments)
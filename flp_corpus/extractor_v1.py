@@ -1,21 +1,48 @@
+import io
 import os
 import re
+import sys
 import json
 import time
 import shutil
+import sqlite3
 import zipfile
 import hashlib
 import tempfile
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional, Tuple
+import functools
+import queue
+import threading
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, asdict, field, fields
+from collections import deque
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple, Union
 
 import numpy as np
 import soundfile as sf
 
+if not __package__:
+    # rodando como script (python flp_corpus/extractor_v1.py): raiz do repo no path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flp_corpus.manifest import CorpusManifest, zip_main_flp
+from flp_corpus.corpus_db import CorpusDB
+from flp_corpus.storage import CorpusStorage, storage_from_spec
+from flp_corpus.flp_parser import flp_summary
+
 
 AUDIO_EXTS = {".wav", ".mp3", ".ogg", ".flac", ".aif", ".aiff", ".m4a"}
 PROJECT_EXTS = {".flp"}
 ARCHIVE_EXTS = {".zip", ".rar"}
+AUDIO_MEMORY_MAX_BYTES = 64 * 1024 * 1024  # acima disso o membro é lido como stream
+NESTED_MEMORY_MAX_BYTES = 32 * 1024 * 1024  # archive interno de um pacote: até isso fica em memória
+
+# análise de áudio por ingest: header < sampled < full
+PROBE_MODES = ("header", "sampled", "full")
+PROBE_WINDOWS = 8
+PROBE_WINDOW_SECONDS = 0.5
+FLP_PARSE_MAX_BYTES = 64 * 1024 * 1024  # FLP com samples embutidos: só hash
 
 # --------- helpers ---------
 
@@ -45,28 +72,65 @@ def is_suspicious_filename(name: str) -> bool:
     ln = name.lower()
     return ln.endswith(bad)
 
-def audio_stats(path: str) -> Optional[Dict]:
+def _read_sampled(snd, frames: int, sr: int):
+    """
+    PROBE_WINDOWS janelas curtas espalhadas pelo arquivo inteiro (não só o
+    começo): ~4s decodificados em vez de até 60s.
+    """
+    win = max(1, int(PROBE_WINDOW_SECONDS * sr))
+    if frames <= PROBE_WINDOWS * win or not snd.seekable():
+        return snd.read(frames=min(frames, PROBE_WINDOWS * win), dtype="float32", always_2d=True)
+
+    blocks = []
+    for start in np.linspace(0, frames - win, PROBE_WINDOWS).astype(np.int64):
+        snd.seek(int(start))
+        blocks.append(snd.read(frames=win, dtype="float32", always_2d=True))
+    return np.concatenate(blocks)
+
+def audio_stats(path, mode: str = "full") -> Optional[Dict]:
+    """
+    path: caminho ou file-like com seek (membro de zip/rar, BytesIO).
+    Um SoundFile só: header e leitura saem do mesmo open.
+    mode:
+      header  -> só metadados (duração, sr, canais); nada é decodificado
+      sampled -> peak/rms/crest/dc de PROBE_WINDOWS janelas espalhadas
+      full    -> peak/rms/crest/dc dos primeiros 60s
+    """
+    if mode not in PROBE_MODES:
+        raise ValueError(f"probe mode inválido: {mode}")
     try:
-        info = sf.info(path)
-        sr = int(info.samplerate)
-        frames = int(info.frames)
-        ch = int(info.channels)
-        dur = frames / sr if sr > 0 else None
-
-        max_frames = min(frames, sr * 60)  # até 60s
-        data, _ = sf.read(path, frames=max_frames, dtype="float32", always_2d=True)
-        peak = float(np.max(np.abs(data))) if data.size else 0.0
-        rms = float(np.sqrt(np.mean(np.square(data)))) if data.size else 0.0
-
-        return {
-            "path": path,
+        with sf.SoundFile(path) as snd:
+            sr = int(snd.samplerate)
+            frames = int(snd.frames)
+            ch = int(snd.channels)
+            dur = frames / sr if sr > 0 else None
+
+            data = None
+            if mode == "full":
+                max_frames = min(frames, sr * 60)  # até 60s
+                data = snd.read(frames=max_frames, dtype="float32", always_2d=True)
+            elif mode == "sampled":
+                data = _read_sampled(snd, frames, sr)
+
+        out = {
+            "path": path if isinstance(path, str) else getattr(path, "name", None),
             "duration_seconds": float(dur) if dur is not None else None,
             "sample_rate": sr,
             "channels": ch,
             "frames": frames,
-            "peak": peak,
-            "rms": rms,
+            "peak": None,
+            "rms": None,
+            "crest_factor": None,
+            "dc_offset": None,
         }
+        if data is not None:
+            peak = float(np.max(np.abs(data))) if data.size else 0.0
+            rms = float(np.sqrt(np.mean(np.square(data)))) if data.size else 0.0
+            out["peak"] = peak
+            out["rms"] = rms
+            out["crest_factor"] = peak / rms if rms > 0 else None
+            out["dc_offset"] = float(np.mean(data)) if data.size else 0.0
+        return out
     except Exception:
         return None
 
@@ -93,6 +157,25 @@ class CorpusIndex:
     pending_archives: List[Dict]
     totals: Dict
 
+@dataclass(frozen=True)
+class MemoryArchive:
+    """
+    Archive interno de um pacote lido direto pra memória, sem passar pelo
+    disco. path é onde ele estaria se fosse extraído (nome, extensão e
+    source_archive do projeto saem dele, igual a um archive extraído).
+    """
+    path: str
+    data: bytes = field(repr=False, compare=False)
+
+# archive no disco (caminho) ou em memória
+Archive = Union[str, MemoryArchive]
+
+def _archive_path(archive: Archive) -> str:
+    return archive.path if isinstance(archive, MemoryArchive) else archive
+
+def _archive_size(archive: Archive) -> int:
+    return len(archive.data) if isinstance(archive, MemoryArchive) else os.path.getsize(archive)
+
 # --------- archive extraction ---------
 
 def extract_archive(archive_path: str, out_dir: str) -> Tuple[bool, str]:
@@ -141,30 +224,212 @@ def build_project_id(title: str, flp_hash: str) -> str:
     slug = re.sub(r"[^a-z0-9]+", "-", norm_name(title)).strip("-")
     return f"{slug[:60]}-{flp_hash[:8]}"
 
-def extract_project_from_archive(
-    archive_path: str,
+# --------- hash-once ---------
+
+ARCHIVE_HASH_CACHE_SIZE = 4096  # o processo da API vive muito: cache limitado (LRU)
+
+@functools.lru_cache(maxsize=ARCHIVE_HASH_CACHE_SIZE)
+def _cached_archive_sha256(path: str, size: int, mtime_ns: int) -> str:
+    return sha256_file(path)
+
+def archive_sha256(path: Archive) -> str:
+    """
+    sha256 do archive com cache LRU por (caminho, tamanho, mtime): dentro de
+    um build o archive é lido no máximo uma vez pra hash.
+    """
+    if isinstance(path, MemoryArchive):
+        return hashlib.sha256(path.data).hexdigest()
+    st = os.stat(path)
+    return _cached_archive_sha256(os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+def _hash_stream(f, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    while True:
+        b = f.read(chunk_size)
+        if not b:
+            break
+        h.update(b)
+    return h.hexdigest()
+
+def _zip_rel_path(name: str) -> str:
+    # mesmo saneamento do ZipFile.extract: o rel_path bate com o que
+    # scan_dir_for_files veria depois de um extractall
+    arcname = name.replace("/", os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    parts = (x for x in arcname.split(os.path.sep) if x not in ("", os.path.curdir, os.path.pardir))
+    return os.path.sep.join(parts)
+
+def _open_archive(archive: Archive):
+    # RarFile tem a mesma API do ZipFile (infolist/open/extract)
+    archive_path = _archive_path(archive)
+    ext = os.path.splitext(archive_path)[1].lower()
+    if ext == ".zip":
+        if isinstance(archive, MemoryArchive):
+            # BytesIO sobre bytes não copia o buffer
+            return zipfile.ZipFile(io.BytesIO(archive.data), "r")
+        return zipfile.ZipFile(archive_path, "r")
+    if ext == ".rar":
+        import rarfile  # opcional
+        return rarfile.RarFile(archive_path)
+    raise ValueError(f"unsupported_archive: {ext}")
+
+def _archive_error(archive_path: str, e: Exception) -> str:
+    ext = os.path.splitext(archive_path)[1].lower()
+    if ext == ".zip":
+        return f"zip_error: {e}"
+    if ext == ".rar":
+        return f"rar_error: {e} (no Render free pode faltar suporte; recompacta em .zip)"
+    return str(e)
+
+def _probe_audio_member(
+    z,
+    info,
+    out_dir: str,
+    stream_audio: bool,
+    read_lock=None,
+    probe_mode: str = "full",
+    extract_lock=None,
+) -> Optional[Dict]:
+    """
+    Áudio direto do archive pro soundfile, sem passar pelo disco:
+    - membro pequeno: bytes em memória (seek barato pro libsndfile)
+    - membro grande: o próprio stream do membro, se ele suportar seek
+    Só extrai pro disco (e apaga logo depois) quando o stream não tem seek
+    ou com stream_audio=False.
+    read_lock: serializa o acesso ao archive quando o leitor não é thread-safe.
+    extract_lock: serializa o extract (ZipFile cria as pastas pai sem
+    exist_ok); cada membro ainda vai pra uma subpasta própria do out_dir.
+    """
+    read_lock = read_lock or nullcontext()
+    extract_lock = extract_lock or read_lock
+    if stream_audio:
+        if info.file_size <= AUDIO_MEMORY_MAX_BYTES:
+            with read_lock:
+                data = z.read(info)
+            return audio_stats(io.BytesIO(data), probe_mode)
+        with read_lock, z.open(info, "r") as f:
+            if f.seekable():
+                return audio_stats(f, probe_mode)
+
+    member_dir = tempfile.mkdtemp(prefix="audio_", dir=out_dir)
+    try:
+        with extract_lock:
+            p = z.extract(info, member_dir)
+        return audio_stats(p, probe_mode)
+    finally:
+        shutil.rmtree(member_dir, ignore_errors=True)
+
+def scan_archive_members(
+    archive: Archive,
+    out_dir: str,
+    known_hashes: Optional[Dict[str, str]] = None,
+    stream_audio: bool = True,
+    audio_threads: int = 1,
+    probe_mode: str = "full",
+    parse_flp: bool = True,
+    known_data: Optional[Dict[str, bytes]] = None,
+) -> Dict[str, List]:
+    """
+    Lê o archive (zip ou rar) numa passada só: .flp é hasheado direto do
+    stream, áudio é analisado direto do membro (ver _probe_audio_member) e
+    o resto só precisa do tamanho, que já está no diretório do archive.
+    known_hashes: {nome do membro: sha256} já calculados (ex.: lookup do manifesto).
+    audio_threads > 1: áudios analisados em pool de threads (libsndfile e
+    zlib soltam o GIL); a ordem do resultado continua a do archive.
+    parse_flp: o .flp é lido uma vez em memória, hasheado e parseado
+    (flp_parser) a partir dos mesmos bytes; o resultado vai em "flp_data".
+    known_data: {nome do membro: bytes} já descomprimidos pelo lookup, usados
+    no lugar de ler o membro de novo.
+    contents["audio"]: lista de (rel_path, audio_stats ou None).
+    """
+    contents = {"flp": [], "audio": [], "other": [], "suspicious": []}
+    known_hashes = known_hashes or {}
+    known_data = known_data or {}
+    audio_members = []
+    with _open_archive(archive) as z:
+        for info in z.infolist():
+            if info.is_dir():
+                continue
+            rel = _zip_rel_path(info.filename)
+            if not rel:
+                continue
+            fn = os.path.basename(rel)
+            if is_suspicious_filename(fn):
+                contents["suspicious"].append(rel)
+                continue
+            ext = os.path.splitext(fn)[1].lower()
+            if ext in PROJECT_EXTS:
+                entry = {"rel_path": rel, "size_bytes": info.file_size}
+                if parse_flp and info.file_size <= FLP_PARSE_MAX_BYTES:
+                    data = known_data.get(info.filename)
+                    if data is None:
+                        data = z.read(info)
+                    entry["sha256"] = hashlib.sha256(data).hexdigest()
+                    entry["flp_data"] = flp_summary(data)
+                else:
+                    sha = known_hashes.get(info.filename)
+                    if sha is None:
+                        with z.open(info, "r") as f:
+                            sha = _hash_stream(f)
+                    entry["sha256"] = sha
+                contents["flp"].append(entry)
+            elif ext in AUDIO_EXTS:
+                audio_members.append((rel, info))
+            else:
+                contents["other"].append({"rel_path": rel, "size_bytes": info.file_size, "ext": ext})
+
+        # ZipFile aguenta leituras concorrentes de membros; rarfile não garante
+        read_lock = None if isinstance(z, zipfile.ZipFile) else threading.Lock()
+        extract_lock = read_lock or threading.Lock()
+
+        def probe(member):
+            return _probe_audio_member(z, member[1], out_dir, stream_audio, read_lock, probe_mode, extract_lock)
+
+        if audio_threads > 1 and len(audio_members) > 1:
+            with ThreadPoolExecutor(max_workers=min(audio_threads, len(audio_members))) as ex:
+                stats = list(ex.map(probe, audio_members))
+        else:
+            stats = [probe(m) for m in audio_members]
+
+    contents["audio"] = [(rel, st) for (rel, _), st in zip(audio_members, stats)]
+    return contents
+
+def build_project_ref(
+    archive: Archive,
     work_dir: str,
-    output_projects_dir: str,
-) -> Tuple[Optional[ProjectRef], Optional[Dict]]:
+    archive_sha: Optional[str] = None,
+    known_hashes: Optional[Dict[str, str]] = None,
+    stream_audio: bool = True,
+    audio_threads: int = 1,
+    probe_mode: str = "full",
+    parse_flp: bool = True,
+    known_data: Optional[Dict[str, bytes]] = None,
+) -> Tuple[Optional[ProjectRef], Optional[Dict], Optional[str]]:
+    """
+    Extrai, hasheia e analisa o archive; não escreve nada fora do work_dir
+    (seguro pra rodar em paralelo, inclusive em outro processo).
+    Retorna (projeto, pendência, sha256 do archive se foi calculado/recebido)
+    pra quem chama não precisar ler o archive de novo.
+    archive: caminho no disco ou MemoryArchive (membro de um pacote).
+    """
+    archive_path = _archive_path(archive)
     arc_name = os.path.basename(archive_path)
-    tmp = os.path.join(work_dir, f"tmp_{now_ts()}_{hashlib.md5(arc_name.encode()).hexdigest()[:8]}")
+    # hash do caminho completo: archives homônimos em subpastas diferentes
+    # podem estar sendo extraídos ao mesmo tempo
+    tmp = os.path.join(work_dir, f"tmp_{now_ts()}_{hashlib.md5(archive_path.encode()).hexdigest()[:8]}")
     safe_mkdir(tmp)
 
-    ok, msg = extract_archive(archive_path, tmp)
-    if not ok:
+    try:
+        contents = scan_archive_members(
+            archive, tmp, known_hashes, stream_audio, audio_threads, probe_mode, parse_flp, known_data
+        )
+    except Exception as e:
         shutil.rmtree(tmp, ignore_errors=True)
-        return None, {"archive": archive_path, "status": "pending", "reason": msg}
-
-    buckets = scan_dir_for_files(tmp)
+        return None, {"archive": archive_path, "status": "pending", "reason": _archive_error(archive_path, e)}, archive_sha
 
-    flp_infos = []
-    for rel in buckets["flp"]:
-        p = os.path.join(tmp, rel)
-        flp_infos.append({
-            "rel_path": rel,
-            "size_bytes": os.path.getsize(p),
-            "sha256": sha256_file(p),
-        })
+    flp_infos = contents["flp"]
 
     title = os.path.splitext(arc_name)[0]
 
@@ -172,18 +437,19 @@ def extract_project_from_archive(
     if flp_infos:
         main_flp = sorted(flp_infos, key=lambda x: x["size_bytes"], reverse=True)[0]
 
+    if not main_flp and archive_sha is None:
+        archive_sha = archive_sha256(archive)
+
     project_id = build_project_id(
         title,
-        main_flp["sha256"] if main_flp else sha256_file(archive_path)
+        main_flp["sha256"] if main_flp else archive_sha
     )
 
     audio_infos = []
     total_audio_dur = 0.0
     sr_hist = {}
 
-    for rel in buckets["audio"]:
-        p = os.path.join(tmp, rel)
-        st = audio_stats(p)
+    for rel, st in contents["audio"]:
         if st:
             st_out = dict(st)
             st_out["rel_path"] = rel
@@ -197,26 +463,30 @@ def extract_project_from_archive(
             if sr:
                 sr_hist[str(sr)] = sr_hist.get(str(sr), 0) + 1
 
-    other_infos = []
-    for rel in buckets["other"]:
-        p = os.path.join(tmp, rel)
-        other_infos.append({
-            "rel_path": rel,
-            "size_bytes": os.path.getsize(p),
-            "ext": os.path.splitext(rel)[1].lower(),
-        })
+    other_infos = contents["other"]
 
     stats = {
         "has_flp": bool(flp_infos),
         "flp_count": len(flp_infos),
         "audio_count": len(audio_infos),
         "other_count": len(other_infos),
-        "suspicious_count": len(buckets["suspicious"]),
+        "suspicious_count": len(contents["suspicious"]),
         "total_audio_duration_seconds_est": float(total_audio_dur),
         "sample_rate_histogram": sr_hist,
-        "archive_size_bytes": os.path.getsize(archive_path),
+        "archive_size_bytes": _archive_size(archive),
+        "audio_probe_mode": probe_mode,
     }
 
+    # dados musicais do FLP principal no nível do projeto (vão pro índice)
+    flp_data = (main_flp or {}).get("flp_data") or {}
+    if flp_data and "error" not in flp_data:
+        stats["flp_tempo"] = flp_data.get("tempo")
+        stats["flp_ppq"] = flp_data.get("ppq")
+        stats["flp_time_signature"] = flp_data.get("time_signature")
+        stats["flp_channel_count"] = flp_data.get("channel_count")
+        stats["flp_pattern_count"] = flp_data.get("pattern_count")
+        stats["flp_note_count"] = flp_data.get("note_count")
+
     proj = ProjectRef(
         project_id=project_id,
         title=title,
@@ -224,18 +494,34 @@ def extract_project_from_archive(
         flp_files=flp_infos,
         audio_files=audio_infos,
         other_files=other_infos,
-        suspicious_files=buckets["suspicious"],
+        suspicious_files=contents["suspicious"],
         stats=stats,
         created_at=now_ts(),
     )
 
+    shutil.rmtree(tmp, ignore_errors=True)
+    return proj, None, archive_sha
+
+def write_project_json(proj: ProjectRef, output_projects_dir: str) -> str:
     safe_mkdir(output_projects_dir)
-    out_path = os.path.join(output_projects_dir, f"{project_id}.json")
-    with open(out_path, "w", encoding="utf-8") as f:
+    out_path = os.path.join(output_projects_dir, f"{proj.project_id}.json")
+    # tmp + replace: se out_path for hard link de outro corpus/master
+    # (_link_or_copy), o arquivo deles não é reescrito
+    tmp = f"{out_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(asdict(proj), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, out_path)
+    return out_path
 
-    shutil.rmtree(tmp, ignore_errors=True)
-    return proj, None
+def extract_project_from_archive(
+    archive_path: str,
+    work_dir: str,
+    output_projects_dir: str,
+) -> Tuple[Optional[ProjectRef], Optional[Dict]]:
+    proj, pend, _ = build_project_ref(archive_path, work_dir)
+    if proj:
+        write_project_json(proj, output_projects_dir)
+    return proj, pend
 
 def _collect_archives_recursive(archives_dir: str) -> List[str]:
     """
@@ -249,10 +535,203 @@ def _collect_archives_recursive(archives_dir: str) -> List[str]:
                 found.append(os.path.join(base, fn))
     return sorted(found)
 
+# --------- pacotes (zip de archives) ---------
+
+def pack_archive_members(pack: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """
+    Membros .zip/.rar do pacote, em qualquer subpasta, na ordem do zip.
+    """
+    return [
+        m for m in pack.infolist()
+        if not m.is_dir() and os.path.splitext(m.filename)[1].lower() in ARCHIVE_EXTS
+    ]
+
+def iter_pack_archives(
+    pack: zipfile.ZipFile,
+    members: List[zipfile.ZipInfo],
+    spool_dir: str,
+    memory_max_bytes: int = NESTED_MEMORY_MAX_BYTES,
+    extracted: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[Archive]:
+    """
+    Archives internos do pacote abertos no lugar, sem descompactar o pacote:
+    - .zip até memory_max_bytes: bytes do membro em memória (MemoryArchive)
+    - maior que isso, ou .rar (rarfile precisa de arquivo): spool em spool_dir
+    extracted(done, total): depois de cada membro.
+    """
+    for n, m in enumerate(members, start=1):
+        rel = _zip_rel_path(m.filename)
+        if rel.lower().endswith(".zip") and m.file_size <= memory_max_bytes:
+            arc = MemoryArchive(os.path.join(spool_dir, rel), pack.read(m))
+        else:
+            arc = pack.extract(m, spool_dir)
+        if extracted:
+            extracted(n, len(members))
+        yield arc
+
+def _main_flp_sha(proj: ProjectRef) -> Optional[str]:
+    if not proj.flp_files:
+        return None
+    return sorted(proj.flp_files, key=lambda x: x["size_bytes"], reverse=True)[0]["sha256"]
+
+def _project_from_json(path: str) -> ProjectRef:
+    with open(path, "r", encoding="utf-8") as f:
+        pj = json.load(f)
+    names = {f.name for f in fields(ProjectRef)}
+    return ProjectRef(**{k: v for k, v in pj.items() if k in names})
+
+def _probe_rank(project_json_path: str) -> int:
+    # projetos de antes dos modos de análise foram todos "full"
+    try:
+        with open(project_json_path, "r", encoding="utf-8") as f:
+            mode = (json.load(f).get("stats") or {}).get("audio_probe_mode", "full")
+        return PROBE_MODES.index(mode)
+    except (OSError, ValueError):
+        return -1
+
+def _link_or_copy(src: str, dst: str):
+    # hard link: o projeto reaproveitado não ocupa disco de novo
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def _iter_project_refs(
+    items: Iterable[Tuple[str, Optional[Tuple[Dict, str]]]],
+    work_dir: str,
+    workers: int,
+    archive_hashes: Dict[str, str],
+    member_hashes: Dict[str, Dict[str, str]],
+    stream_audio: bool = True,
+    audio_threads: int = 1,
+    probe_mode: str = "full",
+    parse_flp: bool = True,
+    member_data: Optional[Dict[str, Dict[str, bytes]]] = None,
+):
+    """
+    Recebe (archive, reuso) conforme os archives chegam e devolve
+    (archive, reuso, resultado) na mesma ordem, seja sequencial ou em pool
+    de processos (spawn: o builder também roda dentro do servidor, que tem
+    threads). Reaproveitados (reuso != None) não são processados.
+    No máximo 2x workers archives em voo: com um stream de archives, o
+    disco só guarda a janela, não o pacote inteiro.
+    Hashes (e bytes do FLP principal) já lidos no lookup vão junto pra
+    ninguém reler o archive; os bytes saem de member_data ao ir pro worker.
+    """
+    member_data = member_data if member_data is not None else {}
+
+    def args(arc):
+        return (arc, work_dir, archive_hashes.get(arc), member_hashes.get(arc),
+                stream_audio, audio_threads, probe_mode, parse_flp, member_data.pop(arc, None))
+
+    if workers <= 1:
+        for arc, reuse in items:
+            yield arc, reuse, None if reuse else build_project_ref(*args(arc))
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    window = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as ex:
+        for arc, reuse in items:
+            window.append((arc, reuse, None if reuse else ex.submit(build_project_ref, *args(arc))))
+            # entrega o que já terminou no começo da fila; bloqueia só se a janela encheu
+            while window and (len(window) > 2 * workers or window[0][2] is None or window[0][2].done()):
+                arc0, reuse0, fut = window.popleft()
+                yield arc0, reuse0, fut.result() if fut else None
+        while window:
+            arc0, reuse0, fut = window.popleft()
+            yield arc0, reuse0, fut.result() if fut else None
+
+_PREFETCH_DONE = object()
+
+def _prefetch(items: Iterable[str], depth: int = 2) -> Iterator[str]:
+    """
+    Puxa o iterável numa thread, até `depth` itens à frente: o próximo
+    archive do stream (ex.: descompressão do pacote) fica pronto enquanto
+    o atual é analisado. Erro do produtor sobe no consumidor.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # consumidor pode ter desistido (erro no build): não fica preso no put
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_PREFETCH_DONE)
+        except Exception as e:
+            put(e)
+
+    t = threading.Thread(target=produce, name="flp_prefetch", daemon=True)
+    t.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _PREFETCH_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
 def build_corpus(
     archives_dir: str,
     output_dir: str = "corpus_out",
+    progress: Optional[Callable[[int, int, int], None]] = None,
+    workers: int = 1,
+    incremental: bool = False,
+    stream_audio: bool = True,
+    audio_threads: Optional[int] = None,
+    probe_mode: str = "full",
+    parse_flp: bool = True,
+    storage: Optional[CorpusStorage] = None,
+    archives: Optional[Iterable[str]] = None,
+    archives_total: Optional[int] = None,
+    consume: bool = False,
 ) -> str:
+    """
+    progress(archives_done, archives_total, projects_built): chamado depois
+    de cada archive (usado pelos jobs de ingest pra reportar andamento).
+    workers > 1: archives processados em paralelo (0 = nº de CPUs). Os JSONs
+    e o índice são escritos aqui, na ordem dos archives, então a saída é a
+    mesma do modo sequencial.
+    incremental=True: archives já vistos (sha256 do archive ou do FLP
+    principal no corpus_manifest.json do output_dir) não são reprocessados;
+    o JSON existente é linkado no corpus novo e o índice marca reused_from.
+    stream_audio=False: extrai cada áudio pro disco antes de analisar
+    (o padrão lê direto do archive).
+    audio_threads: threads de análise de áudio por projeto; None = CPUs
+    divididas entre os workers.
+    probe_mode: header | sampled | full (ver audio_stats). No modo
+    incremental, projeto analisado num modo mais fraco não é reaproveitado:
+    reingerir com full completa o que um build header-only deixou de fora.
+    parse_flp: tempo/PPQ/canais/patterns/notas de cada .flp no JSON do projeto.
+    storage: grava o corpus pronto lá também (local / S3 / GitHub).
+    archives: em vez de varrer archives_dir, consome esse iterável conforme
+    os archives chegam (caminhos ou MemoryArchive, ex.: iter_pack_archives);
+    archives_total só serve pro progresso. consume=True apaga cada archive
+    depois de processado, pro disco não acumular o pacote inteiro.
+    """
+    if probe_mode not in PROBE_MODES:
+        raise ValueError(f"probe mode inválido: {probe_mode}")
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if audio_threads is None:
+        audio_threads = max(1, (os.cpu_count() or 1) // workers)
+
     corpus_id = f"flp_corpus_{now_ts()}"
     corpus_path = os.path.join(output_dir, corpus_id)
     projects_dir = os.path.join(corpus_path, "projects")
@@ -263,43 +742,119 @@ def build_corpus(
     projects: List[ProjectRef] = []
     pending: List[Dict] = []
 
-    archives = _collect_archives_recursive(archives_dir)
+    if archives is None:
+        archives = _collect_archives_recursive(archives_dir)
+        archives_total = len(archives)
+    else:
+        archives = _prefetch(archives)
+    if progress:
+        progress(0, archives_total, 0)
+
+    # incremental: só hash + lookup no manifesto antes de extrair qualquer coisa.
+    # Lookup numa cópia do manifesto como estava no disco: archive repetido
+    # dentro deste mesmo build é processado, não "reaproveitado" dele mesmo.
+    manifest = CorpusManifest(output_dir) if incremental else None
+    known = CorpusManifest(output_dir) if incremental else None
+    archive_hashes: Dict[str, str] = {}
+    member_hashes: Dict[str, Dict[str, str]] = {}  # archive -> {membro .flp: sha256}
+    member_data: Dict[str, Dict[str, bytes]] = {}  # archive -> {membro .flp: bytes}, se parse_flp
+
+    def lookup(source: Iterable[str]):
+        for arc in source:
+            reuse = None
+            if known:
+                archive_hashes[arc] = archive_sha256(arc)
+                entry, match = known.lookup(archive_hashes[arc])
+                if not entry:
+                    # com parse_flp o build vai ler o FLP de qualquer jeito:
+                    # lê aqui uma vez só e passa os bytes adiante
+                    keep = FLP_PARSE_MAX_BYTES if parse_flp else None
+                    if isinstance(arc, MemoryArchive):
+                        main_flp = zip_main_flp(arc.path, fileobj=io.BytesIO(arc.data), keep_max=keep)
+                    else:
+                        main_flp = zip_main_flp(arc, keep_max=keep)
+                    if main_flp:
+                        member_hashes[arc] = {main_flp[0]: main_flp[1]}
+                        if main_flp[2] is not None:
+                            member_data[arc] = {main_flp[0]: main_flp[2]}
+                    entry, match = known.lookup(archive_hashes[arc], main_flp[1] if main_flp else None)
+                if entry and _probe_rank(entry["path"]) >= PROBE_MODES.index(probe_mode):
+                    reuse = (entry, match)
+                    member_data.pop(arc, None)  # reaproveitado: não vai ser parseado
+            yield arc, reuse
+
+    results = _iter_project_refs(
+        lookup(archives), work_dir, workers if archives_total != 1 else 1, archive_hashes, member_hashes,
+        stream_audio, audio_threads, probe_mode, parse_flp, member_data,
+    )
 
-    for arc in archives:
-        proj, pend = extract_project_from_archive(
-            archive_path=arc,
-            work_dir=work_dir,
-            output_projects_dir=projects_dir,
-        )
+    reused_from: Dict[str, Dict] = {}  # project_id -> origem
+    dup_keys: Dict[str, str] = {}  # project_id -> chave de duplicata
+    found = 0
+    for found, (arc, reuse, res) in enumerate(results, start=1):
+        if reuse:
+            entry, match = reuse
+            proj, pend = _project_from_json(entry["path"]), None
+            _link_or_copy(entry["path"], os.path.join(projects_dir, f"{proj.project_id}.json"))
+            reused_from[proj.project_id] = {"corpus_id": entry["corpus_id"], "match": match}
+            if match == "flp_sha256":
+                manifest.record_alias(archive_hashes[arc], entry)
+        else:
+            proj, pend, sha = res
+            if sha:
+                archive_hashes[arc] = sha
+            if proj:
+                write_project_json(proj, projects_dir)
+                reused_from.pop(proj.project_id, None)
+                if manifest:
+                    manifest.record(corpus_id, proj.project_id, archive_hashes[arc], _main_flp_sha(proj))
         if proj:
             projects.append(proj)
+            if proj.flp_files:
+                dup_keys[proj.project_id] = proj.flp_files[0]["sha256"]
+            else:
+                dup_keys[proj.project_id] = archive_hashes.get(arc) or archive_sha256(arc)
         if pend:
             pending.append(pend)
+        if consume and not isinstance(arc, MemoryArchive):
+            try:
+                os.remove(arc)
+            except OSError:
+                pass
+        if progress:
+            progress(found, archives_total, len(projects))
+
+    if manifest:
+        manifest.save()
 
     dup_map: Dict[str, List[str]] = {}
     for p in projects:
-        if p.flp_files:
-            key = p.flp_files[0]["sha256"]
-        else:
-            key = sha256_file(p.source_archive)
-        dup_map.setdefault(key, []).append(p.project_id)
+        dup_map.setdefault(dup_keys[p.project_id], []).append(p.project_id)
 
     duplicates = {h: ids for h, ids in dup_map.items() if len(ids) > 1}
 
     totals = {
-        "archives_found": len(archives),
+        "archives_found": found,
         "projects_built": len(projects),
         "pending_archives": len(pending),
         "projects_with_flp": sum(1 for p in projects if p.stats.get("has_flp")),
         "projects_without_flp": sum(1 for p in projects if not p.stats.get("has_flp")),
         "total_audio_files": sum(p.stats.get("audio_count", 0) for p in projects),
         "total_est_audio_duration_seconds": float(sum(p.stats.get("total_audio_duration_seconds_est", 0.0) for p in projects)),
+        "projects_reused": sum(1 for p in projects if p.project_id in reused_from),
     }
 
+    entries = []
+    for p in projects:
+        e = {"project_id": p.project_id, "title": p.title, "stats": p.stats}
+        if p.project_id in reused_from:
+            e["reused_from"] = reused_from[p.project_id]
+        entries.append(e)
+
     index = CorpusIndex(
         corpus_id=corpus_id,
         created_at=now_ts(),
-        projects=[{"project_id": p.project_id, "title": p.title, "stats": p.stats} for p in projects],
+        projects=entries,
         duplicates=duplicates,
         pending_archives=pending,
         totals=totals,
@@ -308,16 +863,134 @@ def build_corpus(
     with open(os.path.join(corpus_path, "corpus_index.json"), "w", encoding="utf-8") as f:
         json.dump(asdict(index), f, ensure_ascii=False, indent=2)
 
+    # índice consultável (/flp/projects). Derivado dos JSONs: se falhar, o
+    # corpus continua válido e CorpusDB.rebuild() recupera depois.
+    try:
+        db = CorpusDB(output_dir)
+        try:
+            db.add_corpus(corpus_id, "corpus", corpus_path, index.created_at, [
+                (
+                    {
+                        "project_id": p.project_id,
+                        "title": p.title,
+                        "created_at": p.created_at,
+                        "flp_sha": _main_flp_sha(p),
+                        "stats": p.stats,
+                    },
+                    os.path.join(projects_dir, f"{p.project_id}.json"),
+                )
+                for p in projects
+            ])
+        finally:
+            db.close()
+    except sqlite3.Error:
+        pass
+
     shutil.rmtree(work_dir, ignore_errors=True)
+
+    if storage is not None:
+        storage.persist(corpus_path)
     return corpus_path
 
 
+def build_corpus_from_pack(
+    pack_path: str,
+    output_dir: str = "corpus_out",
+    spool_dir: Optional[str] = None,
+    memory_max_bytes: int = NESTED_MEMORY_MAX_BYTES,
+    extracted: Optional[Callable[[int, int], None]] = None,
+    **kwargs,
+) -> str:
+    """
+    build_corpus direto de um pacote .zip de archives (zip de zips): cada
+    archive interno é lido do pacote quando o build pede o próximo (ver
+    iter_pack_archives), então nada é extraído duas vezes. Em memória ficam
+    no máximo os archives em voo (~2x workers + prefetch) de até
+    memory_max_bytes cada.
+    spool_dir: onde passam os archives grandes (None = pasta temporária).
+    extracted(done, total): progresso da leitura do pacote.
+    Levanta zipfile.BadZipFile se pack_path não for zip. kwargs vão pro build_corpus.
+    """
+    own_spool = spool_dir is None
+    if own_spool:
+        spool_dir = tempfile.mkdtemp(prefix="flp_pack_spool_")
+    try:
+        with zipfile.ZipFile(pack_path, "r") as pack:
+            members = pack_archive_members(pack)
+            if extracted:
+                extracted(0, len(members))
+            return build_corpus(
+                None,
+                output_dir,
+                archives=iter_pack_archives(pack, members, spool_dir, memory_max_bytes, extracted),
+                archives_total=len(members),
+                consume=True,
+                **kwargs,
+            )
+    finally:
+        if own_spool:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+
 if __name__ == "__main__":
     import argparse
     ap = argparse.ArgumentParser()
-    ap.add_argument("--archives_dir", required=True, help="Pasta com ZIP/RAR de FLP refs")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--archives_dir", help="Pasta com ZIP/RAR de FLP refs")
+    src.add_argument("--pack", help="ZIP de archives (pacote), lido sem descompactar")
+    src.add_argument("--check_extract", action="store_true",
+                     help="Regressão: áudio extraído pro disco por várias threads no mesmo archive")
     ap.add_argument("--output_dir", default="corpus_out", help="Saída do corpus")
+    ap.add_argument("--workers", type=int, default=1, help="Processos em paralelo (0 = nº de CPUs)")
+    ap.add_argument("--incremental", action="store_true", help="Pula archives já processados (corpus_manifest.json)")
+    ap.add_argument("--extract_audio", action="store_true", help="Extrai áudio pro disco em vez de ler direto do archive")
+    ap.add_argument("--audio_threads", type=int, default=None, help="Threads de análise de áudio por projeto (padrão: CPUs / workers)")
+    ap.add_argument("--probe_mode", choices=PROBE_MODES, default="full", help="Análise de áudio: header | sampled | full")
+    ap.add_argument("--no_flp_parse", action="store_true", help="Só hash dos .flp, sem parsear eventos")
+    ap.add_argument("--storage", default=None, help="Grava o corpus também em: local:<dir> | s3://<bucket>/<prefixo> | github")
+    ap.add_argument("--nested_memory_mb", type=int, default=NESTED_MEMORY_MAX_BYTES // (1024 * 1024),
+                    help="--pack: archive interno até esse tamanho fica em memória; acima, passa pelo disco")
     args = ap.parse_args()
 
-    out = build_corpus(args.archives_dir, args.output_dir)
-    print(f"[OK] corpus gerado em: {out}")
\ No newline at end of file
+    if args.check_extract:
+        # zip com 400 WAVs em subpastas repetidas, extraídos por 16 threads:
+        # antes as threads corriam na criação das pastas pai (FileExistsError)
+        check_dir = tempfile.mkdtemp(prefix="flp_check_extract_")
+        zip_path = os.path.join(check_dir, "many.zip")
+        buf = io.BytesIO()
+        sf.write(buf, np.zeros(2205, dtype=np.float32), 22050, format="WAV")
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as z:
+            for i in range(400):
+                z.writestr(f"stems/{i % 8}/deep/{i:03d}.wav", buf.getvalue())
+        runs = 30
+        failed = 0
+        for _ in range(runs):
+            out_dir = tempfile.mkdtemp(dir=check_dir)
+            try:
+                got = scan_archive_members(zip_path, out_dir, stream_audio=False, audio_threads=16, probe_mode="header")
+                if len(got["audio"]) != 400 or any(st is None for _, st in got["audio"]) or os.listdir(out_dir):
+                    failed += 1
+            except Exception as e:
+                print(f"  falhou: {type(e).__name__}: {e}")
+                failed += 1
+        shutil.rmtree(check_dir, ignore_errors=True)
+        print(f"{'OK' if not failed else 'FALHOU'}: {runs - failed}/{runs} rodadas sem erro")
+        raise SystemExit(1 if failed else 0)
+
+    build_kw = dict(
+        workers=args.workers,
+        incremental=args.incremental,
+        stream_audio=not args.extract_audio,
+        audio_threads=args.audio_threads,
+        probe_mode=args.probe_mode,
+        parse_flp=not args.no_flp_parse,
+        storage=storage_from_spec(args.storage),
+    )
+    t0 = time.perf_counter()
+    if args.pack:
+        out = build_corpus_from_pack(
+            args.pack, args.output_dir, memory_max_bytes=args.nested_memory_mb * 1024 * 1024, **build_kw
+        )
+    else:
+        out = build_corpus(args.archives_dir, args.output_dir, **build_kw)
+    print(f"[OK] corpus gerado em: {out} ({time.perf_counter() - t0:.1f}s)")
\ No newline at end of file
@@ -0,0 +1,425 @@
+import struct
+from typing import Dict, List, Optional, Tuple, Union
+
+# =========================
+# Formato FLP
+# =========================
+# FLhd <u32 len=6> <i16 format> <u16 n_channels> <u16 ppq>
+# FLdt <u32 len> eventos...
+# evento: <u8 id> + valor
+#   id   0..63  -> 1 byte
+#   id  64..127 -> 2 bytes (u16)
+#   id 128..191 -> 4 bytes (u32)
+#   id 192..255 -> tamanho varint (7 bits por byte) + dados
+
+WORD = 64
+DWORD = 128
+TEXT = 192
+
+EV_CHAN_ENABLED = 0
+EV_TIME_SIG_NUM = 17
+EV_TIME_SIG_BEAT = 18
+EV_CHAN_TYPE = 21
+EV_CHAN_ROUTED_TO = 22  # insert do mixer (i8)
+
+EV_NEW_CHAN = WORD + 0
+EV_NEW_PAT = WORD + 1
+EV_TEMPO_COARSE = WORD + 2  # FL antigo: BPM inteiro
+EV_TEMPO_FINE = WORD + 29  # FL antigo: milésimos
+EV_NEW_ARRANGEMENT = WORD + 35
+EV_SLOT_INDEX = WORD + 34
+
+EV_INSERT_OUTPUT = DWORD + 19  # fecha um insert do mixer
+EV_TEMPO = DWORD + 28  # BPM * 1000
+
+EV_CHAN_NAME = TEXT + 0
+EV_PAT_NAME = TEXT + 1
+EV_TITLE = TEXT + 2
+EV_SAMPLE_PATH = TEXT + 4
+EV_FL_VERSION = TEXT + 7
+EV_PLUGIN_INTERNAL = TEXT + 9
+EV_PLUGIN_NAME = TEXT + 11
+EV_INSERT_NAME = TEXT + 12
+EV_GENRE = TEXT + 14
+EV_ARTISTS = TEXT + 15
+EV_INSERT_ROUTING = TEXT + 27
+EV_INSERT_FLAGS = TEXT + 28
+EV_PAT_NOTES = TEXT + 32
+EV_PLAYLIST = TEXT + 41
+
+NOTE = struct.Struct("<IHHIHHBBBBBBBB")  # 24 bytes por nota
+NOTE_SIZE = NOTE.size
+
+CHANNEL_TYPES = {0: "sampler", 2: "native", 3: "layer", 4: "instrument", 5: "automation"}
+
+MAX_NOTES_PER_PATTERN = 256  # notas guardadas no JSON (contagem é sempre completa)
+
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_HEADER = struct.Struct("<4sIhHH")
+
+
+class FLPParseError(ValueError):
+    pass
+
+
+# =========================
+# Utilidades
+# =========================
+
+def _text(raw: memoryview) -> str:
+    """
+    FL 11.5+ grava texto em UTF-16LE; versões antigas em ANSI.
+    Decide pelo conteúdo (muitos zeros nos bytes ímpares = UTF-16).
+    """
+    b = raw.tobytes()
+    if len(b) >= 2 and len(b) % 2 == 0 and b[1::2].count(0) >= len(b) // 4:
+        s = b.decode("utf-16-le", errors="replace")
+    else:
+        s = b.decode("utf-8", errors="replace")
+    return s.rstrip("\x00").strip()
+
+
+def _read_varint(buf: memoryview, pos: int, end: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while pos < end:
+        b = buf[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return value, pos
+        shift += 7
+    raise FLPParseError("varint truncado")
+
+
+def _find_data_chunk(buf: memoryview) -> Tuple[int, int, int, int, int]:
+    if len(buf) < _HEADER.size:
+        raise FLPParseError("arquivo curto demais")
+    magic, hlen, fmt, n_channels, ppq = _HEADER.unpack_from(buf, 0)
+    if magic != b"FLhd":
+        raise FLPParseError("header FLhd ausente")
+
+    pos = 8 + hlen
+    # pula chunks desconhecidos até o FLdt
+    while pos + 8 <= len(buf):
+        tag = buf[pos:pos + 4].tobytes()
+        (size,) = _U32.unpack_from(buf, pos + 4)
+        if tag == b"FLdt":
+            start = pos + 8
+            return fmt, n_channels, ppq, start, min(start + size, len(buf))
+        pos += 8 + size
+    raise FLPParseError("chunk FLdt ausente")
+
+
+def _pattern_notes(raw: memoryview) -> Tuple[int, Dict]:
+    count = len(raw) // NOTE_SIZE
+    if count == 0:
+        return 0, {}
+    keys = []
+    chans = set()
+    end_tick = 0
+    kept = []
+    for (pos, _flags, chan, length, key, _grp, _fine, _u, _rel, _mch, _pan, vel, _mx, _my) in NOTE.iter_unpack(
+        raw[:count * NOTE_SIZE]
+    ):
+        keys.append(key)
+        chans.add(chan)
+        if pos + length > end_tick:
+            end_tick = pos + length
+        if len(kept) < MAX_NOTES_PER_PATTERN:
+            kept.append([pos, length, key, vel, chan])
+    return count, {
+        "key_min": min(keys),
+        "key_max": max(keys),
+        "channels": sorted(chans),
+        "length_ticks": end_tick,
+        "notes": kept,
+    }
+
+
+# =========================
+# Parser
+# =========================
+
+def parse_flp(data: Union[bytes, bytearray, memoryview]) -> Dict:
+    """
+    Lê os eventos do FLP numa passada, sem copiar o buffer (memoryview +
+    struct.unpack_from); só os eventos usados viram objetos Python.
+    Notas: [posição, duração, tecla, velocity, canal] em ticks (ppq),
+    no máximo MAX_NOTES_PER_PATTERN por pattern.
+    """
+    buf = memoryview(data)
+    fmt, n_channels, ppq, pos, end = _find_data_chunk(buf)
+
+    out: Dict = {
+        "format": fmt,
+        "ppq": ppq,
+        "header_channels": n_channels,
+        "fl_version": None,
+        "title": None,
+        "genre": None,
+        "artists": None,
+        "tempo": None,
+        "time_signature": None,
+    }
+    channels: List[Dict] = []
+    patterns: Dict[int, Dict] = {}
+    inserts: Dict[int, Dict] = {}
+
+    chan: Optional[Dict] = None
+    pat: Optional[Dict] = None
+    insert_idx = 0
+    in_mixer = False
+    tempo_coarse = None
+    tempo_fine = 0
+    ts_num = None
+    ts_beat = None
+    events = 0
+
+    while pos < end:
+        eid = buf[pos]
+        pos += 1
+        events += 1
+
+        if eid < WORD:
+            if pos >= end:
+                break
+            v = buf[pos]
+            pos += 1
+            if eid == EV_TIME_SIG_NUM:
+                ts_num = v
+            elif eid == EV_TIME_SIG_BEAT:
+                ts_beat = v
+            elif chan is not None and not in_mixer:
+                if eid == EV_CHAN_TYPE:
+                    chan["type"] = CHANNEL_TYPES.get(v, v)
+                elif eid == EV_CHAN_ROUTED_TO:
+                    chan["mixer_insert"] = v - 256 if v > 127 else v
+                elif eid == EV_CHAN_ENABLED:
+                    chan["enabled"] = bool(v)
+            continue
+
+        if eid < DWORD:
+            if pos + 2 > end:
+                break
+            (v,) = _U16.unpack_from(buf, pos)
+            pos += 2
+            if eid == EV_NEW_CHAN:
+                chan = {"index": v, "name": None, "plugin": None, "type": None, "sample_path": None, "mixer_insert": None}
+                channels.append(chan)
+                in_mixer = False
+            elif eid == EV_NEW_PAT:
+                pat = patterns.setdefault(v, {"index": v, "name": None, "note_count": 0})
+            elif eid == EV_TEMPO_COARSE:
+                tempo_coarse = v
+            elif eid == EV_TEMPO_FINE:
+                tempo_fine = v
+            elif eid in (EV_NEW_ARRANGEMENT, EV_SLOT_INDEX):
+                chan = None
+            continue
+
+        if eid < TEXT:
+            if pos + 4 > end:
+                break
+            (v,) = _U32.unpack_from(buf, pos)
+            pos += 4
+            if eid == EV_TEMPO:
+                out["tempo"] = v / 1000.0
+            elif eid == EV_INSERT_OUTPUT:
+                insert_idx += 1
+                in_mixer = True
+                chan = None
+            continue
+
+        size, pos = _read_varint(buf, pos, end)
+        raw = buf[pos:pos + size]
+        pos += size
+
+        if eid == EV_PAT_NOTES:
+            if pat is not None:
+                count, summary = _pattern_notes(raw)
+                pat["note_count"] += count
+                if count:
+                    pat.update(summary)
+        elif eid == EV_PAT_NAME:
+            if pat is not None:
+                pat["name"] = _text(raw)
+        elif eid == EV_FL_VERSION:
+            out["fl_version"] = raw.tobytes().decode("ascii", errors="replace").rstrip("\x00")
+        elif eid == EV_TITLE:
+            out["title"] = _text(raw)
+        elif eid == EV_GENRE:
+            out["genre"] = _text(raw)
+        elif eid == EV_ARTISTS:
+            out["artists"] = _text(raw)
+        elif eid in (EV_INSERT_NAME, EV_INSERT_ROUTING, EV_INSERT_FLAGS):
+            in_mixer = True
+            chan = None
+            ins = inserts.setdefault(insert_idx, {"index": insert_idx, "name": None, "routes_to": []})
+            if eid == EV_INSERT_NAME:
+                ins["name"] = _text(raw)
+            elif eid == EV_INSERT_ROUTING:
+                ins["routes_to"] = [i for i, b in enumerate(raw) if b]
+        elif eid == EV_PLAYLIST:
+            chan = None
+        elif chan is not None and not in_mixer:
+            if eid in (EV_PLUGIN_NAME, EV_CHAN_NAME):
+                chan["name"] = _text(raw)
+            elif eid == EV_PLUGIN_INTERNAL:
+                chan["plugin"] = _text(raw)
+            elif eid == EV_SAMPLE_PATH:
+                chan["sample_path"] = _text(raw)
+
+    if out["tempo"] is None and tempo_coarse is not None:
+        out["tempo"] = tempo_coarse + tempo_fine / 1000.0
+    if ts_num and ts_beat:
+        out["time_signature"] = f"{ts_num}/{ts_beat}"
+
+    pattern_list = [patterns[k] for k in sorted(patterns)]
+    out["channels"] = channels
+    out["channel_count"] = len(channels)
+    out["mixer"] = [ins for _, ins in sorted(inserts.items()) if ins["name"] or ins["routes_to"]]
+    out["patterns"] = pattern_list
+    out["pattern_count"] = len(pattern_list)
+    out["note_count"] = sum(p["note_count"] for p in pattern_list)
+    out["event_count"] = events
+    return out
+
+
+def flp_summary(data: Union[bytes, bytearray, memoryview]) -> Dict:
+    """
+    parse_flp pra dentro do corpus: nunca levanta (FLP corrompido vira
+    {"error": ...} no JSON do projeto).
+    """
+    try:
+        return parse_flp(data)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+# =========================
+# Benchmark
+# =========================
+
+def _event(eid: int, value: Union[int, bytes]) -> bytes:
+    if eid < WORD:
+        return bytes([eid, value])
+    if eid < DWORD:
+        return bytes([eid]) + _U16.pack(value)
+    if eid < TEXT:
+        return bytes([eid]) + _U32.pack(value)
+    size = len(value)
+    varint = bytearray()
+    while True:
+        b = size & 0x7F
+        size >>= 7
+        varint.append(b | (0x80 if size else 0))
+        if not size:
+            break
+    return bytes([eid]) + bytes(varint) + value
+
+
+def synthetic_flp(n_channels: int = 24, n_patterns: int = 40, notes_per_pattern: int = 64, seed: int = 0) -> bytes:
+    """
+    FLP sintético com a mesma estrutura de eventos de um projeto real
+    (meta, patterns com notas, canais, mixer). Só pra benchmark/smoke.
+    """
+    import random
+    rng = random.Random(seed)
+
+    def utf16(s):
+        return (s + "\x00").encode("utf-16-le")
+
+    ev = [
+        _event(EV_FL_VERSION, b"20.8.4.2576\x00"),
+        _event(EV_TITLE, utf16("Synthetic Phonk")),
+        _event(EV_TEMPO, 130500),
+        _event(EV_TIME_SIG_NUM, 4),
+        _event(EV_TIME_SIG_BEAT, 4),
+    ]
+    for p in range(1, n_patterns + 1):
+        ev.append(_event(EV_NEW_PAT, p))
+        ev.append(_event(EV_PAT_NAME, utf16(f"Pattern {p}")))
+        notes = b"".join(
+            NOTE.pack(i * 24, 0x4000, rng.randrange(n_channels), 24, rng.randrange(36, 84), 0, 120, 0, 64, 0, 64, 100, 128, 128)
+            for i in range(notes_per_pattern)
+        )
+        ev.append(_event(EV_PAT_NOTES, notes))
+    for c in range(n_channels):
+        ev.append(_event(EV_NEW_CHAN, c))
+        ev.append(_event(EV_CHAN_TYPE, 0 if c % 2 else 4))
+        ev.append(_event(EV_PLUGIN_INTERNAL, utf16("Sampler" if c % 2 else "Fruity Wrapper")))
+        ev.append(_event(EV_PLUGIN_NAME, utf16(f"Channel {c}")))
+        if c % 2:
+            ev.append(_event(EV_SAMPLE_PATH, utf16(f"%FLStudioUserData%\\Samples\\s{c}.wav")))
+        ev.append(_event(EV_CHAN_ROUTED_TO, (c % 8) + 1))
+        ev.append(_event(213, bytes(rng.randrange(256) for _ in range(2000))))  # params de plugin (ignorado)
+    for i in range(10):
+        ev.append(_event(EV_INSERT_FLAGS, b"\x00" * 12))
+        ev.append(_event(EV_INSERT_NAME, utf16("Master" if i == 0 else f"Insert {i}")))
+        routes = bytearray(127)
+        if i:
+            routes[0] = 1
+        ev.append(_event(EV_INSERT_ROUTING, bytes(routes)))
+        ev.append(_event(EV_INSERT_OUTPUT, 0xFFFFFFFF))
+
+    body = b"".join(ev)
+    return _HEADER.pack(b"FLhd", 6, 0, n_channels, 96) + b"FLdt" + _U32.pack(len(body)) + body
+
+
+def _iter_flp_sources(paths: List[str]):
+    import os
+    import zipfile
+
+    for path in paths:
+        if os.path.isdir(path):
+            for base, _, files in os.walk(path):
+                for fn in sorted(files):
+                    full = os.path.join(base, fn)
+                    if fn.lower().endswith(".flp"):
+                        with open(full, "rb") as f:
+                            yield full, f.read()
+                    elif fn.lower().endswith(".zip"):
+                        yield from _iter_flp_sources([full])
+        elif path.lower().endswith(".zip"):
+            with zipfile.ZipFile(path) as z:
+                for info in z.infolist():
+                    if info.filename.lower().endswith(".flp"):
+                        yield f"{path}:{info.filename}", z.read(info)
+        elif os.path.isfile(path):
+            with open(path, "rb") as f:
+                yield path, f.read()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description="Benchmark do parser FLP (arquivos .flp, pastas ou zips)")
+    ap.add_argument("paths", nargs="*", help=".flp, pasta com .flp/.zip, ou .zip")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    sources = list(_iter_flp_sources(args.paths))
+    if not sources:
+        print("nenhum .flp informado: usando FLP sintético")
+        sources = [("synthetic", synthetic_flp())]
+
+    failures = 0
+    for name, data in sources:
+        best = float("inf")
+        out = None
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            out = flp_summary(data)
+            best = min(best, time.perf_counter() - t)
+        if "error" in out:
+            failures += 1
+            print(f"FAIL {name}: {out['error']}")
+            continue
+        print(f"{best * 1000:7.2f} ms  {len(data) / 1024:8.1f} KB  tempo={out['tempo']} ppq={out['ppq']} "
+              f"ts={out['time_signature']} canais={out['channel_count']} patterns={out['pattern_count']} "
+              f"notas={out['note_count']} eventos={out['event_count']}  {name}")
+
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,441 @@
+import os
+import base64
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from flp_corpus.storage import CorpusStorage, corpus_files, fetch_tmp_dir, replace_dir
+
+# =========================
+# Configurações
+# =========================
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")  # fake server nos testes
+GITHUB_BRANCH = os.getenv("GITHUB_BRANCH")  # None = branch padrão do repo
+GITHUB_BLOB_WORKERS = int(os.getenv("GITHUB_BLOB_WORKERS", "8"))
+GITHUB_MAX_FILE_BYTES = 5 * 1024 * 1024  # 5MB
+GITHUB_REF_RETRIES = 3  # ref andou no meio do commit (push concorrente): refaz tree/commit
+
+ProgressFn = Optional[Callable[[int, int], None]]
+
+
+class GitHubError(Exception):
+    """
+    Falha numa chamada da API. detail vai pro erro do job.
+    """
+
+    def __init__(self, error: str, response: requests.Response, **extra):
+        self.status_code = response.status_code
+        self.detail = {
+            "error": error,
+            "status_code": response.status_code,
+            "response": response.text[:4000],
+            **extra,
+        }
+        super().__init__(str(self.detail))
+
+
+def _git_blob_sha(data: bytes) -> str:
+    # mesmo sha que o git calcula: blob igual ao que já subiu não precisa de POST
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _github_files(corpus_path: str, max_bytes: int = GITHUB_MAX_FILE_BYTES) -> Tuple[List[Tuple[str, str]], int]:
+    """
+    ([(caminho relativo no corpus, caminho local)], nº de arquivos pulados por tamanho).
+    """
+    files = []
+    skipped_big = 0
+    for rel, local in corpus_files(corpus_path):
+        if os.path.getsize(local) > max_bytes:
+            skipped_big += 1
+            continue
+        files.append((rel, local))
+    return files, skipped_big
+
+
+# =========================
+# Backend GitHub (Git Data API)
+# =========================
+
+class GitHubStorage(CorpusStorage):
+    """
+    Um commit por corpus pela Git Data API: blobs em paralelo (sessão com
+    pool de conexões), uma tree sobre a do HEAD, um commit, update do ref.
+    Sem GET de sha por arquivo: blob é endereçado por conteúdo, e conteúdo
+    repetido (no corpus ou já enviado por esta instância) não sobe de novo.
+    Layout legível: <base_repo_dir>/<corpus_id>/...
+    """
+
+    name = "github"
+
+    def __init__(
+        self,
+        repo: str,
+        token: str,
+        api_url: str = GITHUB_API_URL,
+        branch: Optional[str] = GITHUB_BRANCH,
+        workers: int = GITHUB_BLOB_WORKERS,
+        base_repo_dir: str = "flp_corpus_storage",
+        session: Optional[requests.Session] = None,
+    ):
+        self.repo = repo
+        self.api = f"{api_url.rstrip('/')}/repos/{repo}"
+        self.branch = branch
+        self.workers = max(1, workers)
+        self.base_repo_dir = base_repo_dir
+        self.session = session or self._session(token)
+        self._known: set = set()  # blob shas já enviados
+
+    def _session(self, token: str) -> requests.Session:
+        s = requests.Session()
+        s.headers.update({
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github+json",
+            "User-Agent": "PHONK-AI",
+        })
+        # blobs/trees/commits são idempotentes o bastante pra repetir em 5xx
+        # raise_on_status=False: esgotou as tentativas, a última resposta volta
+        # pro _call, que vira GitHubError com detail (não RetryError solto)
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                      allowed_methods=None, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers, max_retries=retry)
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        return s
+
+    def _call(self, method: str, path: str, error: str, ok=(200, 201), **kw) -> requests.Response:
+        r = self.session.request(method, f"{self.api}{path}", timeout=60, **kw)
+        if r.status_code not in ok:
+            raise GitHubError(error, r, path=path)
+        return r
+
+    def _branch(self) -> str:
+        if not self.branch:
+            self.branch = self._call("GET", "", "github_repo_failed").json()["default_branch"]
+        return self.branch
+
+    def _create_blob(self, data: bytes) -> str:
+        r = self._call("POST", "/git/blobs", "github_blob_failed",
+                       json={"content": base64.b64encode(data).decode("utf-8"), "encoding": "base64"})
+        sha = r.json()["sha"]
+        self._known.add(sha)
+        return sha
+
+    def _commit_tree(self, entries: List[Dict], message: str) -> str:
+        """
+        tree + commit em cima do HEAD atual e fast-forward do ref. Se outro
+        push mover o ref no meio (422), refaz com o HEAD novo.
+        """
+        branch = self._branch()
+        for attempt in range(GITHUB_REF_RETRIES):
+            head = self._call("GET", f"/git/ref/heads/{branch}", "github_ref_failed").json()["object"]["sha"]
+            base_tree = self._call("GET", f"/git/commits/{head}", "github_commit_failed").json()["tree"]["sha"]
+            tree = self._call("POST", "/git/trees", "github_tree_failed",
+                              json={"base_tree": base_tree, "tree": entries}).json()["sha"]
+            commit = self._call("POST", "/git/commits", "github_commit_failed",
+                                json={"message": message, "tree": tree, "parents": [head]}).json()["sha"]
+            r = self.session.patch(f"{self.api}/git/refs/heads/{branch}", json={"sha": commit, "force": False}, timeout=60)
+            if r.status_code == 200:
+                return commit
+            if r.status_code != 422 or attempt == GITHUB_REF_RETRIES - 1:
+                raise GitHubError("github_ref_update_failed", r, branch=branch)
+        raise AssertionError("unreachable")
+
+    def persist(self, corpus_path: str, progress: ProgressFn = None) -> Dict:
+        """
+        progress(files_pushed, files_total): depois de cada blob.
+        """
+        corpus_id = os.path.basename(corpus_path.rstrip("/"))
+        repo_dir = f"{self.base_repo_dir}/{corpus_id}"
+        files, skipped_big = _github_files(corpus_path)
+        total = len(files)
+        if progress:
+            progress(0, total)
+
+        shas: Dict[str, str] = {}
+        pending: Dict[str, bytes] = {}  # git sha -> conteúdo ainda não enviado
+        for rel, local in files:
+            with open(local, "rb") as f:
+                data = f.read()
+            sha = _git_blob_sha(data)
+            shas[rel] = sha
+            if sha not in self._known:
+                pending[sha] = data
+
+        done = total - len(pending)
+        if progress and done:
+            progress(done, total)
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gh_blob") as ex:
+                futures = {ex.submit(self._create_blob, data): sha for sha, data in pending.items()}
+                for fut in as_completed(futures):
+                    if fut.result() != futures[fut]:
+                        raise RuntimeError(f"sha do blob diverge: {futures[fut]}")
+                    done += 1
+                    if progress:
+                        progress(done, total)
+
+        commit = None
+        if files:
+            entries = [
+                {"path": f"{repo_dir}/{rel}", "mode": "100644", "type": "blob", "sha": shas[rel]}
+                for rel, _ in files
+            ]
+            commit = self._commit_tree(entries, f"PHONK AI: add corpus {corpus_id} ({total} files)")
+
+        return {
+            "status": "ok",
+            "backend": self.name,
+            "repo": self.repo,
+            "branch": self.branch,
+            "commit": commit,
+            "github_path": repo_dir,
+            "files": total,
+            "objects_uploaded": len(pending),
+            "objects_deduped": total - len(pending),
+            "projects_uploaded": sum(1 for rel, _ in files if rel.startswith("projects/")),
+            "projects_skipped_big": skipped_big,
+        }
+
+    def _tree_entries(self, path: str) -> List[Dict]:
+        branch = self._branch()
+        r = self.session.get(f"{self.api}/git/trees/{branch}:{path}", params={"recursive": "1"}, timeout=60)
+        if r.status_code == 404:
+            return []
+        if r.status_code != 200:
+            raise GitHubError("github_tree_failed", r, path=path)
+        return r.json().get("tree", [])
+
+    def fetch(self, corpus_id: str, dest_dir: str) -> str:
+        entries = [e for e in self._tree_entries(f"{self.base_repo_dir}/{corpus_id}") if e["type"] == "blob"]
+        if not entries:
+            raise FileNotFoundError(f"corpus não encontrado no GitHub: {corpus_id}")
+
+        final = os.path.join(dest_dir, corpus_id)
+        tmp = fetch_tmp_dir(dest_dir, corpus_id)
+
+        def get(entry):
+            r = self._call("GET", f"/git/blobs/{entry['sha']}", "github_blob_failed")
+            dst = os.path.join(tmp, *entry["path"].split("/"))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            with open(dst, "wb") as f:
+                f.write(base64.b64decode(r.json()["content"]))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gh_get") as ex:
+                list(ex.map(get, entries))
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        replace_dir(tmp, final)
+        return final
+
+    def list_corpora(self) -> List[str]:
+        branch = self._branch()
+        r = self.session.get(f"{self.api}/git/trees/{branch}:{self.base_repo_dir}", timeout=60)
+        if r.status_code == 404:
+            return []
+        if r.status_code != 200:
+            raise GitHubError("github_tree_failed", r, path=self.base_repo_dir)
+        return sorted(e["path"] for e in r.json().get("tree", []) if e["type"] == "tree")
+
+
+def github_storage_from_env() -> Optional[GitHubStorage]:
+    """
+    GITHUB_TOKEN + GITHUB_REPO ("user/repo") -> GitHubStorage; sem eles, None.
+    """
+    token = os.getenv("GITHUB_TOKEN")
+    repo = os.getenv("GITHUB_REPO")
+    if not token or not repo:
+        return None
+    return GitHubStorage(repo=repo, token=token)
+
+
+# =========================
+# Harness: fake da Git Data API num servidor local
+# =========================
+
+if __name__ == "__main__":
+    import json
+    import time
+    import argparse
+    import filecmp
+    import tempfile
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+
+    ap = argparse.ArgumentParser(description="persist/fetch do GitHubStorage contra uma Git Data API fake local")
+    ap.add_argument("--projects", type=int, default=200, help="JSONs de projeto no corpus sintético")
+    ap.add_argument("--latency_ms", type=float, default=20.0, help="atraso por POST de blob (simula a API)")
+    args = ap.parse_args()
+
+    # repo fake: blobs por git sha, trees como {caminho: sha}, commit -> tree, um branch
+    fake = {
+        "blobs": {}, "trees": {"t0": {}}, "commits": {"c0": "t0"}, "ref": "c0",
+        "calls": [], "fail_ref": 0, "fail_blobs": 0,
+    }
+    fake_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *a):
+            pass
+
+        def _send(self, code: int, obj: dict):
+            body = json.dumps(obj).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> dict:
+            n = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(n) or b"{}")
+
+        def _route(self, method: str) -> str:
+            path = self.path.split("/repos/fake/repo", 1)[1]
+            with fake_lock:
+                fake["calls"].append(method)
+            return path
+
+        def do_GET(self):
+            path = self._route("GET")
+            url = urlparse(path)
+            if path == "":
+                return self._send(200, {"default_branch": "main"})
+            if path == "/git/ref/heads/main":
+                return self._send(200, {"object": {"sha": fake["ref"]}})
+            if path.startswith("/git/commits/"):
+                return self._send(200, {"tree": {"sha": fake["commits"][path.rsplit("/", 1)[1]]}})
+            if path.startswith("/git/blobs/"):
+                data = fake["blobs"][path.rsplit("/", 1)[1]]
+                return self._send(200, {"content": base64.b64encode(data).decode(), "encoding": "base64"})
+            if url.path.startswith("/git/trees/main:"):
+                prefix = url.path[len("/git/trees/main:"):] + "/"
+                tree = fake["trees"][fake["commits"][fake["ref"]]]
+                files = {k[len(prefix):]: v for k, v in tree.items() if k.startswith(prefix)}
+                if not files:
+                    return self._send(404, {"message": "Not Found"})
+                if "recursive" in parse_qs(url.query):
+                    return self._send(200, {"tree": [{"path": k, "type": "blob", "sha": v} for k, v in files.items()]})
+                dirs = sorted({k.split("/")[0] for k in files if "/" in k})
+                return self._send(200, {"tree": [{"path": d, "type": "tree"} for d in dirs]})
+            self._send(404, {"message": "Not Found"})
+
+        def do_POST(self):
+            path = self._route("POST")
+            body = self._body()
+            if path == "/git/blobs":
+                time.sleep(args.latency_ms / 1000.0)
+                with fake_lock:
+                    if fake["fail_blobs"]:
+                        fake["fail_blobs"] -= 1
+                        return self._send(503, {"message": "Service Unavailable"})
+                    data = base64.b64decode(body["content"])
+                    sha = _git_blob_sha(data)
+                    fake["blobs"][sha] = data
+                return self._send(201, {"sha": sha})
+            with fake_lock:
+                if path == "/git/trees":
+                    tree = dict(fake["trees"][body["base_tree"]])
+                    tree.update({e["path"]: e["sha"] for e in body["tree"]})
+                    sha = f"t{len(fake['trees'])}"
+                    fake["trees"][sha] = tree
+                    return self._send(201, {"sha": sha})
+                if path == "/git/commits":
+                    sha = f"c{len(fake['commits'])}"
+                    fake["commits"][sha] = body["tree"]
+                    return self._send(201, {"sha": sha})
+            self._send(404, {"message": "Not Found"})
+
+        def do_PATCH(self):
+            self._route("PATCH")
+            body = self._body()
+            with fake_lock:
+                # 422 = outro push moveu o ref (não é fast-forward)
+                if fake["fail_ref"]:
+                    fake["fail_ref"] -= 1
+                    return self._send(422, {"message": "Update is not a fast forward"})
+                fake["ref"] = body["sha"]
+            self._send(200, {"object": {"sha": body["sha"]}})
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{srv.server_port}"
+
+    # corpus sintético: projetos + alguns repetidos (dedupe por conteúdo)
+    tmp = tempfile.mkdtemp(prefix="flp_gh_")
+    corpus = os.path.join(tmp, "flp_corpus_1")
+    os.makedirs(os.path.join(corpus, "projects"))
+    for i in range(args.projects):
+        with open(os.path.join(corpus, "projects", f"p{i:04d}.json"), "w", encoding="utf-8") as f:
+            json.dump({"project_id": f"p{i % (args.projects // 2 or 1)}", "stats": {}}, f)
+    with open(os.path.join(corpus, "corpus_index.json"), "w", encoding="utf-8") as f:
+        json.dump({"corpus_id": "flp_corpus_1"}, f)
+
+    def check(label: str, ok: bool, extra: str = ""):
+        print(f"{label:44s} {'OK  ' if ok else 'FAIL'} {extra}")
+
+    def counts() -> Dict[str, int]:
+        with fake_lock:
+            out = {m: fake["calls"].count(m) for m in ("GET", "POST", "PATCH")}
+            fake["calls"].clear()
+        return out
+
+    g = GitHubStorage("fake/repo", "token", api_url=api_url)
+    fake["fail_ref"] = 1
+    t = time.perf_counter()
+    res = g.persist(corpus)
+    c = counts()
+    check("persist + ref 422 uma vez (refaz o commit)", res["commit"] is not None and c["PATCH"] == 2,
+          f"{time.perf_counter() - t:.2f}s uploaded={res['objects_uploaded']} deduped={res['objects_deduped']} {c}")
+
+    res = g.persist(corpus)
+    check("persist de novo: nenhum blob sobe", res["objects_uploaded"] == 0, str(counts()))
+
+    g2 = GitHubStorage("fake/repo", "token", api_url=api_url)
+    dest = os.path.join(tmp, "restore")
+    os.makedirs(dest)
+    check("list_corpora (instância nova)", g2.list_corpora() == ["flp_corpus_1"])
+    fetched = g2.fetch("flp_corpus_1", dest)
+    names = sorted(os.listdir(os.path.join(corpus, "projects")))
+    same = names == sorted(os.listdir(os.path.join(fetched, "projects"))) and all(
+        filecmp.cmp(os.path.join(corpus, "projects", n), os.path.join(fetched, "projects", n), shallow=False)
+        for n in names
+    )
+    check("fetch: round trip idêntico", same, str(counts()))
+
+    fake["fail_ref"] = GITHUB_REF_RETRIES
+    with open(os.path.join(corpus, "projects", "novo.json"), "w", encoding="utf-8") as f:
+        f.write("{}")
+    try:
+        g.persist(corpus)
+        check("ref 422 em todas as tentativas", False)
+    except GitHubError as e:
+        check("ref 422 em todas as tentativas", e.detail["error"] == "github_ref_update_failed", e.detail["error"])
+    fake["fail_ref"] = 0
+
+    # 5xx até esgotar o Retry: tem que sair GitHubError com detail, não RetryError
+    fake["fail_blobs"] = 100
+    with open(os.path.join(corpus, "projects", "outro.json"), "w", encoding="utf-8") as f:
+        f.write('{"x": 1}')
+    try:
+        g2.persist(corpus)
+        check("blob 503 até esgotar o retry", False)
+    except GitHubError as e:
+        check("blob 503 até esgotar o retry", e.detail["status_code"] == 503, f"{e.detail['error']} {e.detail['status_code']}")
+    except Exception as e:
+        check("blob 503 até esgotar o retry", False, f"{type(e).__name__}: {e}")
+    fake["fail_blobs"] = 0
+
+    shutil.rmtree(tmp, ignore_errors=True)
+    srv.shutdown()
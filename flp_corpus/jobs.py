@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl  # opcional: sem ele (Windows) não há claim entre processos
+except ImportError:
+    fcntl = None
+
+JOBS_DIR = "flp_jobs"
+JOB_WORKERS = int(os.getenv("FLP_JOB_WORKERS", "1"))
+PROGRESS_FLUSH_SECONDS = 1.0  # progresso vai pro disco no máximo 1x/s
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _now() -> int:
+    return int(time.time())
+
+
+class JobStore:
+    """
+    Estado dos jobs de ingest: dict em memória + um JSON por job em
+    JOBS_DIR/<job_id>.json. Sobrevive a restart; mudança de status vai
+    pro disco na hora, contadores de progresso com throttle.
+
+    Com vários workers (uvicorn --workers N) cada job pertence ao processo
+    que segura o lock de JOBS_DIR/<job_id>.lock (claim); job de outro
+    processo é lido do disco em get()/list().
+    """
+
+    def __init__(self, base_dir: str = JOBS_DIR):
+        self.base_dir = base_dir
+        os.makedirs(base_dir, exist_ok=True)
+        self._jobs: Dict[str, dict] = {}
+        self._last_flush: Dict[str, float] = {}
+        self._claims: Dict[str, int] = {}  # job_id -> fd com o lock (jobs deste processo)
+        self._lock = threading.Lock()
+        self._load_all()
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.base_dir, f"{job_id}.json")
+
+    def _read(self, job_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _load_all(self):
+        # jobs deste processo ficam como estão: a cópia em memória é a mais nova
+        for fn in os.listdir(self.base_dir):
+            if not fn.endswith(".json") or fn[:-5] in self._claims:
+                continue
+            job = self._read(fn[:-5])
+            if job:
+                self._jobs[job["job_id"]] = job
+
+    def claim(self, job_id: str) -> bool:
+        """
+        Lock exclusivo (não bloqueante) do job, mantido até release(). False
+        se outro processo vivo já tem o job; lock de processo morto o SO solta.
+        """
+        if job_id in self._claims:
+            return True
+        if fcntl is None:
+            self._claims[job_id] = -1
+            return True
+        fd = os.open(os.path.join(self.base_dir, f"{job_id}.lock"), os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._claims[job_id] = fd
+        # a partir daqui a cópia em memória é a referência: parte do disco
+        job = self._read(job_id)
+        if job:
+            self._jobs[job_id] = job
+        return True
+
+    def release(self, job_id: str):
+        fd = self._claims.pop(job_id, None)
+        if fd is None or fd < 0:
+            return
+        # quem abrir o .lock antigo depois daqui relê o status (já terminal) e desiste
+        try:
+            os.remove(os.path.join(self.base_dir, f"{job_id}.lock"))
+        except OSError:
+            pass
+        os.close(fd)
+
+    def _flush(self, job: dict):
+        path = self._path(job["job_id"])
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        self._last_flush[job["job_id"]] = time.monotonic()
+
+    def create(self, kind: str, params: dict) -> dict:
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "queued",
+            "created_at": _now(),
+            "updated_at": _now(),
+            "params": params,
+            "phase": None,
+            "progress": {
+                "bytes_downloaded": 0,
+                "bytes_total": None,
+                "archives_extracted": 0,
+                "archives_total": None,
+                "archives_processed": 0,
+                "projects_built": 0,
+                "files_pushed": 0,
+                "files_total": None,
+            },
+            "checkpoints": {},
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            # claim antes do JSON existir: resume_active de outro worker não pega o job
+            self.claim(job["job_id"])
+            self._jobs[job["job_id"]] = job
+            self._flush(job)
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            if job_id not in self._claims:
+                # job de outro worker (ou que ainda não está em memória): estado do disco
+                job = self._read(job_id)
+                if job:
+                    self._jobs[job_id] = job
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def list(self, statuses: Optional[tuple] = None) -> List[dict]:
+        with self._lock:
+            self._load_all()
+            jobs = [j for j in self._jobs.values() if not statuses or j["status"] in statuses]
+            jobs = sorted(jobs, key=lambda j: j["created_at"])
+            return json.loads(json.dumps(jobs))
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job["updated_at"] = _now()
+            self._flush(job)
+
+    def checkpoint(self, job_id: str, name: str, value):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["checkpoints"][name] = value
+            job["updated_at"] = _now()
+            self._flush(job)
+
+    def progress(self, job_id: str, **counters):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["progress"].update(counters)
+            job["updated_at"] = _now()
+            last = self._last_flush.get(job_id, 0.0)
+            if time.monotonic() - last >= PROGRESS_FLUSH_SECONDS:
+                self._flush(job)
+
+
+class JobRunner:
+    """
+    Pool de threads que executa os jobs fora da request HTTP.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = JOB_WORKERS):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="flp_job")
+
+    def submit(self, job_id: str, fn: Callable[[str], Optional[dict]]):
+        self._executor.submit(self._run, job_id, fn)
+
+    def _run(self, job_id: str, fn: Callable[[str], Optional[dict]]):
+        try:
+            self.store.update(job_id, status="running", error=None)
+            try:
+                result = fn(job_id)
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                self.store.update(job_id, status="error", error=detail)
+                return
+            self.store.update(job_id, status="done", phase=None, result=result)
+        finally:
+            self.store.release(job_id)
+
+    def resume_active(self, fn: Callable[[str], Optional[dict]]) -> int:
+        """
+        Re-enfileira jobs que estavam queued/running quando o processo caiu.
+        A função do job decide o que dá pra aproveitar pelos checkpoints.
+        Só pega o job quem conseguir o claim: com N workers subindo juntos
+        cada job volta uma vez, e job de worker vivo fica com ele.
+        """
+        resumed = 0
+        for job in self.store.list(statuses=ACTIVE_STATUSES):
+            job_id = job["job_id"]
+            if not self.store.claim(job_id):
+                continue
+            # claim relê do disco: o dono anterior pode ter terminado no meio
+            job = self.store.get(job_id)
+            if not job or job["status"] not in ACTIVE_STATUSES:
+                self.store.release(job_id)
+                continue
+            self.store.update(job_id, status="queued", resumed_at=_now())
+            self.submit(job_id, fn)
+            resumed += 1
+        return resumed
@@ -0,0 +1,167 @@
+import os
+import json
+import hashlib
+import zipfile
+import threading
+from typing import Dict, Optional, Tuple
+
+MANIFEST_NAME = "corpus_manifest.json"
+MANIFEST_VERSION = 1
+
+_lock = threading.Lock()  # builds concorrentes (jobs) no mesmo output_dir
+
+
+def zip_main_flp(
+    archive_path: str, chunk_size: int = 1024 * 1024, fileobj=None, keep_max: Optional[int] = None
+) -> Optional[Tuple[str, str, Optional[bytes]]]:
+    """
+    (nome do membro, sha256, bytes ou None) do maior .flp direto do zip, sem
+    extrair nada no disco. Mesmo critério do extractor (maior FLP = principal).
+    fileobj: o zip já aberto/em memória (archive_path só dá a extensão).
+    keep_max: FLP de até keep_max bytes é lido inteiro e devolvido, pra quem
+    vai parsear não descomprimir o membro de novo; maior que isso (ou None)
+    só passa pelo hash em blocos.
+    """
+    if os.path.splitext(archive_path)[1].lower() != ".zip":
+        return None
+    try:
+        with zipfile.ZipFile(fileobj or archive_path, "r") as z:
+            flps = [i for i in z.infolist() if not i.is_dir() and i.filename.lower().endswith(".flp")]
+            if not flps:
+                return None
+            main = max(flps, key=lambda i: i.file_size)
+            if keep_max is not None and main.file_size <= keep_max:
+                data = z.read(main)
+                return main.filename, hashlib.sha256(data).hexdigest(), data
+            h = hashlib.sha256()
+            with z.open(main, "r") as f:
+                while True:
+                    b = f.read(chunk_size)
+                    if not b:
+                        break
+                    h.update(b)
+            return main.filename, h.hexdigest(), None
+    except Exception:
+        return None
+
+
+def zip_main_flp_hash(archive_path: str, chunk_size: int = 1024 * 1024, fileobj=None) -> Optional[Tuple[str, str]]:
+    """(nome do membro, sha256) do maior .flp direto do zip (ver zip_main_flp)."""
+    found = zip_main_flp(archive_path, chunk_size, fileobj)
+    return found[:2] if found else None
+
+
+class CorpusManifest:
+    """
+    Manifesto persistente em <output_dir>/corpus_manifest.json:
+      archives: sha256 do archive -> projeto já gerado
+      flps:     sha256 do FLP principal -> projeto já gerado
+    Caminhos relativos ao output_dir. Na primeira carga, semeia com os
+    flp_corpus_* que já existem lá (esses só têm hash de FLP).
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.archives: Dict[str, Dict] = {}
+        self.flps: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.archives = data.get("archives", {})
+                self.flps = data.get("flps", {})
+                return
+            except Exception:
+                pass
+        self._seed_from_corpora()
+
+    def _seed_from_corpora(self):
+        if not os.path.isdir(self.output_dir):
+            return
+        for name in sorted(os.listdir(self.output_dir)):
+            pdir = os.path.join(self.output_dir, name, "projects")
+            if not name.startswith("flp_corpus_") or not os.path.isdir(pdir):
+                continue
+            for fn in sorted(os.listdir(pdir)):
+                if not fn.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(pdir, fn), "r", encoding="utf-8") as f:
+                        pj = json.load(f)
+                except Exception:
+                    continue
+                flps = pj.get("flp_files") or []
+                if flps:
+                    main = max(flps, key=lambda x: x.get("size_bytes", 0))
+                    if main.get("sha256"):
+                        self.flps.setdefault(main["sha256"], self._entry(name, fn, pj.get("project_id")))
+
+    @staticmethod
+    def _entry(corpus_id: str, filename: str, project_id: Optional[str]) -> Dict:
+        return {
+            "corpus_id": corpus_id,
+            "project_file": f"{corpus_id}/projects/{filename}",
+            "project_id": project_id,
+        }
+
+    def _resolve(self, entry: Optional[Dict]) -> Optional[Dict]:
+        if not entry:
+            return None
+        full = os.path.join(self.output_dir, entry["project_file"])
+        return dict(entry, path=full) if os.path.isfile(full) else None
+
+    def lookup(self, archive_sha: str, flp_sha: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        (entry com 'path' absoluto, 'archive_sha256' | 'flp_sha256') ou (None, None).
+        Entradas cujo JSON sumiu do disco contam como miss.
+        """
+        hit = self._resolve(self.archives.get(archive_sha))
+        if hit:
+            return hit, "archive_sha256"
+        if flp_sha:
+            hit = self._resolve(self.flps.get(flp_sha))
+            if hit:
+                return hit, "flp_sha256"
+        return None, None
+
+    def record(self, corpus_id: str, project_id: str, archive_sha: Optional[str], flp_sha: Optional[str]):
+        entry = self._entry(corpus_id, f"{project_id}.json", project_id)
+        if archive_sha:
+            self.archives[archive_sha] = entry
+        if flp_sha:
+            self.flps.setdefault(flp_sha, entry)
+
+    def record_alias(self, archive_sha: str, entry: Dict):
+        # archive novo cujo FLP já era conhecido: próxima vez casa pelo hash do archive
+        self.archives[archive_sha] = {k: entry[k] for k in ("corpus_id", "project_file", "project_id")}
+
+    def save(self):
+        """
+        Merge com o que estiver no disco (outro build pode ter salvo antes)
+        e grava atômico.
+        """
+        with _lock:
+            if os.path.isfile(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        disk = json.load(f)
+                    for k, v in disk.get("archives", {}).items():
+                        self.archives.setdefault(k, v)
+                    for k, v in disk.get("flps", {}).items():
+                        self.flps.setdefault(k, v)
+                except Exception:
+                    pass
+
+            os.makedirs(self.output_dir, exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": MANIFEST_VERSION,
+                    "archives": self.archives,
+                    "flps": self.flps,
+                }, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
@@ -1,11 +1,19 @@
 import os
 import json
 import time
-import hashlib
+import shutil
+import sqlite3
 import zipfile
-from typing import Dict, List, Tuple, Optional
+import threading
+from typing import Callable, List, Tuple, Optional
+
+from flp_corpus.corpus_db import CorpusDB
+from flp_corpus.storage import CorpusStorage
 
 CORPUS_OUT_DIR = "corpus_out"
+LATEST_MASTER_NAME = "LATEST_MASTER.json"
+
+_lock = threading.Lock()  # dois merges ao mesmo tempo partiriam do mesmo master
 
 
 def _safe_mkdir(path: str):
@@ -62,9 +70,91 @@ def _project_dedupe_key(project_json: dict) -> Tuple[str, str]:
     return (src, title)
 
 
+def _link_or_copy(src: str, dst: str):
+    # hard link (mesmo arquivo no disco, sem reserializar); copia se o FS não deixar
+    tmp = f"{dst}.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+def latest_master(base_dir: str = CORPUS_OUT_DIR) -> Optional[dict]:
+    """
+    master_index.json do master apontado por LATEST_MASTER.json (ou None).
+    """
+    ptr = os.path.join(base_dir, LATEST_MASTER_NAME)
+    if not os.path.isfile(ptr):
+        return None
+    try:
+        latest = _read_json(ptr)
+        return _read_json(os.path.join(base_dir, latest["master_id"], "master_index.json"))
+    except Exception:
+        return None
+
+
+def relink_latest_master(base_dir: str = CORPUS_OUT_DIR) -> Optional[dict]:
+    """
+    Aponta LATEST_MASTER.json pro master mais novo que está no disco
+    (created_at do master_index.json), se o ponteiro não existir ou
+    estiver apontando pra um mais velho / que sumiu. Usado depois do
+    restore, que traz os flp_master_* mas não o ponteiro.
+    Retorna o master_index do master apontado (ou None se não tem master).
+    """
+    newest = None
+    if os.path.isdir(base_dir):
+        for name in os.listdir(base_dir):
+            idx = os.path.join(base_dir, name, "master_index.json")
+            if not name.startswith("flp_master_") or not os.path.isfile(idx):
+                continue
+            try:
+                m = _read_json(idx)
+            except Exception:
+                continue
+            if newest is None or (m.get("created_at", 0), name) > (newest.get("created_at", 0), newest["master_id"]):
+                newest = dict(m, master_id=name, master_path=os.path.join(base_dir, name))
+
+    with _lock:
+        current = latest_master(base_dir)
+        if newest is None:
+            return current
+        if current and (current.get("created_at", 0), current["master_id"]) >= (newest.get("created_at", 0), newest["master_id"]):
+            return current
+        _write_json(os.path.join(base_dir, LATEST_MASTER_NAME), {
+            "master_id": newest["master_id"],
+            "master_path": newest["master_path"],
+            "created_at": newest.get("created_at"),
+        })
+        return newest
+
+
+def _new_master_dir(base_dir: str, master_prefix: str, ts: int) -> Tuple[str, str]:
+    """
+    Cria o diretório do master e devolve (master_id, caminho). mkdir é
+    atômico: dois merges no mesmo segundo (outro processo, ex.: CLI junto
+    da API) nunca escrevem no mesmo diretório; o segundo ganha sufixo _<n>.
+    """
+    _safe_mkdir(base_dir)
+    n = 0
+    while True:
+        master_id = f"{master_prefix}{ts}" if n == 0 else f"{master_prefix}{ts}_{n}"
+        master_path = os.path.join(base_dir, master_id)
+        try:
+            os.mkdir(master_path)
+            return master_id, master_path
+        except FileExistsError:
+            n += 1
+
+
 def build_master_corpus(
     base_dir: str = CORPUS_OUT_DIR,
     master_prefix: str = "flp_master_",
+    incremental: bool = True,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+    storage: Optional[CorpusStorage] = None,
 ) -> dict:
     """
     Junta todos os corpus_out/flp_corpus_* em um MASTER único:
@@ -74,84 +164,156 @@ def build_master_corpus(
 
     Dedup:
       - remove projetos com mesma chave (flp_sha + title)
+
+    incremental=True: parte do último master (LATEST_MASTER.json) e só lê
+    os corpus que ainda não estão em merged_corpora; se não tiver nenhum
+    novo, devolve o master atual com status "unchanged". Os JSONs entram
+    no master por hard link (cópia só se o FS não suportar).
+    Só entram corpus com corpus_index.json (build terminado).
+    progress(corpora_done, corpora_total, projects_kept): depois de cada corpus novo.
+    storage: o master novo também é gravado lá (resumo em master_index["storage"]).
     """
-    corpora = list_corpora(base_dir)
-    ts = int(time.time())
-    master_id = f"{master_prefix}{ts}"
-    master_path = os.path.join(base_dir, master_id)
-    projects_out = os.path.join(master_path, "projects")
-    _safe_mkdir(projects_out)
-
-    merged_projects = []
-    seen = {}  # key -> master_project_id
-    duplicates = []  # registros descartados
-
-    for c in corpora:
-        cpath = c["path"]
-        pdir = os.path.join(cpath, "projects")
-        if not os.path.isdir(pdir):
-            continue
-
-        for fn in os.listdir(pdir):
-            if not fn.endswith(".json"):
-                continue
-            src_path = os.path.join(pdir, fn)
-            try:
-                pj = _read_json(src_path)
-            except Exception:
-                continue
+    with _lock:
+        corpora = [c for c in list_corpora(base_dir) if c["has_index"]]
+        base = latest_master(base_dir) if incremental else None
+        if base:
+            already = set(base.get("merged_corpora") or [s["corpus_id"] for s in base.get("sources", [])])
+        else:
+            already = set()
+        new_corpora = [c for c in corpora if c["corpus_id"] not in already]
+        if base and not new_corpora:
+            return dict(base, status="unchanged")
+
+        ts = int(time.time())
+        master_id, master_path = _new_master_dir(base_dir, master_prefix, ts)
+        projects_out = os.path.join(master_path, "projects")
+        _safe_mkdir(projects_out)
+
+        merged_projects = []
+        seen = {}  # key -> master_project_id
+        duplicates = []  # registros descartados
+        linked_from_base = 0
+
+        # projetos do master anterior: só link, sem abrir o JSON (chave já está no índice)
+        if base:
+            base_projects = os.path.join(base_dir, base["master_id"], "projects")
+            duplicates.extend(base.get("duplicates", []))
+            for p in base.get("projects", []):
+                src_path = os.path.join(base_projects, p["file"])
+                if not os.path.isfile(src_path):
+                    continue
+                if p.get("dedupe_key"):
+                    key = tuple(p["dedupe_key"])
+                else:
+                    # master antigo (antes do dedupe_key no índice)
+                    try:
+                        key = _project_dedupe_key(_read_json(src_path))
+                    except Exception:
+                        continue
+                seen[key] = p.get("project_id") or p["file"].replace(".json", "")
+                merged_projects.append(dict(p, dedupe_key=list(key)))
+                _link_or_copy(src_path, os.path.join(projects_out, p["file"]))
+                linked_from_base += 1
+
+        for n, c in enumerate(new_corpora, start=1):
+            cpath = c["path"]
+            pdir = os.path.join(cpath, "projects")
+            files = sorted(os.listdir(pdir)) if os.path.isdir(pdir) else []
 
-            key = _project_dedupe_key(pj)
-            if key in seen:
-                duplicates.append({
-                    "dropped_project_id": pj.get("project_id"),
-                    "kept_project_id": seen[key],
-                    "reason": "duplicate_flp_sha_or_source+title",
+            for fn in files:
+                if not fn.endswith(".json"):
+                    continue
+                src_path = os.path.join(pdir, fn)
+                try:
+                    pj = _read_json(src_path)
+                except Exception:
+                    continue
+
+                key = _project_dedupe_key(pj)
+                if key in seen:
+                    duplicates.append({
+                        "dropped_project_id": pj.get("project_id"),
+                        "kept_project_id": seen[key],
+                        "reason": "duplicate_flp_sha_or_source+title",
+                        "source_corpus": c["corpus_id"],
+                    })
+                    continue
+
+                # mantém
+                seen[key] = pj.get("project_id") or fn.replace(".json", "")
+                flps = pj.get("flp_files") or []
+                merged_projects.append({
+                    "project_id": pj.get("project_id"),
+                    "title": pj.get("title"),
+                    "flp_sha": max(flps, key=lambda x: x.get("size_bytes", 0)).get("sha256") if flps else None,
+                    "stats": pj.get("stats", {}),
                     "source_corpus": c["corpus_id"],
+                    "file": fn,
+                    "dedupe_key": list(key),
                 })
-                continue
 
-            # mantém
-            seen[key] = pj.get("project_id") or fn.replace(".json", "")
-            merged_projects.append({
-                "project_id": pj.get("project_id"),
-                "title": pj.get("title"),
-                "stats": pj.get("stats", {}),
-                "source_corpus": c["corpus_id"],
-                "file": fn,
-            })
-
-            # copia o json do projeto pro master
-            out_path = os.path.join(projects_out, fn)
-            _write_json(out_path, pj)
-
-    totals = {
-        "source_corpora": len(corpora),
-        "projects_kept": len(merged_projects),
-        "duplicates_dropped": len(duplicates),
-    }
-
-    master_index = {
-        "status": "ok",
-        "master_id": master_id,
-        "master_path": master_path,
-        "created_at": ts,
-        "sources": corpora,
-        "projects": merged_projects,
-        "duplicates": duplicates,
-        "totals": totals,
-    }
-
-    _write_json(os.path.join(master_path, "master_index.json"), master_index)
-
-    # ponte pro “último master”
-    _write_json(os.path.join(base_dir, "LATEST_MASTER.json"), {
-        "master_id": master_id,
-        "master_path": master_path,
-        "created_at": ts,
-    })
-
-    return master_index
+                # o JSON do projeto entra no master por link
+                _link_or_copy(src_path, os.path.join(projects_out, fn))
+
+            if progress:
+                progress(n, len(new_corpora), len(merged_projects))
+
+        totals = {
+            "source_corpora": len(corpora),
+            "new_corpora": len(new_corpora),
+            "projects_kept": len(merged_projects),
+            "projects_linked_from_base": linked_from_base,
+            "duplicates_dropped": len(duplicates),
+        }
+
+        master_index = {
+            "status": "ok",
+            "master_id": master_id,
+            "master_path": master_path,
+            "created_at": ts,
+            "base_master": base["master_id"] if base else None,
+            "merged_corpora": sorted(already | {c["corpus_id"] for c in new_corpora}),
+            "sources": corpora,
+            "projects": merged_projects,
+            "duplicates": duplicates,
+            "totals": totals,
+        }
+
+        _write_json(os.path.join(master_path, "master_index.json"), master_index)
+
+        # master também vai pro índice consultável (kind="master")
+        try:
+            db = CorpusDB(base_dir)
+            try:
+                db.add_corpus(master_id, "master", master_path, ts, [
+                    (
+                        {
+                            "project_id": p["project_id"],
+                            "title": p["title"],
+                            "created_at": ts,
+                            "flp_sha": p.get("flp_sha"),
+                            "stats": p["stats"],
+                        },
+                        os.path.join(projects_out, p["file"]),
+                    )
+                    for p in merged_projects
+                ])
+            finally:
+                db.close()
+        except sqlite3.Error:
+            pass
+
+        # ponte pro “último master”
+        _write_json(os.path.join(base_dir, LATEST_MASTER_NAME), {
+            "master_id": master_id,
+            "master_path": master_path,
+            "created_at": ts,
+        })
+
+        if storage is not None:
+            master_index["storage"] = storage.persist(master_path)
+
+        return master_index
 
 
 def zip_master(master_path: str) -> str:
@@ -1,125 +1,75 @@
 import os
 import json
-import time
 import shutil
 import zipfile
-import base64
 import tempfile
 import re
-import requests
+import uuid
+import threading
+from typing import Callable, Optional
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from pydantic import BaseModel
 
-from flp_corpus.extractor_v1 import build_corpus, safe_mkdir
+from flp_corpus.extractor_v1 import build_corpus, build_corpus_from_pack, safe_mkdir, PROBE_MODES
+from flp_corpus.jobs import JobStore, JobRunner, ACTIVE_STATUSES
+from flp_corpus.corpus_db import CorpusDB, SORT_COLUMNS
+from flp_corpus.master_builder import build_master_corpus, latest_master, relink_latest_master
+from flp_corpus.storage import CorpusStorage, storage_from_env
+from flp_corpus.downloader import download, new_session, DownloadError
 
 router = APIRouter(prefix="/flp", tags=["FLP Corpus"])
 
 CORPUS_OUT_DIR = "corpus_out"
+UPLOADS_DIR = "flp_uploads"
+BUILD_WORKERS = int(os.getenv("FLP_BUILD_WORKERS", "1"))  # 0 = nº de CPUs
+INCREMENTAL_BUILDS = os.getenv("FLP_INCREMENTAL", "0") == "1"
+# archive interno do pacote até esse tamanho é lido em memória; acima, passa pelo disco
+NESTED_MEMORY_MAX_BYTES = int(os.getenv("FLP_NESTED_MEMORY_MAX_BYTES", str(32 * 1024 * 1024)))
+# baixa do storage os corpus que sumiram do disco: auto = só com CORPUS_OUT_DIR vazio (redeploy) | 1 = sempre | 0 = nunca
+RESTORE_ON_STARTUP = os.getenv("FLP_STORAGE_RESTORE", "auto")
+
+job_store = JobStore()
+job_runner = JobRunner(job_store)
+restore_runner = JobRunner(job_store, max_workers=1)  # restore não segura a fila dos ingests
+RESTORE_CLAIM = "restore"  # claim (lock em flp_jobs/) de um restore por vez entre workers
+_restore_lock = threading.Lock()  # e dentro do processo
+corpus_storage = storage_from_env()
+
+_corpus_db: Optional[CorpusDB] = None
+_corpus_db_lock = threading.Lock()
+
+
+def get_corpus_db() -> CorpusDB:
+    """
+    Índice SQLite aberto no primeiro uso (startup ou request), não no
+    import: importar o router não cria arquivo nenhum em CORPUS_OUT_DIR.
+    """
+    global _corpus_db
+    with _corpus_db_lock:
+        if _corpus_db is None:
+            _corpus_db = CorpusDB(CORPUS_OUT_DIR)
+        return _corpus_db
 
 
 # =========================
-# GitHub Upload (Contents API)
+# Persistência do corpus (FLP_STORAGE: local / S3 / GitHub)
 # =========================
 
-def _gh_headers(token: str):
-    return {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github+json",
-        "User-Agent": "PHONK-AI",
-    }
-
-
-def github_put_file(repo: str, token: str, repo_path: str, content_bytes: bytes, message: str):
-    url = f"https://api.github.com/repos/{repo}/contents/{repo_path}"
-    headers = _gh_headers(token)
-
-    # Se já existe, pega sha
-    r = requests.get(url, headers=headers, timeout=30)
-    sha = None
-    if r.status_code == 200:
-        try:
-            sha = r.json().get("sha")
-        except Exception:
-            sha = None
-
-    payload = {
-        "message": message,
-        "content": base64.b64encode(content_bytes).decode("utf-8"),
-    }
-    if sha:
-        payload["sha"] = sha
-
-    w = requests.put(url, headers=headers, json=payload, timeout=60)
-    if w.status_code not in (200, 201):
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "error": "github_put_failed",
-                "status_code": w.status_code,
-                "response": w.text[:4000],
-                "repo_path": repo_path,
-            },
-        )
-
-    return w.json()
-
-
-def upload_corpus_jsons_to_github(corpus_path: str):
-    token = os.getenv("GITHUB_TOKEN")
-    repo = os.getenv("GITHUB_REPO")  # "user/repo"
-
-    if not token or not repo:
-        return {"status": "skipped", "reason": "missing_GITHUB_TOKEN_or_GITHUB_REPO"}
-
-    corpus_id = os.path.basename(corpus_path.rstrip("/"))
-    base_repo_dir = f"flp_corpus_storage/{corpus_id}"
-
-    # index
-    index_path = os.path.join(corpus_path, "corpus_index.json")
-    if os.path.isfile(index_path):
-        with open(index_path, "rb") as f:
-            github_put_file(
-                repo=repo,
-                token=token,
-                repo_path=f"{base_repo_dir}/corpus_index.json",
-                content_bytes=f.read(),
-                message=f"PHONK AI: add corpus index {corpus_id}",
-            )
-
-    # projects
-    projects_dir = os.path.join(corpus_path, "projects")
-    uploaded = 0
-    skipped_big = 0
-
-    if os.path.isdir(projects_dir):
-        for fn in os.listdir(projects_dir):
-            if not fn.endswith(".json"):
-                continue
-            fp = os.path.join(projects_dir, fn)
-            if not os.path.isfile(fp):
-                continue
-            if os.path.getsize(fp) > 5 * 1024 * 1024:  # 5MB
-                skipped_big += 1
-                continue
-
-            with open(fp, "rb") as f:
-                github_put_file(
-                    repo=repo,
-                    token=token,
-                    repo_path=f"{base_repo_dir}/projects/{fn}",
-                    content_bytes=f.read(),
-                    message=f"PHONK AI: add project {fn} ({corpus_id})",
-                )
-            uploaded += 1
-
-    return {
-        "status": "ok",
-        "repo": repo,
-        "github_path": base_repo_dir,
-        "projects_uploaded": uploaded,
-        "projects_skipped_big": skipped_big,
-    }
+def persist_corpus(
+    corpus_path: str,
+    progress: Optional[Callable[[int, int], None]] = None,
+    storage: Optional[CorpusStorage] = None,
+):
+    """
+    progress(files_pushed, files_total): chamado conforme os arquivos sobem.
+    storage: destino alternativo (ex.: fake server nos testes); padrão é o
+    de FLP_STORAGE (ou GitHub, se GITHUB_TOKEN / GITHUB_REPO existirem).
+    """
+    storage = storage or corpus_storage
+    if storage is None:
+        return {"status": "skipped", "reason": "no_storage (FLP_STORAGE or GITHUB_TOKEN/GITHUB_REPO)"}
+    return storage.persist(corpus_path, progress=progress)
 
 
 # =========================
@@ -134,25 +84,27 @@ def extract_gdrive_file_id(url: str) -> str | None:
     return m.group(1) if m else None
 
 
-def download_from_url(url: str, dst_path: str, max_bytes: int = 2 * 1024**3):
+ProgressFn = Optional[Callable[[int, Optional[int]], None]]
+
+
+def _download(url: str, dst_path: str, max_bytes: int, progress: ProgressFn, **kw) -> dict:
+    # parcial fica em UPLOADS_DIR, chaveado pela URL de origem: retry do mesmo link continua
+    try:
+        return download(url, dst_path, max_bytes=max_bytes, progress=progress, partial_dir=UPLOADS_DIR, **kw)
+    except DownloadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+def download_from_url(url: str, dst_path: str, max_bytes: int = 2 * 1024**3, progress: ProgressFn = None) -> dict:
     """
-    Baixa arquivo via HTTP stream.
-    max_bytes: segurança (default 2GB).
+    Baixa arquivo via HTTP (sessão com pool, Range pra retomar / segmentos
+    em paralelo). max_bytes: segurança (default 2GB).
+    Retorna {bytes, sha256, resumed_from, segments, ranges}.
     """
-    with requests.get(url, stream=True, timeout=(30, 1800)) as r:
-        r.raise_for_status()
-        total = 0
-        with open(dst_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=1024 * 1024):
-                if not chunk:
-                    continue
-                f.write(chunk)
-                total += len(chunk)
-                if total > max_bytes:
-                    raise HTTPException(status_code=413, detail="Arquivo muito grande (limite interno).")
-
-
-def download_google_drive_share(url: str, dst_path: str, max_bytes: int = 2 * 1024**3):
+    return _download(url, dst_path, max_bytes, progress)
+
+
+def download_google_drive_share(url: str, dst_path: str, max_bytes: int = 2 * 1024**3, progress: ProgressFn = None) -> dict:
     """
     Suporta links do Drive tipo:
     - https://drive.google.com/file/d/FILE_ID/view?...
@@ -164,7 +116,7 @@ def download_google_drive_share(url: str, dst_path: str, max_bytes: int = 2 * 10
     if not file_id:
         raise HTTPException(status_code=400, detail="Link do Google Drive inválido (não achei o FILE_ID).")
 
-    session = requests.Session()
+    session = new_session()  # cookies do Drive são por download
     base = "https://drive.google.com/uc"
     params = {"id": file_id, "export": "download"}
 
@@ -174,16 +126,8 @@ def download_google_drive_share(url: str, dst_path: str, max_bytes: int = 2 * 10
 
     # Se vier arquivo direto, terá header de download
     if "content-disposition" in r.headers:
-        total = 0
-        with open(dst_path, "wb") as f:
-            for chunk in r.iter_content(1024 * 1024):
-                if not chunk:
-                    continue
-                f.write(chunk)
-                total += len(chunk)
-                if total > max_bytes:
-                    raise HTTPException(status_code=413, detail="Arquivo muito grande (limite interno).")
-        return
+        r.close()
+        return _download(base, dst_path, max_bytes, progress, session=session, params=params, key=url)
 
     # Se não veio direto, o Drive devolveu HTML pedindo confirmação.
     # Pegamos o confirm token pelo cookie.
@@ -211,18 +155,7 @@ def download_google_drive_share(url: str, dst_path: str, max_bytes: int = 2 * 10
         )
 
     params2 = {"id": file_id, "export": "download", "confirm": confirm}
-    r2 = session.get(base, params=params2, stream=True, timeout=(30, 1800))
-    r2.raise_for_status()
-
-    total = 0
-    with open(dst_path, "wb") as f:
-        for chunk in r2.iter_content(1024 * 1024):
-            if not chunk:
-                continue
-            f.write(chunk)
-            total += len(chunk)
-            if total > max_bytes:
-                raise HTTPException(status_code=413, detail="Arquivo muito grande (limite interno).")
+    return _download(base, dst_path, max_bytes, progress, session=session, params=params2, key=url)
 
 
 # =========================
@@ -231,40 +164,14 @@ def download_google_drive_share(url: str, dst_path: str, max_bytes: int = 2 * 10
 
 class IngestUrlBody(BaseModel):
     url: str
+    probe_mode: str = "full"  # header | sampled | full
 
 
 # =========================
-# Endpoints
+# Pipeline de ingest (roda no JobRunner)
 # =========================
 
-@router.post("/ingest")
-async def ingest_flp_archives(file: UploadFile = File(...)):
-    """
-    Upload normal (se você quiser usar).
-    """
-    safe_mkdir("flp_uploads")
-    safe_mkdir(CORPUS_OUT_DIR)
-
-    upload_path = os.path.join("flp_uploads", file.filename)
-    with open(upload_path, "wb") as f:
-        while True:
-            chunk = await file.read(1024 * 1024)
-            if not chunk:
-                break
-            f.write(chunk)
-
-    ts = int(time.time())
-    archives_dir = os.path.join("flp_uploads", f"batch_{ts}")
-    safe_mkdir(archives_dir)
-
-    try:
-        with zipfile.ZipFile(upload_path, "r") as z:
-            z.extractall(archives_dir)
-    except Exception:
-        shutil.move(upload_path, os.path.join(archives_dir, os.path.basename(upload_path)))
-
-    corpus_path = build_corpus(archives_dir=archives_dir, output_dir=CORPUS_OUT_DIR)
-
+def _read_index_summary(corpus_path: str):
     # lê totals/pending (debug)
     index_path = os.path.join(corpus_path, "corpus_index.json")
     totals = {}
@@ -274,97 +181,392 @@ async def ingest_flp_archives(file: UploadFile = File(...)):
             idx = json.load(f)
             totals = idx.get("totals", {})
             pending = idx.get("pending_archives", [])
+    return totals, pending
 
-    gh = upload_corpus_jsons_to_github(corpus_path)
 
-    shutil.rmtree(archives_dir, ignore_errors=True)
+def _cleanup_job_inputs(params: dict):
+    shutil.rmtree(params["archives_dir"], ignore_errors=True)
     try:
-        if os.path.isfile(upload_path):
-            os.remove(upload_path)
+        if os.path.isfile(params["source_path"]):
+            os.remove(params["source_path"])
     except Exception:
         pass
 
-    return {
+
+def run_ingest_job(job_id: str) -> dict:
+    """
+    download -> extract/build (pipeline) -> persist. Cada fase grava um checkpoint;
+    num restart, o job continua da última fase cujo resultado ainda está
+    no disco (persist é idempotente: conteúdo já guardado não sobe de novo).
+    """
+    job = job_store.get(job_id)
+    params = job["params"]
+    checkpoints = job["checkpoints"]
+    source_path = params["source_path"]
+    archives_dir = params["archives_dir"]
+
+    try:
+        # 1) download (só modo url)
+        if job["kind"] == "url" and not (checkpoints.get("downloaded") and os.path.isfile(source_path)):
+            job_store.update(job_id, phase="download")
+            url = params["source_url"]
+
+            def on_bytes(done: int, total: Optional[int]):
+                job_store.progress(job_id, bytes_downloaded=done, bytes_total=total)
+
+            try:
+                if "drive.google.com" in url:
+                    info = download_google_drive_share(url, source_path, progress=on_bytes)
+                else:
+                    info = download_from_url(url, source_path, progress=on_bytes)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Falha ao baixar URL: {e}")
+            job_store.checkpoint(job_id, "downloaded", info)
+
+        # 2) extract -> build em pipeline: cada archive interno é lido do
+        # pacote quando o build vai usar (em memória se for pequeno, por
+        # archives_dir se for grande); o pacote não é descompactado no disco
+        corpus_path = checkpoints.get("corpus_path")
+        if not (corpus_path and os.path.isfile(os.path.join(corpus_path, "corpus_index.json"))):
+            job_store.update(job_id, phase="build")
+            if not os.path.isfile(source_path):
+                raise HTTPException(status_code=410, detail="Arquivo de origem não existe mais (upload perdido no restart).")
+            shutil.rmtree(archives_dir, ignore_errors=True)
+            safe_mkdir(archives_dir)
+
+            def on_archive(done: int, total: int, built: int):
+                job_store.progress(job_id, archives_processed=done, archives_total=total, projects_built=built)
+
+            def on_extracted(done: int, total: int):
+                job_store.progress(job_id, archives_extracted=done, archives_total=total)
+
+            build_kw = dict(output_dir=CORPUS_OUT_DIR, progress=on_archive, workers=BUILD_WORKERS,
+                            incremental=INCREMENTAL_BUILDS, probe_mode=params.get("probe_mode", "full"))
+            if zipfile.is_zipfile(source_path):
+                corpus_path = build_corpus_from_pack(
+                    source_path, spool_dir=archives_dir, memory_max_bytes=NESTED_MEMORY_MAX_BYTES,
+                    extracted=on_extracted, **build_kw
+                )
+            elif job["kind"] == "url":
+                raise HTTPException(status_code=400, detail="O arquivo baixado não é um ZIP válido.")
+            else:
+                # upload de um archive solto (.rar)
+                corpus_path = build_corpus(None, archives=[source_path], archives_total=1, **build_kw)
+            job_store.checkpoint(job_id, "corpus_path", corpus_path)
+
+        totals, pending = _read_index_summary(corpus_path)
+
+        # 4) persist (storage configurado)
+        job_store.update(job_id, phase="persist")
+
+        def on_push(done: int, total: int):
+            job_store.progress(job_id, files_pushed=done, files_total=total)
+
+        stored = persist_corpus(corpus_path, progress=on_push)
+    except Exception:
+        _cleanup_job_inputs(params)
+        raise
+
+    # cleanup
+    _cleanup_job_inputs(params)
+
+    result = {
         "status": "ok",
-        "mode": "upload",
+        "mode": job["kind"],
         "corpus_path": corpus_path,
         "totals": totals,
         "pending_archives": pending,
-        "github": gh,
+        "storage": stored,
     }
+    if job["kind"] == "url":
+        result["source_url"] = params["source_url"]
+        download_info = job_store.get(job_id)["checkpoints"].get("downloaded")
+        if isinstance(download_info, dict):
+            result["source_sha256"] = download_info["sha256"]
+    return result
 
 
-@router.post("/ingest/url")
-def ingest_flp_from_url(body: IngestUrlBody):
+def run_master_job(job_id: str) -> dict:
     """
-    NOVO: Você manda só o LINK (Google Drive recomendado).
-    O servidor baixa o zip grande por trás e processa.
+    Merge dos corpus no master (incremental: só os corpus novos).
     """
-    url = (body.url or "").strip()
-    if not url:
-        raise HTTPException(status_code=400, detail="URL vazia.")
+    job = job_store.get(job_id)
+    job_store.update(job_id, phase="merge")
 
-    safe_mkdir("flp_uploads")
-    safe_mkdir(CORPUS_OUT_DIR)
-
-    ts = int(time.time())
-    tmp_zip = os.path.join("flp_uploads", f"remote_{ts}.zip")
+    def on_corpus(done: int, total: int, kept: int):
+        job_store.progress(job_id, corpora_merged=done, corpora_total=total, projects_kept=kept)
 
-    # Baixa (Drive ou URL direta)
-    try:
-        if "drive.google.com" in url:
-            download_google_drive_share(url, tmp_zip)
-        else:
-            download_from_url(url, tmp_zip)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Falha ao baixar URL: {e}")
+    master = build_master_corpus(CORPUS_OUT_DIR, incremental=job["params"].get("incremental", True),
+                                 progress=on_corpus, storage=corpus_storage)
+    return {
+        "status": master["status"],
+        "master_id": master["master_id"],
+        "master_path": master["master_path"],
+        "base_master": master.get("base_master"),
+        "totals": master["totals"],
+        "storage": master.get("storage"),
+    }
 
-    # Extrai
-    archives_dir = os.path.join("flp_uploads", f"batch_{ts}")
-    safe_mkdir(archives_dir)
 
-    try:
-        with zipfile.ZipFile(tmp_zip, "r") as z:
-            z.extractall(archives_dir)
-    except Exception as e:
-        shutil.rmtree(archives_dir, ignore_errors=True)
+def run_restore_job(job_id: str) -> dict:
+    """
+    Baixa do storage os corpus/masters que não estão em CORPUS_OUT_DIR
+    (disco novo depois de redeploy), indexa no SQLite e refaz o
+    LATEST_MASTER.json. Um restore por vez: se outro worker já está
+    restaurando, este termina como "skipped".
+    """
+    job_store.update(job_id, phase="restore")
+    with _restore_lock:
+        if not job_store.claim(RESTORE_CLAIM):
+            return {"status": "skipped", "reason": "restore em andamento em outro processo"}
         try:
-            os.remove(tmp_zip)
-        except Exception:
-            pass
-        raise HTTPException(status_code=400, detail=f"O arquivo baixado não é um ZIP válido: {e}")
+            safe_mkdir(CORPUS_OUT_DIR)
+            missing = [c for c in corpus_storage.list_corpora() if not os.path.isdir(os.path.join(CORPUS_OUT_DIR, c))]
+            job_store.progress(job_id, corpora_restored=0, corpora_total=len(missing))
+            for n, corpus_id in enumerate(missing, start=1):
+                get_corpus_db().index_corpus_dir(corpus_storage.fetch(corpus_id, CORPUS_OUT_DIR))
+                job_store.progress(job_id, corpora_restored=n, corpora_total=len(missing))
+            latest = relink_latest_master(CORPUS_OUT_DIR)
+        finally:
+            job_store.release(RESTORE_CLAIM)
+    return {
+        "status": "ok",
+        "backend": corpus_storage.name,
+        "restored": missing,
+        "latest_master": latest["master_id"] if latest else None,
+    }
 
-    # Build corpus
-    corpus_path = build_corpus(archives_dir=archives_dir, output_dir=CORPUS_OUT_DIR)
 
-    # lê totals/pending (debug)
-    index_path = os.path.join(corpus_path, "corpus_index.json")
-    totals = {}
-    pending = []
-    if os.path.isfile(index_path):
-        with open(index_path, "r", encoding="utf-8") as f:
-            idx = json.load(f)
-            totals = idx.get("totals", {})
-            pending = idx.get("pending_archives", [])
+JOB_FUNCTIONS = {
+    "upload": run_ingest_job,
+    "url": run_ingest_job,
+    "master": run_master_job,
+    "restore": run_restore_job,
+}
 
-    # GitHub persist
-    gh = upload_corpus_jsons_to_github(corpus_path)
 
-    # cleanup
-    shutil.rmtree(archives_dir, ignore_errors=True)
-    try:
-        os.remove(tmp_zip)
-    except Exception:
-        pass
+def run_job(job_id: str) -> Optional[dict]:
+    return JOB_FUNCTIONS[job_store.get(job_id)["kind"]](job_id)
 
+
+def _job_params(job_key: str, source_path: str, **extra) -> dict:
+    params = {
+        "source_path": source_path,
+        "archives_dir": os.path.join(UPLOADS_DIR, f"batch_{job_key}"),
+    }
+    params.update(extra)
+    return params
+
+
+def _check_probe_mode(probe_mode: str):
+    if probe_mode not in PROBE_MODES:
+        raise HTTPException(status_code=400, detail=f"probe_mode inválido (use: {', '.join(PROBE_MODES)}).")
+
+
+def _job_accepted(job: dict) -> dict:
     return {
-        "status": "ok",
-        "mode": "url",
-        "source_url": url,
-        "corpus_path": corpus_path,
-        "totals": totals,
-        "pending_archives": pending,
-        "github": gh,
-    }
\ No newline at end of file
+        "status": "queued",
+        "job_id": job["job_id"],
+        "mode": job["kind"],
+        "poll": f"/flp/jobs/{job['job_id']}",
+    }
+
+
+# =========================
+# Endpoints
+# =========================
+
+_started = False
+
+
+def _should_restore() -> bool:
+    if RESTORE_ON_STARTUP != "auto":
+        return RESTORE_ON_STARTUP == "1"
+    if not os.path.isdir(CORPUS_OUT_DIR):
+        return True
+    return not any(n.startswith(("flp_corpus_", "flp_master_")) for n in os.listdir(CORPUS_OUT_DIR))
+
+
+@router.on_event("startup")
+def on_startup():
+    # o FastAPI pode chamar o startup de um router incluído mais de uma vez;
+    # rodar duas vezes duplicaria os jobs re-enfileirados
+    global _started
+    if _started:
+        return
+    _started = True
+
+    # jobs que estavam na fila / rodando quando o processo caiu
+    job_runner.resume_active(run_job)
+
+    # primeira subida com o índice SQLite: indexa os corpus que já estão no disco
+    corpus_db = get_corpus_db()
+    if corpus_db.is_empty():
+        corpus_db.rebuild()
+
+    # o que está no storage e não está no disco volta em background
+    # restore já ativo (retomado acima ou criado por outro worker) não ganha outro
+    restoring = any(j["kind"] == "restore" for j in job_store.list(statuses=ACTIVE_STATUSES))
+    if corpus_storage is not None and not restoring and _should_restore():
+        job = job_store.create("restore", {})
+        restore_runner.submit(job["job_id"], run_restore_job)
+
+
+@router.post("/ingest", status_code=202)
+async def ingest_flp_archives(file: UploadFile = File(...), probe_mode: str = "full"):
+    """
+    Upload normal (se você quiser usar).
+    Só grava o arquivo e enfileira; o progresso sai em /flp/jobs/{job_id}.
+    probe_mode (query): header | sampled | full.
+    """
+    _check_probe_mode(probe_mode)
+    safe_mkdir(UPLOADS_DIR)
+    safe_mkdir(CORPUS_OUT_DIR)
+
+    job_key = uuid.uuid4().hex[:12]
+    filename = os.path.basename(file.filename or "upload.zip")
+    upload_path = os.path.join(UPLOADS_DIR, f"{job_key}_{filename}")
+    with open(upload_path, "wb") as f:
+        while True:
+            chunk = await file.read(1024 * 1024)
+            if not chunk:
+                break
+            f.write(chunk)
+
+    job = job_store.create("upload", _job_params(job_key, upload_path, filename=filename, probe_mode=probe_mode))
+    job_runner.submit(job["job_id"], run_ingest_job)
+    return _job_accepted(job)
+
+
+@router.post("/ingest/url", status_code=202)
+def ingest_flp_from_url(body: IngestUrlBody):
+    """
+    NOVO: Você manda só o LINK (Google Drive recomendado).
+    O servidor baixa o zip grande por trás e processa num job;
+    o progresso sai em /flp/jobs/{job_id}.
+    """
+    url = (body.url or "").strip()
+    if not url:
+        raise HTTPException(status_code=400, detail="URL vazia.")
+    if "drive.google.com" in url and not extract_gdrive_file_id(url):
+        raise HTTPException(status_code=400, detail="Link do Google Drive inválido (não achei o FILE_ID).")
+    _check_probe_mode(body.probe_mode)
+
+    safe_mkdir(UPLOADS_DIR)
+    safe_mkdir(CORPUS_OUT_DIR)
+
+    job_key = uuid.uuid4().hex[:12]
+    tmp_zip = os.path.join(UPLOADS_DIR, f"remote_{job_key}.zip")
+
+    job = job_store.create("url", _job_params(job_key, tmp_zip, source_url=url, probe_mode=body.probe_mode))
+    job_runner.submit(job["job_id"], run_ingest_job)
+    return _job_accepted(job)
+
+
+@router.post("/master", status_code=202)
+def build_master(full: bool = False):
+    """
+    Enfileira o merge dos corpus no master; progresso em /flp/jobs/{job_id}.
+    full=true: refaz do zero em vez de partir do último master.
+    """
+    safe_mkdir(CORPUS_OUT_DIR)
+    job = job_store.create("master", {"incremental": not full})
+    job_runner.submit(job["job_id"], run_master_job)
+    return _job_accepted(job)
+
+
+@router.get("/master")
+def get_latest_master():
+    master = latest_master(CORPUS_OUT_DIR)
+    if not master:
+        raise HTTPException(status_code=404, detail="Nenhum master gerado ainda")
+    return {k: v for k, v in master.items() if k not in ("projects", "duplicates")}
+
+
+@router.get("/jobs")
+def list_ingest_jobs(status: Optional[str] = None):
+    statuses = tuple(s.strip() for s in status.split(",")) if status else None
+    return {"jobs": job_store.list(statuses=statuses)}
+
+
+@router.get("/jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+
+@router.get("/corpora")
+def list_indexed_corpora():
+    return {"corpora": get_corpus_db().list_corpora()}
+
+
+@router.get("/projects")
+def search_projects(
+    q: Optional[str] = None,
+    corpus_id: Optional[str] = None,
+    kind: str = "corpus",
+    latest_only: bool = True,
+    flp_sha: Optional[str] = None,
+    has_flp: Optional[bool] = None,
+    tempo_min: Optional[float] = None,
+    tempo_max: Optional[float] = None,
+    sample_rate: Optional[int] = None,
+    min_audio: Optional[int] = None,
+    max_audio: Optional[int] = None,
+    sort: str = "created_at",
+    desc: bool = True,
+    limit: int = 50,
+    offset: int = 0,
+):
+    """
+    Busca no índice SQLite (não abre os JSONs dos projetos).
+    Ex.: /flp/projects?tempo_min=129.5&tempo_max=130.5&sample_rate=48000
+    q: trecho do título. latest_only: esconde versões antigas do mesmo
+    projeto que ficaram em corpus anteriores (ignorado com corpus_id).
+    """
+    if kind not in ("corpus", "master"):
+        raise HTTPException(status_code=400, detail="kind inválido (use: corpus, master).")
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort inválido (use: {', '.join(SORT_COLUMNS)}).")
+    if not (1 <= limit <= 500) or offset < 0:
+        raise HTTPException(status_code=400, detail="Paginação inválida (limit 1..500, offset >= 0).")
+
+    return get_corpus_db().search(
+        q=q,
+        corpus_id=corpus_id,
+        kind=kind,
+        latest_only=latest_only,
+        flp_sha=flp_sha,
+        has_flp=has_flp,
+        tempo_min=tempo_min,
+        tempo_max=tempo_max,
+        sample_rate=sample_rate,
+        min_audio=min_audio,
+        max_audio=max_audio,
+        sort=sort,
+        desc=desc,
+        limit=limit,
+        offset=offset,
+    )
+
+
+@router.get("/projects/{project_id}")
+def get_project(project_id: str, corpus_id: Optional[str] = None):
+    """
+    Linha do índice + JSON completo do projeto (só esse arquivo é lido).
+    Sem corpus_id: a versão mais nova.
+    """
+    row = get_corpus_db().get_project(project_id, corpus_id=corpus_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+
+    project = None
+    if row.get("project_file") and os.path.isfile(row["project_file"]):
+        with open(row["project_file"], "r", encoding="utf-8") as f:
+            project = json.load(f)
+    row.pop("title_norm", None)
+    return {"index": row, "project": project}
@@ -0,0 +1,478 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# =========================
+# Configurações
+# =========================
+
+FLP_STORAGE = os.getenv("FLP_STORAGE")  # local:<dir> | s3://<bucket>/<prefix> | github | none
+STORAGE_WORKERS = int(os.getenv("FLP_STORAGE_WORKERS", "8"))
+S3_ENDPOINT_URL = os.getenv("FLP_S3_ENDPOINT")  # MinIO / R2 / etc.; None = AWS
+S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+S3_MULTIPART_CHUNK = 8 * 1024 * 1024
+
+ProgressFn = Optional[Callable[[int, int], None]]
+
+
+def corpus_files(corpus_path: str) -> List[Tuple[str, str]]:
+    """
+    [(caminho relativo, caminho local)] de tudo dentro do corpus/master, em ordem.
+    """
+    out = []
+    for base, dirs, files in os.walk(corpus_path):
+        dirs.sort()
+        for fn in sorted(files):
+            if fn.endswith(".tmp"):
+                continue
+            full = os.path.join(base, fn)
+            out.append((os.path.relpath(full, corpus_path).replace(os.sep, "/"), full))
+    return out
+
+
+def fetch_tmp_dir(dest_dir: str, corpus_id: str) -> str:
+    """
+    Pasta temporária do fetch, única por chamada: dois restores do mesmo
+    corpus (outro worker) não apagam a pasta um do outro. Nome com ponto:
+    fora do glob flp_corpus_*.
+    """
+    tmp = os.path.join(dest_dir, f".fetch_{corpus_id}_{uuid.uuid4().hex[:12]}")
+    os.makedirs(tmp)
+    return tmp
+
+
+def replace_dir(tmp: str, final: str):
+    """
+    Troca final pelo conteúdo de tmp. Se outro fetch do mesmo corpus
+    terminou antes (final já existe e não dá pra trocar), fica o dele.
+    """
+    shutil.rmtree(final, ignore_errors=True)
+    try:
+        os.replace(tmp, final)
+    except OSError:
+        if not os.path.isdir(final):
+            raise
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk_size)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+# =========================
+# Interface
+# =========================
+
+class CorpusStorage:
+    """
+    Onde os corpus/masters ficam guardados fora do disco local.
+      persist(corpus_path): sobe o diretório inteiro (flp_corpus_* / flp_master_*)
+      fetch(corpus_id, dest_dir): baixa de volta em dest_dir/<corpus_id>
+      list_corpora(): corpus_ids guardados
+    """
+
+    name = "base"
+
+    def persist(self, corpus_path: str, progress: ProgressFn = None) -> Dict:
+        raise NotImplementedError
+
+    def fetch(self, corpus_id: str, dest_dir: str) -> str:
+        raise NotImplementedError
+
+    def list_corpora(self) -> List[str]:
+        raise NotImplementedError
+
+
+class ObjectStorage(CorpusStorage):
+    """
+    Layout endereçado por conteúdo, igual pra diretório local e S3:
+      <prefix>/objects/<sha[:2]>/<sha256>   conteúdo (um por sha)
+      <prefix>/corpora/<corpus_id>.json     {arquivo relativo: {sha256, size}}
+    O manifesto do corpus é gravado por último: se ele existe, todos os
+    objetos existem. Projeto repetido entre corpus (incremental, master)
+    não sobe de novo.
+    Subclasses implementam _has/_put_file/_put_bytes/_get_file/_get_bytes/_list.
+    """
+
+    def __init__(self, prefix: str = "", workers: int = STORAGE_WORKERS):
+        self.prefix = prefix.strip("/")
+        self.workers = max(1, workers)
+        self._known: set = set()  # shas que já sabemos que estão no store
+
+    def _key(self, *parts: str) -> str:
+        return "/".join(p for p in (self.prefix, *parts) if p)
+
+    def _object_key(self, sha: str) -> str:
+        return self._key("objects", sha[:2], sha)
+
+    def _manifest_key(self, corpus_id: str) -> str:
+        return self._key("corpora", f"{corpus_id}.json")
+
+    # primitivas
+    def _has(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def _put_file(self, key: str, local_path: str):
+        raise NotImplementedError
+
+    def _put_bytes(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    def _get_file(self, key: str, dst_path: str):
+        raise NotImplementedError
+
+    def _get_bytes(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _list(self, prefix: str) -> List[str]:
+        raise NotImplementedError
+
+    def _store_object(self, sha: str, local_path: str) -> bool:
+        """
+        True se subiu, False se já estava lá.
+        """
+        if sha in self._known:
+            return False
+        key = self._object_key(sha)
+        uploaded = False
+        if not self._has(key):
+            self._put_file(key, local_path)
+            uploaded = True
+        self._known.add(sha)
+        return uploaded
+
+    def persist(self, corpus_path: str, progress: ProgressFn = None) -> Dict:
+        """
+        progress(files_pushed, files_total): depois de cada arquivo (subido ou deduplicado).
+        """
+        corpus_id = os.path.basename(corpus_path.rstrip("/"))
+        files = corpus_files(corpus_path)
+        total = len(files)
+        if progress:
+            progress(0, total)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}_put") as ex:
+            shas = list(ex.map(_file_sha256, [local for _, local in files]))
+
+            # um upload por conteúdo; arquivos iguais no mesmo corpus esperam o mesmo future
+            first: Dict[str, str] = {}
+            for (_, local), sha in zip(files, shas):
+                first.setdefault(sha, local)
+            futures = {sha: ex.submit(self._store_object, sha, local) for sha, local in first.items()}
+
+            uploaded = 0
+            bytes_uploaded = 0
+            for n, ((_, local), sha) in enumerate(zip(files, shas), start=1):
+                if futures[sha].result() and first[sha] == local:
+                    uploaded += 1
+                    bytes_uploaded += os.path.getsize(local)
+                if progress:
+                    progress(n, total)
+
+        manifest = {
+            "corpus_id": corpus_id,
+            "files": {
+                rel: {"sha256": sha, "size": os.path.getsize(local)}
+                for (rel, local), sha in zip(files, shas)
+            },
+        }
+        self._put_bytes(self._manifest_key(corpus_id), json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+
+        return {
+            "status": "ok",
+            "backend": self.name,
+            "corpus_id": corpus_id,
+            "files": total,
+            "objects_uploaded": uploaded,
+            "objects_deduped": total - uploaded,
+            "bytes_uploaded": bytes_uploaded,
+        }
+
+    def fetch(self, corpus_id: str, dest_dir: str) -> str:
+        raw = self._get_bytes(self._manifest_key(corpus_id))
+        if raw is None:
+            raise FileNotFoundError(f"corpus não encontrado no storage: {corpus_id}")
+        manifest = json.loads(raw)
+
+        # baixa num diretório temporário e troca no fim: restore pela metade
+        # não vira corpus
+        final = os.path.join(dest_dir, corpus_id)
+        tmp = fetch_tmp_dir(dest_dir, corpus_id)
+
+        def get(item):
+            rel, meta = item
+            dst = os.path.join(tmp, *rel.split("/"))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            self._get_file(self._object_key(meta["sha256"]), dst)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}_get") as ex:
+                list(ex.map(get, manifest["files"].items()))
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        replace_dir(tmp, final)
+        return final
+
+    def list_corpora(self) -> List[str]:
+        prefix = self._key("corpora") + "/"
+        return sorted(
+            k[len(prefix):-len(".json")]
+            for k in self._list(prefix)
+            if k.endswith(".json")
+        )
+
+
+# =========================
+# Diretório local (volume persistente)
+# =========================
+
+class LocalStorage(ObjectStorage):
+    """
+    Store num diretório (montar um volume fora do container). Objeto é
+    cópia, não hard link: JSON reescrito no lugar não pode mudar o store.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str, workers: int = STORAGE_WORKERS):
+        super().__init__(prefix="", workers=workers)
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def _has(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def _put_file(self, key: str, local_path: str):
+        dst = self._path(key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(local_path, tmp)
+        os.replace(tmp, dst)
+
+    def _put_bytes(self, key: str, data: bytes):
+        dst = self._path(key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dst)
+
+    def _get_file(self, key: str, dst_path: str):
+        shutil.copyfile(self._path(key), dst_path)
+
+    def _get_bytes(self, key: str) -> Optional[bytes]:
+        p = self._path(key)
+        if not os.path.isfile(p):
+            return None
+        with open(p, "rb") as f:
+            return f.read()
+
+    def _list(self, prefix: str) -> List[str]:
+        d = self._path(prefix.rstrip("/"))
+        if not os.path.isdir(d):
+            return []
+        return [f"{prefix}{fn}" for fn in os.listdir(d) if not fn.endswith(".tmp")]
+
+
+# =========================
+# S3 compatível (AWS, MinIO, R2...)
+# =========================
+
+class S3Storage(ObjectStorage):
+    """
+    boto3 com pool de conexões do tamanho dos workers; arquivo acima de
+    S3_MULTIPART_THRESHOLD sobe em multipart com partes em paralelo.
+    Credenciais pela cadeia padrão do boto3 (AWS_ACCESS_KEY_ID etc.).
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+        workers: int = STORAGE_WORKERS,
+        client=None,
+    ):
+        super().__init__(prefix=prefix, workers=workers)
+        import boto3  # opcional
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.client = client or boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            config=Config(max_pool_connections=self.workers * 2, retries={"max_attempts": 5, "mode": "standard"}),
+        )
+        self.transfer = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_CHUNK,
+            max_concurrency=self.workers,
+        )
+
+    def _has(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _put_file(self, key: str, local_path: str):
+        self.client.upload_file(local_path, self.bucket, key, Config=self.transfer)
+
+    def _put_bytes(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType="application/json")
+
+    def _get_file(self, key: str, dst_path: str):
+        self.client.download_file(self.bucket, key, dst_path, Config=self.transfer)
+
+    def _get_bytes(self, key: str) -> Optional[bytes]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def _list(self, prefix: str) -> List[str]:
+        keys = []
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix):
+            keys.extend(o["Key"] for o in page.get("Contents", []))
+        return keys
+
+
+# =========================
+# Escolha do backend
+# =========================
+
+def storage_from_spec(spec: Optional[str]) -> Optional[CorpusStorage]:
+    """
+    "local:/mnt/flp" | "s3://bucket/prefixo" | "github" | "none" / vazio.
+    github usa GITHUB_TOKEN / GITHUB_REPO; sem eles, None.
+    """
+    spec = (spec or "").strip()
+    if not spec or spec == "none":
+        return None
+    if spec.startswith("local:"):
+        return LocalStorage(spec[len("local:"):])
+    if spec.startswith("s3://"):
+        bucket, _, prefix = spec[len("s3://"):].partition("/")
+        return S3Storage(bucket, prefix=prefix)
+    if spec == "github":
+        from flp_corpus.github_store import github_storage_from_env
+        return github_storage_from_env()
+    raise ValueError(f"storage inválido: {spec}")
+
+
+def storage_from_env() -> Optional[CorpusStorage]:
+    """
+    FLP_STORAGE; sem ele, GitHub se GITHUB_TOKEN / GITHUB_REPO existirem
+    (comportamento de antes).
+    """
+    return storage_from_spec(FLP_STORAGE or "github")
+
+
+# =========================
+# Harness: round trip local (e S3, se tiver endpoint)
+# =========================
+
+if __name__ == "__main__":
+    import time
+    import argparse
+    import filecmp
+    import tempfile
+
+    ap = argparse.ArgumentParser(description="persist/fetch/dedupe do storage; S3 contra FLP_S3_ENDPOINT (MinIO, moto_server...)")
+    ap.add_argument("--projects", type=int, default=200, help="JSONs de projeto no corpus sintético")
+    ap.add_argument("--big_mb", type=int, default=20, help="arquivo grande (multipart no S3)")
+    ap.add_argument("--bucket", default="flp-storage-check", help="bucket do teste S3 (criado se não existir)")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="flp_storage_")
+
+    def make_corpus(corpus_id: str, n: int, big: bool) -> str:
+        path = os.path.join(tmp, "src", corpus_id)
+        os.makedirs(os.path.join(path, "projects"))
+        for i in range(n):
+            # metade repetida: dedupe dentro do corpus
+            with open(os.path.join(path, "projects", f"p{i:04d}.json"), "w", encoding="utf-8") as f:
+                json.dump({"project_id": f"p{i % (n // 2 or 1)}"}, f)
+        if big:
+            with open(os.path.join(path, "projects", "big.json"), "wb") as f:
+                f.write(os.urandom(args.big_mb * 1024 * 1024))
+        with open(os.path.join(path, "corpus_index.json"), "w", encoding="utf-8") as f:
+            json.dump({"corpus_id": corpus_id}, f)
+        return path
+
+    def same_tree(a: str, b: str) -> bool:
+        fa = [rel for rel, _ in corpus_files(a)]
+        return fa == [rel for rel, _ in corpus_files(b)] and all(
+            filecmp.cmp(os.path.join(a, rel), os.path.join(b, rel), shallow=False) for rel in fa
+        )
+
+    def check(label: str, ok: bool, extra: str = ""):
+        print(f"{label:44s} {'OK  ' if ok else 'FAIL'} {extra}")
+
+    first = make_corpus("flp_corpus_1", args.projects, big=True)
+    # segundo corpus com os mesmos projetos (ex.: build incremental): nada novo sobe
+    second = os.path.join(tmp, "src", "flp_corpus_2")
+    shutil.copytree(first, second)
+
+    def exercise(label: str, make_storage: Callable[[], ObjectStorage]):
+        st = make_storage()
+        t = time.perf_counter()
+        r = st.persist(first)
+        check(f"{label}: persist", r["files"] == args.projects + 2,
+              f"{time.perf_counter() - t:.2f}s uploaded={r['objects_uploaded']} deduped={r['objects_deduped']}")
+        r = st.persist(second)
+        check(f"{label}: corpus repetido não sobe nada", r["objects_uploaded"] == 0)
+        # instância nova (sem _known): dedupe consultando o store
+        r = make_storage().persist(first)
+        check(f"{label}: instância nova também deduplica", r["objects_uploaded"] == 0)
+        fresh = make_storage()
+        check(f"{label}: list_corpora", fresh.list_corpora() == ["flp_corpus_1", "flp_corpus_2"])
+        dest = os.path.join(tmp, f"restore_{label}")
+        os.makedirs(dest)
+        ok = all(same_tree(os.path.join(tmp, "src", c), fresh.fetch(c, dest)) for c in fresh.list_corpora())
+        check(f"{label}: fetch round trip idêntico", ok and sorted(os.listdir(dest)) == ["flp_corpus_1", "flp_corpus_2"])
+        try:
+            fresh.fetch("flp_corpus_nao_existe", dest)
+            check(f"{label}: fetch de corpus inexistente", False)
+        except FileNotFoundError:
+            check(f"{label}: fetch de corpus inexistente", True)
+
+    exercise("local", lambda: LocalStorage(os.path.join(tmp, "store")))
+
+    if S3_ENDPOINT_URL:
+        s3_prefix = f"check_{uuid.uuid4().hex[:8]}"
+        probe = S3Storage(args.bucket, prefix=s3_prefix)
+        try:
+            probe.client.head_bucket(Bucket=args.bucket)
+        except Exception:
+            probe.client.create_bucket(Bucket=args.bucket)
+        exercise("s3", lambda: S3Storage(args.bucket, prefix=s3_prefix))
+    else:
+        print("s3: pulado (defina FLP_S3_ENDPOINT, ex.: MinIO ou moto_server local)")
+
+    shutil.rmtree(tmp, ignore_errors=True)
@@ -1,102 +1,132 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import List
+import asyncio
+import json
 import uuid
 import os
-import soundfile as sf
-import numpy as np
 import math
 
 # ✅ NOVO: router do Extrator FLP v1
 from flp_corpus.routes import router as flp_router
+# estimate_bpm / classify_audio / fl_time_base_sync moram em engine.audio_analyzer
+from engine.audio_analyzer import (
+    ANALYZER_VERSION,
+    analyze_file,
+    audio_cache_stats,
+    classify_audio,
+    estimate_bpm,
+    fl_time_base_sync,
+)
+from engine.results_store import AnalysisResultsStore
+from engine.workers import AnalysisPool, PoolSaturated
+from engine.file_registry import FileRegistry
+from engine.upload_stream import StreamingAudioUpload, UploadRejected
 
 app = FastAPI()
 
 UPLOAD_DIR = "uploads"
 MAX_DURATION_SECONDS = 7 * 60  # 7 minutos
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "256")) * 1024 * 1024
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))  # 0 = threads no próprio processo
+ANALYSIS_MAX_PENDING = int(os.getenv("ANALYSIS_MAX_PENDING", "16"))
+ANALYSIS_RETRY_AFTER_SECONDS = 5
+MAX_BATCH_FILES = 64
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-# =========================
-# Utils
-# =========================
-
-def get_audio_duration(file_path: str) -> float:
-    info = sf.info(file_path)
-    return info.frames / info.samplerate
-
-
-def estimate_bpm(signal: np.ndarray, sr: int):
-    if signal.ndim > 1:
-        signal = signal.mean(axis=1)
-
-    energy = np.abs(signal)
-    if np.max(energy) == 0:
-        return None
+# file_id -> caminho/metadados (substitui o os.listdir por request)
+file_registry = FileRegistry(UPLOAD_DIR)
+file_registry.rebuild()
 
-    energy = energy / np.max(energy)
-    peaks = np.where(energy > 0.9)[0]
+# resultado da análise persistido ao lado do upload (sobrevive a restart)
+results_store = AnalysisResultsStore(UPLOAD_DIR, ANALYZER_VERSION)
 
-    if len(peaks) < 2:
-        return None
+# decode + NumPy fora do event loop, com fila limitada
+analysis_pool = AnalysisPool(
+    max_workers=ANALYSIS_WORKERS,
+    max_pending=ANALYSIS_MAX_PENDING,
+    worker_stats=audio_cache_stats,
+)
 
-    intervals = np.diff(peaks) / sr
-    avg_interval = np.mean(intervals)
-
-    if avg_interval <= 0:
-        return None
-
-    bpm = 60.0 / avg_interval
-    if bpm < 40 or bpm > 240:
-        return None
-
-    return round(bpm, 2)
-
-
-def classify_audio(signal: np.ndarray) -> str:
-    if signal.ndim > 1:
-        signal = signal.mean(axis=1)
+# =========================
+# Utils
+# =========================
 
-    rms = np.sqrt(np.mean(signal ** 2))
+def find_upload(file_id: str) -> str:
+    entry = file_registry.get(file_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    return entry.path
 
-    if rms < 0.02:
-        return "vocal"
-    elif rms < 0.06:
-        return "melody"
-    else:
-        return "beat"
 
+async def get_analysis(file_id: str) -> dict:
+    """
+    Resultado já persistido sai direto; senão a análise vai pro pool.
+    Fila cheia -> 503 com Retry-After.
+    """
+    file_path = find_upload(file_id)
 
-def fl_time_base_sync(duration_sec: float, bpm: float):
-    if not bpm:
-        return None
+    # load pode recalcular o sha256 do upload: fora do event loop
+    result = await run_in_threadpool(results_store.load, file_id, file_path)
+    if result is not None:
+        return result
 
-    seconds_per_beat = 60.0 / bpm
-    beats_total = duration_sec / seconds_per_beat
-    bars_4_4 = beats_total / 4
+    try:
+        return await analysis_pool.run(analyze_file, file_id, file_path, UPLOAD_DIR)
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Análise ocupada, tente novamente",
+            headers={"Retry-After": str(ANALYSIS_RETRY_AFTER_SECONDS)},
+        )
 
-    return {
-        "bpm": bpm,
-        "seconds_per_beat": round(seconds_per_beat, 4),
-        "total_beats": round(beats_total, 2),
-        "bars_4_4": round(bars_4_4, 2),
-        "time_signature": "4/4",
-        "ppq_reference": 96
-    }
 
 # =========================
 # Upload
 # =========================
 
 @app.post("/upload")
-async def upload_audio(file: UploadFile = File(...)):
-    file_id = str(uuid.uuid4())
-    ext = os.path.splitext(file.filename)[1].lower()
-    file_path = os.path.join(UPLOAD_DIR, f"{file_id}{ext}")
-
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+async def upload_audio(request: Request):
+    """
+    multipart/form-data com o campo "file", lido em streaming:
+    WAV/FLAC/OGG longos demais são recusados pelo header, antes do resto
+    do corpo chegar, e nada além de um chunk fica em memória.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES + 64 * 1024:
+        raise HTTPException(status_code=413, detail="Arquivo muito grande")
 
-    duration = get_audio_duration(file_path)
+    file_id = str(uuid.uuid4())
+    try:
+        sink = StreamingAudioUpload(
+            content_type=request.headers.get("content-type", ""),
+            upload_dir=UPLOAD_DIR,
+            file_id=file_id,
+            max_bytes=MAX_UPLOAD_BYTES,
+            max_duration_seconds=MAX_DURATION_SECONDS,
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    try:
+        async for chunk in request.stream():
+            sink.write(chunk)
+        file_path = sink.finish()
+    except UploadRejected as e:
+        sink.abort()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except BaseException:
+        sink.abort()
+        raise
+
+    # header é estimativa; sf.info continua sendo a palavra final
+    entry = file_registry.register(file_id, file_path)
+    duration = entry.duration_seconds
     if duration > MAX_DURATION_SECONDS:
+        file_registry.remove(file_id)
         os.remove(file_path)
         raise HTTPException(status_code=400, detail="Áudio excede 7 minutos")
 
@@ -109,46 +139,85 @@ async def upload_audio(file: UploadFile = File(...)):
 # Analyze
 # =========================
 
-@app.post("/analyze")
-async def analyze_audio(file_id: str):
-    matches = [f for f in os.listdir(UPLOAD_DIR) if f.startswith(file_id)]
-    if not matches:
-        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
-
-    file_path = os.path.join(UPLOAD_DIR, matches[0])
-
-    signal, sr = sf.read(file_path)
-    duration = get_audio_duration(file_path)
-    bpm = estimate_bpm(signal, sr)
-    audio_type = classify_audio(signal)
-    fl_sync = fl_time_base_sync(duration, bpm)
+def analysis_payload(file_id: str, analysis: dict) -> dict:
+    duration = analysis["duration_seconds"]
+    sr = analysis["sample_rate"]
+    bpm = analysis["bpm_real"]
+    audio_type = analysis["audio_type"]
+    fl_sync = analysis["fl_time_base"]
 
     return {
         "file_id": file_id,
         "duration_seconds": round(duration, 2),
         "sample_rate": sr,
         "bpm_real": bpm,
+        "bpm_confidence": analysis.get("bpm_confidence"),
         "audio_type": audio_type,
         "fl_time_base": fl_sync
     }
 
+
+@app.post("/analyze")
+async def analyze_audio(file_id: str):
+    analysis = await get_analysis(file_id)
+    return analysis_payload(file_id, analysis)
+
+# =========================
+# Analyze (batch)
+# =========================
+
+class BatchAnalyzeBody(BaseModel):
+    file_ids: List[str]
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(body: BatchAnalyzeBody):
+    """
+    Vários file_ids (ex.: stems kick / 808 / cowbell / vocal) numa chamada.
+    Analisa em paralelo no pool e devolve NDJSON: uma linha por arquivo,
+    na ordem em que cada um termina. Erro de um arquivo vira linha com
+    "error" / "status_code" sem derrubar o resto.
+    """
+    file_ids = list(dict.fromkeys(body.file_ids))  # dedupe mantendo ordem
+    if not file_ids:
+        raise HTTPException(status_code=400, detail="Lista de file_ids vazia")
+    if len(file_ids) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BATCH_FILES} arquivos por lote")
+
+    # um lote sozinho não ocupa a fila inteira do pool
+    slots = asyncio.Semaphore(max(1, ANALYSIS_WORKERS))
+
+    async def one(file_id: str) -> dict:
+        async with slots:
+            try:
+                return analysis_payload(file_id, await get_analysis(file_id))
+            except HTTPException as e:
+                return {"file_id": file_id, "error": e.detail, "status_code": e.status_code}
+            except Exception as e:
+                return {"file_id": file_id, "error": f"analysis_error: {e}", "status_code": 500}
+
+    async def stream():
+        tasks = [asyncio.create_task(one(fid)) for fid in file_ids]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps(await done, ensure_ascii=False) + "\n"
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 # =========================
 # Orchestrate
 # =========================
 
 @app.post("/orchestrate")
 async def orchestrate(file_id: str):
-    matches = [f for f in os.listdir(UPLOAD_DIR) if f.startswith(file_id)]
-    if not matches:
-        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    analysis = await get_analysis(file_id)
 
-    file_path = os.path.join(UPLOAD_DIR, matches[0])
-    signal, sr = sf.read(file_path)
-    duration = get_audio_duration(file_path)
-
-    bpm = estimate_bpm(signal, sr)
-    audio_type = classify_audio(signal)
-    fl_sync = fl_time_base_sync(duration, bpm)
+    bpm = analysis["bpm_real"]
+    audio_type = analysis["audio_type"]
+    fl_sync = analysis["fl_time_base"]
 
     decisions = []
 
@@ -189,15 +258,10 @@ async def orchestrate(file_id: str):
 
 @app.post("/fl/timebase")
 async def fl_timebase(file_id: str):
-    matches = [f for f in os.listdir(UPLOAD_DIR) if f.startswith(file_id)]
-    if not matches:
-        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    analysis = await get_analysis(file_id)
 
-    file_path = os.path.join(UPLOAD_DIR, matches[0])
-    signal, sr = sf.read(file_path)
-
-    duration = get_audio_duration(file_path)
-    bpm = estimate_bpm(signal, sr)
+    duration = analysis["duration_seconds"]
+    bpm = analysis["bpm_real"]
 
     if not bpm:
         raise HTTPException(
@@ -232,6 +296,26 @@ async def fl_timebase(file_id: str):
         "status": "timebase_ready"
     }
 
+# =========================
+# Cache stats
+# =========================
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Cache de sinal de quem analisa: com ANALYSIS_WORKERS > 0, soma dos
+    caches dos workers (cada um tem o seu); com 0, o do próprio processo.
+    """
+    return {
+        "audio_cache": analysis_pool.worker_stats(),
+        "analysis_pool": analysis_pool.stats(),
+    }
+
+
+@app.on_event("shutdown")
+def shutdown_analysis_pool():
+    analysis_pool.shutdown()
+
 # =========================
 # ✅ NOVO: Extrator FLP v1 (router)
 # =========================